@@ -0,0 +1,470 @@
+#    CompilerFramework Python Version - LexerFramework
+#    Copyright(C) 2023  刘迅承
+
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with this program.If not, see<https://www.gnu.org/licenses/>.
+
+"""
+The throughput benchmark of lexers over scalable synthetic corpora, for example::
+
+    python benchmark.py --corpus math c_like long_line --size 1MB 100MB --output results.json
+
+Every (corpus, size, engine, method) case is timed as the best of `--repeat` runs, and measured once more under :obj:`tracemalloc` for the peak memory allocated while Lexing, unless `--no-memory` is given. The results are written as JSON with the Python version, platform and git commit, to compare across versions.
+"""
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from lexer_framework import HLlangLexerFramework, LexerFramework, LexEngine
+
+try:
+    from char_prescan import CharClassPrescan, np
+except ImportError:
+    CharClassPrescan, np = None, None
+
+# the version of the JSON results format
+RESULTS_VERSION = 1
+
+_C_KEYWORDS = ("int", "char", "float", "double", "void", "struct", "if", "else", "while", "for", "return", "break", "continue", "const", "static", "sizeof")
+_C_TYPES = ("int", "char", "float", "double", "unsigned")
+_C_OPERATORS = ("+", "-", "*", "/", "<", ">", "==", "!=", "<=", ">=", "&&", "||")
+_MATH_OPERATORS = ("+", "-", "*", "/")
+_SIZE_UNITS = {"": 1, "B": 1, "KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30}
+_SIZE_REGEX = re.compile(r"(\d+(?:\.\d+)?)\s*([KMG]?B?)", re.IGNORECASE)
+
+
+def parse_size(size: str) -> int:
+    """
+    Parse the size of corpus, such as "1KB", "500MB" or "4096", units are powers of 1024.
+
+    Raises
+    ------
+    ValueError
+        if the size is malformed
+    """
+    match = _SIZE_REGEX.fullmatch(size.strip())
+    if match is None:
+        raise ValueError(f"malformed size {size!r}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+def _variable(rand: random.Random) -> str:
+    return rand.choice("abcdefghijklmnopqrstuvwxyz") + str(rand.randint(0, 99))
+
+
+def _math_expression(rand: random.Random) -> str:
+    words = [str(rand.randint(1, 9999))]
+    for _ in range(rand.randint(1, 8)):
+        words.append(rand.choice(_MATH_OPERATORS))
+        if rand.random() < 0.3:
+            words.append(_variable(rand))
+        elif rand.random() < 0.3:
+            words.append(f"{rand.randint(1, 999)}.{rand.randint(1, 99)}")
+        else:
+            words.append(str(rand.randint(1, 9999)))
+    return " ".join(words)
+
+
+def math_lines(seed: int = 0) -> Iterator[str]:
+    """
+    Generate endless lines of assignments in the math expression language of `LR_ParserInMath.build_math_parser()` (see `test.py`), such as "a1 = 12 + b3 * 4.5".
+
+    Parameters
+    ----------
+    seed : int, optional
+        the random seed, the same seed generates the same lines
+
+    Yields
+    ------
+    str
+        the line with line break
+    """
+    rand = random.Random(seed)
+    while True:
+        yield f"{_variable(rand)} = {_math_expression(rand)}\n"
+
+
+def c_like_lines(seed: int = 0) -> Iterator[str]:
+    """
+    Generate endless lines of a keyword-heavy C-like language, such as declarations, `if`/`while`/`for` headers, calls with strings, and comments.
+
+    Parameters
+    ----------
+    seed : int, optional
+        the random seed, the same seed generates the same lines
+
+    Yields
+    ------
+    str
+        the line with line break
+    """
+    rand = random.Random(seed)
+    while True:
+        kind = rand.randrange(7)
+        a, b = _variable(rand), _variable(rand)
+        op = rand.choice(_C_OPERATORS)
+        if kind == 0:
+            line = f"static const {rand.choice(_C_TYPES)} {a} = {rand.randint(1, 9999)};"
+        elif kind == 1:
+            line = f"if ({a} {op} {b}) {{ return {a}; }} else {{ break; }}"
+        elif kind == 2:
+            line = f"while ({a} {op} {rand.randint(1, 99)}) {{ {a} = {a} + 1; continue; }}"
+        elif kind == 3:
+            line = f"for (int {a} = 1; {a} < {b}; {a} = {a} + 1) {{"
+        elif kind == 4:
+            line = f"    {a} = print(\"{a} and {b}\", sizeof(struct {b}));"
+        elif kind == 5:
+            line = f"// {a} {op} {b} is not void"
+        else:
+            line = "}"
+        yield line + "\n"
+
+
+def long_line_words(seed: int = 0) -> Iterator[str]:
+    """
+    Generate endless assignments of :obj:`math_lines()` separated by spaces instead of line breaks, for single line inputs.
+
+    Parameters
+    ----------
+    seed : int, optional
+        the random seed, the same seed generates the same words
+
+    Yields
+    ------
+    str
+        the assignment with trailing space
+    """
+    for line in math_lines(seed):
+        yield line[:-1] + " "
+
+
+def build_math_lexer(engine: LexEngine = LexEngine.ITEMS) -> LexerFramework:
+    """
+    Build the lexer of the math expression language, the Lex items are the same as `LR_ParserInMath.build_math_parser()` except that blanks are skipped.
+    """
+    lexer = HLlangLexerFramework([[]], engine)
+    lexer.add_operators("(", LexerFramework.none_format_cap_text, 0, 0, "\\(")
+    lexer.add_operators(")", LexerFramework.none_format_cap_text, 0, 0, "\\)")
+    lexer.add_operators("Add", LexerFramework.none_format_cap_text, 0, 0, "\\+")
+    lexer.add_operators("Sub", LexerFramework.none_format_cap_text, 0, 0, "-")
+    lexer.add_operators("Mul", LexerFramework.none_format_cap_text, 0, 0, "\\*")
+    lexer.add_operators("Div", LexerFramework.none_format_cap_text, 0, 0, "/")
+    lexer.add_operators("Assign", LexerFramework.none_format_cap_text, 0, 0, "=")
+    lexer.add_constants("Number", HLlangLexerFramework.convert_float, 0, 0, False, "(-|\\+)?\\d+(\\.\\d+)?")
+    lexer.add_identifier("Variable")
+    lexer.add_lex_item("Null", "\\s+", skip=True)
+    return lexer
+
+
+def build_c_like_lexer(engine: LexEngine = LexEngine.ITEMS) -> LexerFramework:
+    """
+    Build the lexer of the C-like language of :obj:`c_like_lines()`, whose keywords are in the reserved words table.
+    """
+    lexer = HLlangLexerFramework([[]], engine)
+    lexer.add_res_words_table("Keyword", LexerFramework.none_format_cap_text, 0, 0, *_C_KEYWORDS)
+    lexer.add_identifier("Identifier")
+    lexer.add_constants("Int", HLlangLexerFramework.convert_int, 0, 0, True, "\\d+")
+    lexer.add_lex_item("String", '"[^"\\n]*"')
+    lexer.add_lex_item("Comment", "//[^\\n]*")
+    lexer.add_operators("Operator", LexerFramework.none_format_cap_text, 0, 0, "==", "!=", "<=", ">=", "&&", "\\|\\|", "[-+*/<>=]")
+    lexer.add_delimiters("Delimiter", LexerFramework.none_format_cap_text, 0, 0, "[(){};,]")
+    lexer.add_lex_item("Null", "\\s+", skip=True)
+    return lexer
+
+
+# corpus name to (chunk generator, lexer builder)
+CORPORA: Dict[str, Tuple[Callable[[int], Iterator[str]], Callable[[LexEngine], LexerFramework]]] = {
+    "math": (math_lines, build_math_lexer),
+    "c_like": (c_like_lines, build_c_like_lexer),
+    "long_line": (long_line_words, build_math_lexer),
+}
+
+
+def iter_corpus(corpus: str, size: int, seed: int = 0) -> Iterator[str]:
+    """
+    Generate the chunks of corpus until `size` chars are generated, the last chunk may exceed `size` to keep the words whole.
+
+    Parameters
+    ----------
+    corpus : str
+        the name in :obj:`CORPORA`
+    size : int
+        the size in chars, which are ASCII, so also in bytes
+    seed : int, optional
+        the random seed
+    """
+    generated = 0
+    for chunk in CORPORA[corpus][0](seed):
+        if generated >= size:
+            return
+        generated += len(chunk)
+        yield chunk
+
+
+def generate_corpus(corpus: str, size: int, seed: int = 0) -> str:
+    """
+    Generate the corpus as string, see :obj:`iter_corpus()`.
+    """
+    return "".join(iter_corpus(corpus, size, seed))
+
+
+def write_corpus(path: str, corpus: str, size: int, seed: int = 0) -> None:
+    """
+    Write the corpus to file chunk by chunk, so the memory does not grow with `size`, see :obj:`iter_corpus()`.
+    """
+    with open(path, "w", encoding="ascii", newline="\n") as f:
+        pending: List[str] = []
+        pending_size = 0
+        for chunk in iter_corpus(corpus, size, seed):
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size >= 1 << 20:
+                f.write("".join(pending))
+                pending, pending_size = [], 0
+        f.write("".join(pending))
+
+
+def _count_iter(iterator: Iterator[Any]) -> int:
+    count = 0
+    for _ in iterator:
+        count += 1
+    return count
+
+
+def _run_lex_stream(lexer: LexerFramework, path: str) -> int:
+    with open(path, encoding="ascii", newline="\n") as f:
+        return lexer.lex_stream(f)
+
+
+def _run_lex_buffer(lexer: LexerFramework, path: str) -> int:
+    with open(path, encoding="ascii", newline="\n") as f:
+        text = f.read()
+    return lexer.lex_buffer(text)
+
+
+def _run_lex_buffer_bytes(lexer: LexerFramework, path: str) -> int:
+    with open(path, "rb") as f:
+        buf = f.read()
+    lexer.set_bytes_mode("ascii")
+    return lexer.lex_buffer(buf)
+
+
+def _run_lex_file(lexer: LexerFramework, path: str) -> int:
+    return lexer.lex_file(path, encoding="ascii")
+
+
+def _run_lex_to_token_buffer(lexer: LexerFramework, path: str) -> int:
+    with open(path, encoding="ascii", newline="\n") as f:
+        text = f.read()
+    return len(lexer.lex_to_token_buffer(text))
+
+
+def _run_iter_tokens(lexer: LexerFramework, path: str) -> int:
+    with open(path, encoding="ascii", newline="\n") as f:
+        return _count_iter(lexer.iter_tokens(f))
+
+
+def _run_prescan(lexer: LexerFramework, path: str) -> int:
+    lexer.set_prescan(CharClassPrescan(lexer))
+    return _run_lex_buffer(lexer, path)
+
+
+# method name to the runner, which Lexes the corpus file and returns the count of tokens
+METHODS: Dict[str, Callable[[LexerFramework, str], int]] = {
+    "lex_stream": _run_lex_stream,
+    "lex_buffer": _run_lex_buffer,
+    "lex_buffer_bytes": _run_lex_buffer_bytes,
+    "lex_file": _run_lex_file,
+    "lex_to_token_buffer": _run_lex_to_token_buffer,
+    "iter_tokens": _run_iter_tokens,
+    "prescan": _run_prescan,
+}
+
+
+def available_methods() -> List[str]:
+    """
+    The names of methods in :obj:`METHODS` which can run here, "prescan" requires NumPy.
+    """
+    return [method for method in METHODS if method != "prescan" or np is not None]
+
+
+def run_case(corpus: str, path: str, engine: LexEngine, method: str, repeat: int = 3, memory: bool = True) -> Dict[str, Any]:
+    """
+    Time one case as the best of `repeat` runs, each run builds a new lexer outside the timing, so the matchers are compiled in the first match.
+
+    Parameters
+    ----------
+    corpus : str
+        the name in :obj:`CORPORA`, which decides the lexer
+    path : str
+        the corpus file
+    engine : :obj:`LexEngine`
+        the matching engine
+    method : str
+        the name in :obj:`METHODS`
+    repeat : int, optional
+        the number of timed runs
+    memory : bool, optional
+        measure the peak memory allocated while Lexing by one more run under :obj:`tracemalloc`
+
+    Returns
+    -------
+    dict
+        the result with keys corpus, size, engine, method, tokens, seconds, tokens_per_s, mb_per_s, peak_memory (None if not measured)
+    """
+    build_lexer, runner = CORPORA[corpus][1], METHODS[method]
+    size = os.path.getsize(path)
+    tokens, best = 0, float("inf")
+    for _ in range(max(repeat, 1)):
+        lexer = build_lexer(engine)
+        start = time.perf_counter()
+        tokens = runner(lexer, path)
+        best = min(best, time.perf_counter() - start)
+    peak_memory = None
+    if memory:
+        lexer = build_lexer(engine)
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        runner(lexer, path)
+        peak_memory = tracemalloc.get_traced_memory()[1] - base
+        if not was_tracing:
+            tracemalloc.stop()
+    seconds = max(best, 1e-9)
+    return {
+        "corpus": corpus,
+        "size": size,
+        "engine": engine.name,
+        "method": method,
+        "tokens": tokens,
+        "seconds": best,
+        "tokens_per_s": tokens / seconds,
+        "mb_per_s": size / (1 << 20) / seconds,
+        "peak_memory": peak_memory,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(corpora: List[str], sizes: List[int], engines: Optional[List[LexEngine]] = None, methods: Optional[List[str]] = None, repeat: int = 3, memory: bool = True, seed: int = 0, corpus_dir: Optional[str] = None, log: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    Run every (corpus, size, engine, method) case, see :obj:`run_case()`.
+
+    Parameters
+    ----------
+    corpora : :obj:`list` of str
+        the names in :obj:`CORPORA`
+    sizes : :obj:`list` of int
+        the sizes of corpora in bytes
+    engines : :obj:`list` of :obj:`LexEngine`, optional
+        the engines, all engines if None
+    methods : :obj:`list` of str, optional
+        the names in :obj:`METHODS`, :obj:`available_methods()` if None
+    repeat : int, optional
+        the number of timed runs of each case
+    memory : bool, optional
+        measure the peak memory of each case
+    seed : int, optional
+        the random seed of corpora
+    corpus_dir : str, optional
+        the directory to keep the corpus files, which are reused if exist, a temporary directory if None
+    log : :obj:`Callable` of :obj:`[str], None`, optional
+        receive a line of progress after each case
+
+    Returns
+    -------
+    dict
+        the results with the environment, which can be dumped as JSON
+    """
+    engines = list(LexEngine) if engines is None else engines
+    methods = available_methods() if methods is None else methods
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = temp_dir if corpus_dir is None else corpus_dir
+        os.makedirs(directory, exist_ok=True)
+        for corpus in corpora:
+            for size in sizes:
+                path = os.path.join(directory, f"{corpus}-{size}-{seed}.txt")
+                if not os.path.exists(path):
+                    write_corpus(path, corpus, size, seed)
+                for engine in engines:
+                    for method in methods:
+                        result = run_case(corpus, path, engine, method, repeat, memory)
+                        results.append(result)
+                        if log is not None:
+                            log(f"{corpus} {size} {engine.name} {method}: {result['tokens_per_s']:.0f} tokens/s, {result['mb_per_s']:.2f} MB/s")
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "numpy": None if np is None else np.__version__,
+        "repeat": repeat,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def write_results(results: Dict[str, Any], path: str) -> None:
+    """
+    Write the results of :obj:`run_benchmarks()` as JSON, "-" for stdout.
+    """
+    if path == "-":
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the lexers over synthetic corpora.")
+    parser.add_argument("--corpus", nargs="+", choices=list(CORPORA), default=list(CORPORA))
+    parser.add_argument("--size", nargs="+", type=parse_size, default=[parse_size("1MB")], help="sizes from 1KB to 500MB, such as 1KB 10MB")
+    parser.add_argument("--engine", nargs="+", choices=[engine.name for engine in LexEngine], default=None)
+    parser.add_argument("--method", nargs="+", choices=list(METHODS), default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip measuring the peak memory")
+    parser.add_argument("--corpus-dir", default=None, help="keep and reuse the corpus files in this directory")
+    parser.add_argument("--output", default="-", help="the JSON results file, - for stdout")
+    args = parser.parse_args(argv)
+    engines = None if args.engine is None else [LexEngine[name] for name in args.engine]
+    results = run_benchmarks(args.corpus, args.size, engines, args.method, args.repeat, args.memory,
+                             args.seed, args.corpus_dir, lambda line: print(line, file=sys.stderr))
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
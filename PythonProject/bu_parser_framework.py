@@ -15,10 +15,12 @@
 #    along with this program.If not, see<https://www.gnu.org/licenses/>.
 
 from enum import Enum
-from typing import Callable, Any, List, Tuple, Dict
+from typing import Callable, Any, List, Tuple, Dict, FrozenSet, Optional
 from queue import LifoQueue
+import sys
 
-from parser_framework import ParserFramework, Production, ParseUnit
+from parser_framework import ParserFramework, ParseIndexException, Production, ParseUnit
+from symbol_table import SymbolTable
 
 
 debug = False
@@ -570,6 +572,10 @@ class LRTable:
             the nonterminals of init closures
         """
         self._table_dict: Dict[str, List[LRAction]] = {}
+        # rows indexed by symbol id, see `build_rows()`
+        self.rows: List[List[LRAction]] = []
+        # closure index to expected terminals, see `get_expected_terminals()`
+        self._expected_terminals: Dict[int, FrozenSet[str]] = {}
         self.closure_num = closure_num
         self.terminals = terminals
         self.nonterminals = nonterminals
@@ -610,6 +616,60 @@ class LRTable:
         """
         return self._table_dict[symbol][closure_index]
 
+    def build_rows(self, symbol_table: SymbolTable) -> None:
+        """
+        Add all symbols to `symbol_table` and build `self.rows`, where the action is `self.rows[closure_index][symbol_id]`. Set the `pre_id` of productions in REDUCE actions. Invoke this after the table is completed.
+
+        Parameters
+        ----------
+        symbol_table : :obj:`SymbolTable`
+            the symbol table
+        """
+        for symbol in self._table_dict:
+            symbol_table.add(symbol)
+        err_action = LRAction()
+        row_num = len(next(iter(self._table_dict.values())))
+        self.rows = [[err_action] * len(symbol_table) for _ in range(row_num)]
+        for symbol, actions in self._table_dict.items():
+            symbol_id = symbol_table.get_id(symbol)
+            for closure_index, action in enumerate(actions):
+                self.rows[closure_index][symbol_id] = action
+                if action.action_type == LRAction.ActionType.REDUCE:
+                    action.action_value.pre_id = symbol_table.get_id(
+                        action.action_value.pre)
+
+    def get_action_by_id(self, symbol_id: int, closure_index: int) -> LRAction:
+        """
+        Get the action in table by symbol id, see :obj:`build_rows()`. Unknown symbol (-1 or added to symbol table later) gets `ActionType.ERR`.
+
+        Parameters
+        ----------
+        symbol_id : int
+            the symbol id of column
+        closure_index : int
+            the index of row
+        """
+        row = self.rows[closure_index]
+        if 0 <= symbol_id < len(row):
+            return row[symbol_id]
+        return LRAction()
+
+    def get_expected_terminals(self, closure_index: int) -> FrozenSet[str]:
+        """
+        Get the terminals whose actions are not `ActionType.ERR` in a row, '@EOF' is excluded.
+
+        Parameters
+        ----------
+        closure_index : int
+            the index of row
+        """
+        expected = self._expected_terminals.get(closure_index)
+        if expected is None:
+            expected = frozenset(terminal for terminal in self.terminals
+                                 if terminal != '@EOF' and self._table_dict[terminal][closure_index].action_type != LRAction.ActionType.ERR)
+            self._expected_terminals[closure_index] = expected
+        return expected
+
     def add_new_row(self):
         """
         Add a new row to this table
@@ -780,6 +840,8 @@ class LRParserFramework(ParserFramework):
         the k of LR, 0 or 1.
     self.acc : bool
         is or not reached ACC after parsing
+    self.symbol_table : :obj:`SymbolTable`
+        symbol ids of terminals and nonterminals after :obj:`build_table()`, which can be shared with lexer by `LexerFramework.set_symbol_table()`
     """
 
     def __init__(self, k:int=0, SLR:bool=False) -> None:
@@ -808,14 +870,17 @@ class LRParserFramework(ParserFramework):
         parse_unit : :obj:`ParseUnit`
             the new :obj:`ParseUnit` from :obj:`ParserFramework.parse_lex_unit()` or :obj:`ParserFramework.parse_lex_unit_async()`
         """
-        action = self._table.get_action(parse_unit.name, self._closure_index)
+        if parse_unit.kind < 0:
+            parse_unit.kind = self.symbol_table.get_id(parse_unit.name)
+        kind = parse_unit.kind
+        action = self._table.get_action_by_id(kind, self._closure_index)
 
         def do_action(action, redo = False):
             if redo:
                 if action.action_type == LRAction.ActionType.GOTO:
                     self._closure_index = action.action_value
                     self._closure_index_stack.put(self._closure_index)
-                    action = self._table.get_action(parse_unit.name, action.action_value)
+                    action = self._table.get_action_by_id(kind, action.action_value)
             # ACC
             if action.action_type == LRAction.ActionType.ACC:
                 self.acc = True
@@ -838,22 +903,22 @@ class LRParserFramework(ParserFramework):
                 # pop stack
                 for _ in production.sufs:
                     stack_parse_unit: ParseUnit = self._stack.get()
-                    position = stack_parse_unit.position
+                    position = stack_parse_unit.raw_position
                     stack_parse_units.insert(0, stack_parse_unit)
                     self._closure_index_stack.get()
                 # invoke semant callback when production was reduced
                 value = production.semant_callback(stack_parse_units)
                 # put new reduced nonterminal to stack
                 reduce_parse_unit: ParseUnit = ParseUnit(
-                    production.pre, stack_parse_units, position, value, None)
+                    production.pre, stack_parse_units, position, value, None, production.pre_id)
                 self._stack.put(reduce_parse_unit)
                 # check which closure should goto
                 if self._closure_index_stack.empty():
                     closure_index = 0
                 else:
                     closure_index = self._closure_index_stack.queue[-1]
-                new_action = self._table.get_action(
-                    production.pre, closure_index)
+                new_action = self._table.get_action_by_id(
+                    production.pre_id, closure_index)
                 return new_action
 
         new_action = do_action(action)
@@ -872,8 +937,28 @@ class LRParserFramework(ParserFramework):
             reserved place for advanced usage, EOF's value of :obj:`ParseUnit`
         unit_property : optional
             reserved place for advanced usage, EOF's unit_property of :obj:`ParseUnit`
+
+        Raises
+        ------
+        ParseIndexException
+            if results are still held by the reorder window, see :obj:`ParserFramework.set_reorder_window()`
+        """
+        if self._reorder_buffer:
+            raise ParseIndexException(self._index, min(self._reorder_buffer))
+        self.parse(ParseUnit('@EOF', [], (-1, -1), value,
+                   unit_property, self.symbol_table.get_id('@EOF')))
+
+    def expected_terminals(self) -> FrozenSet[str]:
+        """
+        The terminals which can be parsed in the current state, other terminals incur `ActionType.ERR`. Set this as the expected callback of lexer, then the lexer only tries the Lex items of these terminals, see `LexerFramework.set_expected_callback()`.
+        """
+        return self._table.get_expected_terminals(self._closure_index)
+
+    def terminals(self) -> FrozenSet[str]:
+        """
+        All terminals of grammar, '@EOF' is excluded.
         """
-        self.parse(ParseUnit('@EOF', [], (-1, -1), value, unit_property))
+        return frozenset(terminal for terminal in self._table.terminals if terminal != '@EOF')
 
     def get_grammar_tree(self) -> ParseUnit:
         """
@@ -903,9 +988,16 @@ class LRParserFramework(ParserFramework):
         augmented_grammar_attr : optional
             the attr for new production in augmented grammar in :obj:`add_augmented_grammar()`
         """
+        # interned symbols are compared by identity first
+        for production in self.productions:
+            production.pre = sys.intern(production.pre)
+            production.sufs = [sys.intern(suf) for suf in production.sufs]
         productions = add_augmented_grammar(
             self.productions, augmented_grammar_semant_callback, augmented_grammar_attr)
         init_closure = Closure(productions, self.k, self.SLR)
         self._table = LR_table_construct(init_closure, conflict_callback)
+        if self.symbol_table is None:
+            self.symbol_table = SymbolTable()
+        self._table.build_rows(self.symbol_table)
         self._closure_index: int = 0
         self._closure_index_stack.put(0)
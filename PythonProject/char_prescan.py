@@ -0,0 +1,243 @@
+#    CompilerFramework Python Version - LexerFramework
+#    Copyright(C) 2023  刘迅承
+
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with this program.If not, see<https://www.gnu.org/licenses/>.
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import re
+
+from dfa_lexer import CharSet, FirstCharDispatch, UnsupportedRegexException, _RegexParser, _char_categories
+from lexer_framework import LexerFramework, LexItem, NoMatchException, ZeroLenghtMatchException
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy is optional, CharClassPrescan is not available without it
+    np = None
+
+# the class of non-ASCII chars in the class codes, which are always matched by regex
+_NON_ASCII = 255
+# the chars matched by `\s` of byte patterns
+_BYTES_SPACES = frozenset(b" \t\n\r\f\v")
+
+
+def _contains(charset: CharSet, code: int, is_bytes: bool) -> bool:
+    """
+    Is the ASCII char `code` in `charset`, as `re` matches `str` or bytes.
+    """
+    is_word, is_digit, is_space = _char_categories(chr(code))
+    if is_bytes:
+        is_space = code in _BYTES_SPACES
+    return charset.contains(code, is_word, is_digit, is_space)
+
+
+def run_shape(lex_item: LexItem) -> Optional[Tuple[CharSet, CharSet, Optional[Tuple[Optional[CharSet], bool]]]]:
+    """
+    Analyze whether the Lex item matches a run of chars, as `A+` or `AB*` of char sets, with an optional trailing lookahead like `(?=\\W|$)`.
+
+    Parameters
+    ----------
+    lex_item : :obj:`LexItem`
+        the Lex item
+
+    Returns
+    -------
+    :obj:`Tuple`
+        (the charset of first char, the charset of other chars, (lookahead charset or None, allow end) or None), None if the item is not a run
+    """
+    if int(lex_item.reg_flags) & ~(re.DOTALL | re.ASCII | re.UNICODE):
+        return None
+    if lex_item.push_group is not None or lex_item.pop_group:
+        return None
+    charsets: List[CharSet] = []
+    try:
+        node, look = _RegexParser(lex_item.scan_pattern(), int(
+            lex_item.reg_flags), charsets, {}).parse()
+    except UnsupportedRegexException:
+        return None
+    if node[0] == 'cat' and len(node[1]) == 1:
+        node = node[1][0]
+    if node[0] == 'rep' and node[1][0] == 'set' and node[2] == 1 and node[3] is None:
+        first = rest = charsets[node[1][1]]
+    elif (node[0] == 'cat' and len(node[1]) == 2 and node[1][0][0] == 'set'
+          and node[1][1][0] == 'rep' and node[1][1][1][0] == 'set' and node[1][1][2] == 0 and node[1][1][3] is None):
+        first, rest = charsets[node[1][0][1]], charsets[node[1][1][1][1]]
+    else:
+        return None
+    if look is not None:
+        look = (charsets[look[1]] if look[1] is not None else None, look[2])
+    return first, rest, look
+
+
+class CharClassPrescan:
+    """
+    The prescan of :obj:`LexerFramework` for simple lexical grammars, see :obj:`LexerFramework.set_prescan()`. It requires NumPy.
+
+    The Lex items matching runs of chars, such as blanks `\\s+`, numbers `\\d+` and identifiers `[A-Za-z]\\w*`, are found by :obj:`run_shape()`. An ASCII char is decided by a run item if that item is the first item that may match at it (see :obj:`dfa_lexer.FirstCharDispatch`) and it contains the char, since the run item must match there. The whole buffer is mapped to class codes in one vectorized pass, and the ends of the words at all decided offsets are found by `np.searchsorted()` over the ends of runs, so the scanning loop only looks up the end of a decided word instead of calling regex. At the other positions, and when the run stops at a non-ASCII char or fails its lookahead, the group matcher of lexer is used, so the results are the same as :obj:`LexerFramework.lex_buffer()`.
+
+    The Lex Groups with group switching items, and the lexer with `expected_callback`, are scanned by the lexer as before.
+
+    Parameters
+    ----------
+    self.lexer : :obj:`LexerFramework`
+        the lexer
+    """
+
+    def __init__(self, lexer: LexerFramework) -> None:
+        """
+        Construct method
+
+        Parameters
+        ----------
+        lexer : :obj:`LexerFramework`
+            the lexer
+
+        Raises
+        ------
+        ImportError
+            if NumPy is not installed
+        """
+        if np is None:
+            raise ImportError("CharClassPrescan requires NumPy")
+        self.lexer = lexer
+        # (group, is bytes) to (number of items when built, class table, runs)
+        self._tables: Dict[Tuple[int, bool], Tuple[int, Any, List[Tuple[LexItem, Any, Optional[List[bool]], bool]]]] = {}
+
+    def _get_tables(self, group: int, is_bytes: bool) -> Tuple[Any, List[Tuple[LexItem, Any, Optional[List[bool]], bool]]]:
+        """
+        Get the class table of ASCII chars and the runs of `group`, build them if the group is changed.
+
+        The class table maps char codes (non-ASCII as 128) to 0 for chars matched by regex, `i + 1` for chars decided by run `i`, and 255 for non-ASCII. Each run is (Lex item, table of other chars, table of lookahead chars or None, allow end), and None lookahead table means no lookahead if allow end is True.
+        """
+        lex_items = self.lexer.lex_item_groups[group]
+        cached = self._tables.get((group, is_bytes))
+        if cached is not None and cached[0] == len(lex_items):
+            return cached[1], cached[2]
+        dispatch = FirstCharDispatch(lex_items)
+        shapes = [run_shape(lex_item) for lex_item in lex_items]
+        runs: List[Tuple[LexItem, Any, Optional[List[bool]], bool]] = []
+        run_indexes: Dict[int, int] = {}
+        class_table = np.zeros(129, dtype=np.uint8)
+        class_table[128] = _NON_ASCII
+        for code in range(128):
+            candidates = dispatch.candidates(chr(code))
+            if not candidates or shapes[candidates[0]] is None:
+                continue
+            first, rest, look = shapes[candidates[0]]
+            if not _contains(first, code, is_bytes) or len(runs) >= _NON_ASCII - 1:
+                continue
+            if candidates[0] not in run_indexes:
+                run_indexes[candidates[0]] = len(runs)
+                rest_table = np.array([_contains(rest, c, is_bytes) for c in range(128)] + [False])
+                if look is None:
+                    runs.append((lex_items[candidates[0]], rest_table, None, True))
+                else:
+                    # `$` matches before every line break, as `re.MULTILINE`
+                    look_table = [(look[0] is not None and _contains(look[0], c, is_bytes)) or (look[1] and c == 10)
+                                  for c in range(128)]
+                    runs.append((lex_items[candidates[0]], rest_table, look_table, look[1]))
+            class_table[code] = run_indexes[candidates[0]] + 1
+        self._tables[(group, is_bytes)] = (len(lex_items), class_table, runs)
+        return class_table, runs
+
+    @staticmethod
+    def _codes(text: Any) -> Any:
+        """
+        The char codes of `text` as NumPy array, indexed as `text`.
+        """
+        if not isinstance(text, str):
+            return np.frombuffer(text, dtype=np.uint8)
+        if text.isascii():
+            return np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+        return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+
+    def _run_ends(self, text: Any, group: int, is_bytes: bool) -> Tuple[memoryview, memoryview]:
+        """
+        Find the end of the word at each offset decided by a run item, -1 for the offsets matched by regex, and the class codes of `text`. They are returned as memoryviews of the NumPy arrays without copying, which are indexed as Python ints.
+        """
+        class_table, runs = self._get_tables(group, is_bytes)
+        codes = np.minimum(self._codes(text), 128)
+        length = len(codes)
+        classes = class_table[codes]
+        # the class of offset `length` is not non-ASCII
+        classes_end = np.append(classes, 0)
+        ends = np.full(length, -1, dtype=np.int32 if length < 2 ** 31 else np.int64)
+        for i, (lex_item, rest_table, look_table, allow_end) in enumerate(runs):
+            starts = np.flatnonzero(classes == i + 1)
+            if not starts.size:
+                continue
+            breaks = np.append(np.flatnonzero(~rest_table[codes]), length)
+            run_ends = breaks[np.searchsorted(breaks, starts, side="right")]
+            # a non-ASCII char may continue the run
+            is_ok = classes_end[run_ends] != _NON_ASCII
+            if look_table is not None:
+                is_ok &= np.append(np.array(look_table + [False])[codes], allow_end)[run_ends]
+            ends[starts[is_ok]] = run_ends[is_ok]
+        return memoryview(ends), memoryview(classes)
+
+    def scan(self, text: Any, group: int = 0) -> Iterator[Tuple[LexItem, int, int]]:
+        """
+        Scan `text` as :obj:`LexerFramework._scan()` of the whole text.
+
+        Parameters
+        ----------
+        text : str or bytes-like
+            the whole text, bytes-like text in bytes mode
+        group : int, optional
+            the Lex Group
+
+        Yields
+        ------
+        :obj:`Tuple` of :obj:`LexItem, int, int`
+            the matched Lex item, start and end offset
+
+        Raises
+        ------
+        NoMatchException
+            if text at some offset cannot be matched by Lex items
+        ZeroLenghtMatchException
+            when match the zero length word
+        """
+        lexer = self.lexer
+        if lexer.expected_callback is not None or lexer._has_group_switch():
+            yield from lexer._scan(text, group)
+            return
+        is_bytes = not isinstance(text, str)
+        encoding = lexer.bytes_encoding if is_bytes else None
+        matcher = lexer._get_matcher(group, encoding)
+        ends, classes = self._run_ends(text, group, is_bytes)
+        run_items = [None] + [run[0]
+                              for run in self._get_tables(group, is_bytes)[1]]
+        length = len(text)
+        pos = 0
+        while pos < length:
+            end = ends[pos]
+            if end >= 0:
+                lex_item = run_items[classes[pos]]
+            else:
+                match = matcher.match(text, pos)
+                if match is None:
+                    raise NoMatchException(*lexer._line_col(text, pos, encoding))
+                lex_item, end = match
+                if end == pos:
+                    raise ZeroLenghtMatchException(
+                        lex_item.name, lex_item.regex.pattern)
+            if lex_item.keywords:
+                lexeme = text[pos:end]
+                if encoding is not None:
+                    lexeme = str(lexeme, encoding)
+                lex_item = lex_item.keywords.get(lexeme, lex_item)
+            if not lex_item.is_skip:
+                yield lex_item, pos, end
+            pos = end
@@ -0,0 +1,821 @@
+#    CompilerFramework Python Version - LexerFramework
+#    Copyright(C) 2023  刘迅承
+
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with this program.If not, see<https://www.gnu.org/licenses/>.
+
+from typing import Any, List, Tuple, Dict, Optional, FrozenSet
+from bisect import bisect_right
+import re
+
+
+MAX_CODE = 0x10FFFF
+# the max number of repeated copies when expand `{m,n}`
+MAX_REPEAT = 256
+
+
+class UnsupportedRegexException(Exception):
+    """
+    Exception when the regex is out of the subset supported by DFA.
+    """
+
+    def __init__(self, pattern: str, reason: str, *args: object) -> None:
+        """
+        Exception when the regex is out of the subset supported by DFA.
+
+        Parameters
+        ----------
+        pattern : str
+            the regex pattern
+        reason : str
+            the unsupported part
+        *args
+            for super class Exception
+        """
+        super().__init__(*args)
+        self.pattern = pattern
+        self.reason = reason
+
+    def __str__(self) -> str:
+        return f"Unsupported Regex: {self.reason} in RegExpr: {self.pattern}"
+
+
+class CharSet:
+    """
+    The set of chars matched by one char of regex, such as `a`, `.`, `\\w` or `[^a-z\\d]`.
+
+    Parameters
+    ----------
+    self.ranges : :obj:`list` of :obj:`Tuple` of :obj:`int, int`
+        the code ranges (low, high), both included
+    self.cats : :obj:`list` of :obj:`Tuple` of :obj:`str, bool`
+        the categories ('w', 'd' or 's', negated), as `\\w`, `\\d`, `\\s`, `\\W`, `\\D` and `\\S`
+    self.negate : bool
+        negated set, as `[^...]`
+    self.ascii_only : bool
+        categories only match ASCII chars, as flag `re.ASCII`
+    """
+
+    def __init__(self, ranges: List[Tuple[int, int]], cats: List[Tuple[str, bool]], negate: bool = False, ascii_only: bool = False) -> None:
+        self.ranges = ranges
+        self.cats = cats
+        self.negate = negate
+        self.ascii_only = ascii_only
+
+    def key(self) -> Tuple:
+        """
+        the hashable key of this set
+        """
+        return (tuple(sorted(self.ranges)), tuple(sorted(self.cats)), self.negate, self.ascii_only)
+
+    def contains(self, code: int, is_word: bool, is_digit: bool, is_space: bool) -> bool:
+        """
+        Is the char in this set, the char is given by code and categories.
+
+        Parameters
+        ----------
+        code : int
+            the code of char
+        is_word : bool
+            char is matched by `\\w`
+        is_digit : bool
+            char is matched by `\\d`
+        is_space : bool
+            char is matched by `\\s`
+        """
+        hit = False
+        for low, high in self.ranges:
+            if low <= code <= high:
+                hit = True
+                break
+        if not hit and self.cats:
+            if self.ascii_only and code >= 128:
+                is_word = is_digit = is_space = False
+            for cat, negated in self.cats:
+                if cat == 'w':
+                    hit = is_word != negated
+                elif cat == 'd':
+                    hit = is_digit != negated
+                else:
+                    hit = is_space != negated
+                if hit:
+                    break
+        return hit != self.negate
+
+
+def _char_categories(c: str) -> Tuple[bool, bool, bool]:
+    """
+    (`\\w`, `\\d`, `\\s`) of char, as the predicates used by `re` for `str`.
+    """
+    return c.isalnum() or c == '_', c.isdecimal(), c.isspace()
+
+
+_ESCAPE_CHARS = {'n': '\n', 't': '\t', 'r': '\r', 'f': '\f', 'v': '\v', 'a': '\a'}
+_CAT_ESCAPES = {'w': ('w', False), 'd': ('d', False), 's': ('s', False),
+                'W': ('w', True), 'D': ('d', True), 'S': ('s', True)}
+
+
+class _RegexParser:
+    """
+    Recursive descent parser of the regex subset, produces the AST in tuples:
+    ('set', charset_index), ('cat', [nodes]), ('alt', [nodes]), ('rep', node, min, max or None), ('look', charset_index or None, allow_end).
+    """
+
+    def __init__(self, pattern: str, reg_flags: int, charsets: List[CharSet], charset_dict: Dict[Tuple, int]) -> None:
+        self.pattern = pattern
+        self.pos = 0
+        self.dotall = bool(reg_flags & re.DOTALL)
+        self.ascii_only = bool(reg_flags & re.ASCII)
+        self.charsets = charsets
+        self.charset_dict = charset_dict
+
+    def error(self, reason: str):
+        return UnsupportedRegexException(self.pattern, reason)
+
+    def peek(self) -> str:
+        return self.pattern[self.pos] if self.pos < len(self.pattern) else ''
+
+    def add_charset(self, charset: CharSet) -> int:
+        key = charset.key()
+        if key not in self.charset_dict:
+            self.charset_dict[key] = len(self.charsets)
+            self.charsets.append(charset)
+        return self.charset_dict[key]
+
+    def parse(self) -> Tuple[Any, Any]:
+        """
+        Parse the pattern.
+
+        Returns
+        -------
+        :obj:`Tuple`
+            AST of pattern without trailing lookahead, and the trailing ('look', ...) node or None
+        """
+        node = self.parse_alt()
+        if self.pos != len(self.pattern):
+            raise self.error(f"unbalanced '{self.peek()}'")
+        look = None
+        if node[0] == 'cat' and node[1] and node[1][-1][0] == 'look':
+            look = node[1][-1]
+            node = ('cat', node[1][:-1])
+        elif node[0] == 'look':
+            raise self.error("lookahead only")
+        self.check_no_look(node)
+        return node, look
+
+    def check_no_look(self, node) -> None:
+        if node[0] == 'look':
+            raise self.error("lookahead not at the end")
+        if node[0] in ('cat', 'alt'):
+            for sub in node[1]:
+                self.check_no_look(sub)
+        elif node[0] == 'rep':
+            self.check_no_look(node[1])
+
+    def parse_alt(self):
+        branches = [self.parse_concat()]
+        while self.peek() == '|':
+            self.pos += 1
+            branches.append(self.parse_concat())
+        if len(branches) == 1:
+            return branches[0]
+        return ('alt', branches)
+
+    def parse_concat(self):
+        nodes = []
+        while self.peek() not in ('', '|', ')'):
+            nodes.append(self.parse_repeat())
+        if len(nodes) == 1:
+            return nodes[0]
+        return ('cat', nodes)
+
+    def parse_repeat(self):
+        node = self.parse_atom()
+        c = self.peek()
+        quantifier = None
+        if c == '*':
+            quantifier = (0, None)
+            self.pos += 1
+        elif c == '+':
+            quantifier = (1, None)
+            self.pos += 1
+        elif c == '?':
+            quantifier = (0, 1)
+            self.pos += 1
+        elif c == '{':
+            match = re.compile(r"\{(\d*)(,?)(\d*)\}").match(
+                self.pattern, self.pos)
+            if match is not None and (match.group(1) or match.group(3)):
+                low = int(match.group(1)) if match.group(1) else 0
+                if match.group(2):
+                    high = int(match.group(3)) if match.group(3) else None
+                else:
+                    high = low
+                quantifier = (low, high)
+                self.pos = match.end()
+        if quantifier is None:
+            return node
+        if node[0] == 'look':
+            raise self.error("repeated lookahead")
+        if self.peek() in ('?', '+', '*', '{'):
+            raise self.error("lazy, possessive or multiple quantifier")
+        low, high = quantifier
+        if max(low, high or 0) > MAX_REPEAT:
+            raise self.error("too large repeat")
+        return ('rep', node, low, high)
+
+    def parse_atom(self):
+        c = self.peek()
+        if c == '(':
+            return self.parse_group()
+        if c == '[':
+            return ('set', self.add_charset(self.parse_class()))
+        if c == '.':
+            self.pos += 1
+            if self.dotall:
+                return ('set', self.add_charset(CharSet([(0, MAX_CODE)], [])))
+            return ('set', self.add_charset(CharSet([(10, 10)], [], True)))
+        if c == '\\':
+            return ('set', self.add_charset(self.parse_escape(False)))
+        if c in ('^', '$'):
+            raise self.error(f"anchor '{c}'")
+        if c in ('*', '+', '?'):
+            raise self.error(f"nothing to repeat by '{c}'")
+        self.pos += 1
+        return ('set', self.add_charset(CharSet([(ord(c), ord(c))], [])))
+
+    def parse_group(self):
+        self.pos += 1
+        if self.pattern.startswith('?:', self.pos):
+            self.pos += 2
+        elif self.pattern.startswith('?P<', self.pos):
+            end = self.pattern.find('>', self.pos)
+            if end < 0:
+                raise self.error("bad group name")
+            self.pos = end + 1
+        elif self.pattern.startswith('?=', self.pos):
+            self.pos += 2
+            return self.parse_lookahead()
+        elif self.peek() == '?':
+            raise self.error("group extension '(?'")
+        node = self.parse_alt()
+        if self.peek() != ')':
+            raise self.error("missing ')'")
+        self.pos += 1
+        return node
+
+    def parse_lookahead(self):
+        """
+        Lookahead of single char sets and '$' only, like `(?=\\W|$)`.
+        """
+        charsets: List[CharSet] = []
+        allow_end = False
+        while True:
+            if self.peek() == '$':
+                self.pos += 1
+                allow_end = True
+            else:
+                node = self.parse_atom()
+                if node[0] != 'set':
+                    raise self.error("complex lookahead")
+                charsets.append(self.charsets[node[1]])
+            c = self.peek()
+            if c == '|':
+                self.pos += 1
+                continue
+            if c != ')':
+                raise self.error("complex lookahead")
+            self.pos += 1
+            break
+        if not charsets:
+            return ('look', None, allow_end)
+        if len(charsets) == 1:
+            return ('look', self.add_charset(charsets[0]), allow_end)
+        if any(charset.negate for charset in charsets):
+            raise self.error("complex lookahead")
+        union = CharSet([r for charset in charsets for r in charset.ranges],
+                        [cat for charset in charsets for cat in charset.cats], False, self.ascii_only)
+        return ('look', self.add_charset(union), allow_end)
+
+    def parse_escape(self, in_class: bool) -> CharSet:
+        """
+        Parse escape after '\\', return the char set.
+        """
+        self.pos += 1
+        c = self.peek()
+        if c == '':
+            raise self.error("bad escape at end")
+        self.pos += 1
+        if c in _CAT_ESCAPES:
+            return CharSet([], [_CAT_ESCAPES[c]], False, self.ascii_only)
+        if c in _ESCAPE_CHARS:
+            code = ord(_ESCAPE_CHARS[c])
+        elif c == 'b' and in_class:
+            code = 8
+        elif c in ('x', 'u', 'U'):
+            length = {'x': 2, 'u': 4, 'U': 8}[c]
+            digits = self.pattern[self.pos:self.pos + length]
+            if len(digits) != length or re.fullmatch(r"[0-9A-Fa-f]+", digits) is None:
+                raise self.error(f"bad escape '\\{c}'")
+            self.pos += length
+            code = int(digits, 16)
+        elif c.isalnum():
+            raise self.error(f"escape '\\{c}'")
+        else:
+            code = ord(c)
+        return CharSet([(code, code)], [])
+
+    def parse_class(self) -> CharSet:
+        """
+        Parse char class `[...]`.
+        """
+        self.pos += 1
+        negate = False
+        if self.peek() == '^':
+            negate = True
+            self.pos += 1
+        ranges: List[Tuple[int, int]] = []
+        cats: List[Tuple[str, bool]] = []
+        first = True
+        while True:
+            c = self.peek()
+            if c == '':
+                raise self.error("missing ']'")
+            if c == ']' and not first:
+                self.pos += 1
+                break
+            first = False
+            low = self.parse_class_char()
+            if isinstance(low, CharSet):
+                cats += low.cats
+                ranges += low.ranges
+                continue
+            if self.peek() == '-' and self.pattern[self.pos + 1:self.pos + 2] not in ('', ']'):
+                self.pos += 1
+                high = self.parse_class_char()
+                if isinstance(high, CharSet) or high < low:
+                    raise self.error("bad char range")
+                ranges.append((low, high))
+            else:
+                ranges.append((low, low))
+        return CharSet(ranges, cats, negate, self.ascii_only)
+
+    def parse_class_char(self) -> Any:
+        """
+        Parse a char in class, return code, or :obj:`CharSet` for category escapes.
+        """
+        c = self.peek()
+        if c == '\\':
+            charset = self.parse_escape(True)
+            if charset.cats:
+                return charset
+            return charset.ranges[0][0]
+        if c == '[' and self.pattern[self.pos + 1:self.pos + 2] in (':', '=', '.'):
+            raise self.error("POSIX class")
+        self.pos += 1
+        return ord(c)
+
+
+class _NFA:
+    """
+    Thompson NFA, edges are (charset_index or None for epsilon, to_state)
+    """
+
+    def __init__(self) -> None:
+        self.edges: List[List[Tuple[Optional[int], int]]] = []
+
+    def new_state(self) -> int:
+        self.edges.append([])
+        return len(self.edges) - 1
+
+    def build(self, node, start: int) -> int:
+        """
+        Build the fragment of `node` from `start`, return the end state.
+        """
+        kind = node[0]
+        if kind == 'set':
+            end = self.new_state()
+            self.edges[start].append((node[1], end))
+            return end
+        if kind == 'cat':
+            for sub in node[1]:
+                start = self.build(sub, start)
+            return start
+        if kind == 'alt':
+            end = self.new_state()
+            for sub in node[1]:
+                branch = self.new_state()
+                self.edges[start].append((None, branch))
+                self.edges[self.build(sub, branch)].append((None, end))
+            return end
+        # rep
+        sub, low, high = node[1], node[2], node[3]
+        for _ in range(low):
+            start = self.build(sub, start)
+        if high is None:
+            loop = self.new_state()
+            self.edges[start].append((None, loop))
+            self.edges[self.build(sub, loop)].append((None, loop))
+            return loop
+        end = self.new_state()
+        self.edges[start].append((None, end))
+        for _ in range(high - low):
+            start = self.build(sub, start)
+            self.edges[start].append((None, end))
+        return end
+
+    def closure(self, states) -> FrozenSet[int]:
+        stack = list(states)
+        result = set(stack)
+        while stack:
+            state = stack.pop()
+            for label, to in self.edges[state]:
+                if label is None and to not in result:
+                    result.add(to)
+                    stack.append(to)
+        return frozenset(result)
+
+
+class DFAGroupMatcher:
+    """
+    Matcher of a Lex group, which compiles the Lex items into one minimized DFA and scans by a loop over the transition table.
+
+    The supported regex subset is: literal chars and escapes (`\\n`, `\\t`, `\\xhh`, `\\uhhhh`, `\\.` ...), `.`, char classes `[...]` and `[^...]` with ranges, `\\w`, `\\d`, `\\s` and their negations, groups `(...)`, `(?:...)`, `(?P<name>...)`, alternation `|`, greedy quantifiers `*`, `+`, `?`, `{m}`, `{m,}`, `{m,n}`, and a trailing lookahead of chars and `$` like `(?=\\W|$)` added by :obj:`HLlangLexerFramework`. Flags other than `re.DOTALL` and `re.ASCII` are not supported.
+
+    Items out of the subset (lookbehind, back reference, anchors, lazy quantifiers, ...) fall back to `re` and keep their priority. The first item in declaration order that matches at the position wins, and a DFA item takes its longest match (leftmost-longest), while `re` takes the first match found by backtracking (leftmost-first). So the matched lengths may differ from `re` for alternations where a shorter branch comes first, such as `a|ab`, and for optional groups and quantifiers, such as `(ab)?(abcd)?` on "abcd", where `re` matches "ab" and the DFA matches "abcd". With this matcher, the lines of :obj:`LexerFramework.lex_stream()` are scanned by the first matching item at each position as :obj:`LexerFramework.lex_buffer()`, not in the legacy order of `LexEngine.ITEMS`, see :obj:`LexerFramework.set_engine()`.
+
+    Parameters
+    ----------
+    self.lex_items : :obj:`List` of :obj:`LexItem`
+        Lex items of the group
+    self.fallback_items : :obj:`List` of :obj:`LexItem`
+        Lex items matched by `re`
+    self.state_num : int
+        the number of states of minimized DFA
+    """
+
+    def __init__(self, lex_items: List[Any]) -> None:
+        """
+        Construct method, compile the DFA.
+
+        Parameters
+        ----------
+        lex_items : :obj:`List` of :obj:`LexItem`
+            Lex items of the group, in declaration order
+        """
+        self.lex_items = lex_items
+        self.fallback_items: List[Any] = []
+        charsets: List[CharSet] = []
+        charset_dict: Dict[Tuple, int] = {}
+        nfa = _NFA()
+        nfa_start = nfa.new_state()
+        # NFA accept state to rank (index of item)
+        accept_states: Dict[int, int] = {}
+        # rank to trailing lookahead (charset_index or None, allow_end)
+        self._looks: Dict[int, Tuple[Optional[int], bool]] = {}
+        # rank to regex of fallback item, in order
+        self._fallbacks: List[Tuple[int, re.Pattern]] = []
+        for rank, lex_item in enumerate(lex_items):
+            pattern = lex_item.scan_pattern()
+            try:
+                if int(lex_item.reg_flags) & ~(re.DOTALL | re.ASCII | re.UNICODE):
+                    raise UnsupportedRegexException(pattern, "flags")
+                node, look = _RegexParser(
+                    pattern, int(lex_item.reg_flags), charsets, charset_dict).parse()
+            except UnsupportedRegexException:
+                self.fallback_items.append(lex_item)
+                self._fallbacks.append(
+                    (rank, re.compile(pattern, lex_item.reg_flags | re.MULTILINE)))
+                continue
+            item_start = nfa.new_state()
+            nfa.edges[nfa_start].append((None, item_start))
+            accept_states[nfa.build(node, item_start)] = rank
+            if look is not None:
+                self._looks[rank] = (look[1], look[2])
+        self._build_classes(charsets)
+        self._build_dfa(nfa, nfa_start, accept_states)
+
+    def _build_classes(self, charsets: List[CharSet]) -> None:
+        """
+        Split all chars into classes, chars in one class are in the same charsets.
+        """
+        self._charsets = charsets
+        boundaries = {128}
+        for charset in charsets:
+            for low, high in charset.ranges:
+                if high >= 128:
+                    boundaries.add(max(low, 128))
+                    if high < MAX_CODE:
+                        boundaries.add(high + 1)
+        self._boundaries = sorted(boundaries)
+        signature_dict: Dict[Tuple, int] = {}
+        # class index to the charset indexes containing it
+        self._class_charsets: List[FrozenSet[int]] = []
+
+        def class_of(code: int, is_word: bool, is_digit: bool, is_space: bool) -> int:
+            signature = tuple(i for i, charset in enumerate(charsets)
+                              if charset.contains(code, is_word, is_digit, is_space))
+            if signature not in signature_dict:
+                signature_dict[signature] = len(self._class_charsets)
+                self._class_charsets.append(frozenset(signature))
+            return signature_dict[signature]
+
+        self._ascii_classes = [class_of(code, *_char_categories(chr(code)))
+                               for code in range(128)]
+        # (segment, is_word, is_digit, is_space) to class
+        self._segment_classes: Dict[Tuple[int, bool, bool, bool], int] = {}
+        for segment, code in enumerate(self._boundaries):
+            for flags in range(8):
+                categories = (bool(flags & 4), bool(flags & 2), bool(flags & 1))
+                self._segment_classes[(segment,) + categories] = class_of(
+                    code, *categories)
+        self._char_classes: Dict[str, int] = {}
+
+    def _class_of_char(self, c: str) -> int:
+        """
+        Class of a non-ASCII char.
+        """
+        cls = self._char_classes.get(c)
+        if cls is None:
+            segment = bisect_right(self._boundaries, ord(c)) - 1
+            cls = self._segment_classes[(segment,) + _char_categories(c)]
+            self._char_classes[c] = cls
+        return cls
+
+    def _build_dfa(self, nfa: _NFA, nfa_start: int, accept_states: Dict[int, int]) -> None:
+        """
+        Subset construction and Moore minimization.
+        """
+        class_num = len(self._class_charsets)
+        start = nfa.closure([nfa_start])
+        dfa_states = [start]
+        dfa_dict = {start: 0}
+        transitions: List[List[int]] = []
+        i = 0
+        while i < len(dfa_states):
+            row = []
+            for cls in range(class_num):
+                charset_indexes = self._class_charsets[cls]
+                targets = [to for state in dfa_states[i] for label, to in nfa.edges[state]
+                           if label is not None and label in charset_indexes]
+                if not targets:
+                    row.append(-1)
+                    continue
+                target = nfa.closure(targets)
+                if target not in dfa_dict:
+                    dfa_dict[target] = len(dfa_states)
+                    dfa_states.append(target)
+                row.append(dfa_dict[target])
+            transitions.append(row)
+            i += 1
+        accepts = [tuple(sorted(accept_states[state] for state in dfa_state if state in accept_states))
+                   for dfa_state in dfa_states]
+        # Moore minimization, dead state -1 is kept alone
+        block_dict: Dict[Tuple, int] = {}
+        blocks = [block_dict.setdefault(accept, len(block_dict))
+                  for accept in accepts]
+        block_num = 0
+        while block_num != len(block_dict):
+            block_num = len(block_dict)
+            block_dict = {}
+            blocks = [block_dict.setdefault(
+                (blocks[state],) + tuple(blocks[to] if to >= 0 else -1 for to in transitions[state]), len(block_dict))
+                for state in range(len(dfa_states))]
+        self.state_num = len(block_dict)
+        self._transitions: List[List[int]] = [None] * self.state_num
+        self._accepts: List[Tuple[int, ...]] = [()] * self.state_num
+        for state in range(len(dfa_states)):
+            block = blocks[state]
+            self._transitions[block] = [blocks[to] if to >= 0 else -1
+                                        for to in transitions[state]]
+            self._accepts[block] = accepts[state]
+        self._start = blocks[0]
+
+    def _look_ok(self, rank: int, s: str, pos: int) -> bool:
+        """
+        Check the trailing lookahead of item `rank` at `pos`.
+        """
+        charset_index, allow_end = self._looks[rank]
+        length = len(s)
+        if pos >= length:
+            return allow_end
+        if allow_end and s[pos] == '\n':
+            # `$` matches at the end of every line, as `re.MULTILINE`
+            return True
+        if charset_index is None:
+            return False
+        c = s[pos]
+        code = ord(c)
+        cls = self._ascii_classes[code] if code < 128 else self._class_of_char(c)
+        return charset_index in self._class_charsets[cls]
+
+    def match(self, s: str, pos: int = 0) -> Optional[Tuple[Any, int]]:
+        """
+        Match the Lex items at `pos` of `s`.
+
+        Parameters
+        ----------
+        s : str
+            string to be matched
+        pos : int, optional
+            the position to start matching
+
+        Returns
+        -------
+        :obj:`Tuple` of :obj:`LexItem, int`
+            the matched Lex item and the end of match, None if no item matched
+        """
+        transitions = self._transitions
+        accepts = self._accepts
+        ascii_classes = self._ascii_classes
+        looks = self._looks
+        length = len(s)
+        state = self._start
+        best_rank = len(self.lex_items)
+        best_end = -1
+        i = pos
+        while i < length:
+            c = s[i]
+            code = ord(c)
+            state = transitions[state][ascii_classes[code]
+                                       if code < 128 else self._class_of_char(c)]
+            if state < 0:
+                break
+            i += 1
+            for rank in accepts[state]:
+                if rank > best_rank:
+                    break
+                if rank not in looks or self._look_ok(rank, s, i):
+                    best_rank = rank
+                    best_end = i
+                    break
+        for rank, regex in self._fallbacks:
+            if rank > best_rank:
+                break
+            match = regex.match(s, pos)
+            if match is not None:
+                return self.lex_items[rank], match.end()
+        if best_end < 0:
+            return None
+        return self.lex_items[best_rank], best_end
+
+
+def _first_charsets(node, first: set) -> bool:
+    """
+    Add the charset indexes of the first char matched by `node` to `first`, and return whether `node` matches the empty string.
+    """
+    kind = node[0]
+    if kind == 'set':
+        first.add(node[1])
+        return False
+    if kind == 'cat':
+        for sub in node[1]:
+            if not _first_charsets(sub, first):
+                return False
+        return True
+    if kind == 'alt':
+        nullable = False
+        for sub in node[1]:
+            if _first_charsets(sub, first):
+                nullable = True
+        return nullable
+    # rep
+    return _first_charsets(node[1], first) or node[2] == 0
+
+
+def first_charsets(pattern: str, reg_flags=0) -> Tuple[List[CharSet], bool]:
+    """
+    Analyze the first char of a pattern in the subset supported by :obj:`DFAGroupMatcher`.
+
+    Parameters
+    ----------
+    pattern : str
+        the pattern without leading "^"
+    reg_flags : optional
+        https://docs.python.org/3/library/re.html#flags
+
+    Returns
+    -------
+    :obj:`Tuple` of :obj:`list, bool`
+        the charsets of the first char, and whether the pattern matches the empty string
+
+    Raises
+    ------
+    UnsupportedRegexException
+        when the pattern or flags are out of the subset
+    """
+    if int(reg_flags) & ~(re.DOTALL | re.ASCII | re.UNICODE):
+        raise UnsupportedRegexException(pattern, "flags")
+    charsets: List[CharSet] = []
+    node, _ = _RegexParser(pattern, int(reg_flags), charsets, {}).parse()
+    first: set = set()
+    nullable = _first_charsets(node, first)
+    return [charsets[i] for i in sorted(first)], nullable
+
+
+class FirstCharDispatch:
+    """
+    Index of a Lex group from the first char to the Lex items that may match a string starting with it, in declaration order.
+
+    Items whose first char cannot be analyzed (out of the subset of :obj:`DFAGroupMatcher`, or matching the empty string) are in every candidate list.
+
+    Parameters
+    ----------
+    self.lex_items : :obj:`List` of :obj:`LexItem`
+        Lex items of the group
+    self.fallback_items : :obj:`List` of :obj:`LexItem`
+        Lex items always tried
+    """
+
+    def __init__(self, lex_items: List[Any]) -> None:
+        """
+        Construct method, analyze the first chars and build the ASCII table.
+
+        Parameters
+        ----------
+        lex_items : :obj:`List` of :obj:`LexItem`
+            Lex items of the group, in declaration order
+        """
+        self.lex_items = lex_items
+        self.fallback_items: List[Any] = []
+        # first charsets of each item, None for fallback
+        self._firsts: List[Optional[List[CharSet]]] = []
+        for lex_item in lex_items:
+            try:
+                charsets, nullable = first_charsets(
+                    lex_item.scan_pattern(), lex_item.reg_flags)
+            except UnsupportedRegexException:
+                charsets, nullable = None, True
+            if nullable:
+                self.fallback_items.append(lex_item)
+                charsets = None
+            self._firsts.append(charsets)
+        # share the equal candidate tuples
+        self._candidate_dict: Dict[Tuple[int, ...], Tuple[int, ...]] = {}
+        self._fallback = self._share(tuple(i for i, charsets in enumerate(self._firsts)
+                                           if charsets is None))
+        self._ascii = [self._candidates_of(chr(code)) for code in range(128)]
+        self._chars: Dict[str, Tuple[int, ...]] = {}
+        # any item may match a non-ASCII byte, which is a part of multi-byte char
+        self._non_ascii_byte = self._share(tuple(range(len(lex_items))))
+
+    def _share(self, candidates: Tuple[int, ...]) -> Tuple[int, ...]:
+        return self._candidate_dict.setdefault(candidates, candidates)
+
+    def _candidates_of(self, c: str) -> Tuple[int, ...]:
+        code = ord(c)
+        categories = _char_categories(c)
+        return self._share(tuple(i for i, charsets in enumerate(self._firsts)
+                                 if charsets is None or any(charset.contains(code, *categories) for charset in charsets)))
+
+    def candidates(self, c: str) -> Tuple[int, ...]:
+        """
+        The indexes of Lex items that may match a string starting with `c`.
+
+        Parameters
+        ----------
+        c : str
+            the first char, '' for the empty string
+
+        Returns
+        -------
+        :obj:`Tuple` of int
+            indexes of Lex items in the group, in ascending order
+        """
+        if not c:
+            return self._fallback
+        code = ord(c)
+        if code < 128:
+            return self._ascii[code]
+        candidates = self._chars.get(c)
+        if candidates is None:
+            candidates = self._chars[c] = self._candidates_of(c)
+        return candidates
+
+    def byte_candidates(self, code: int) -> Tuple[int, ...]:
+        """
+        The indexes of Lex items that may match a bytes string starting with byte `code`, all items for non-ASCII bytes.
+
+        Parameters
+        ----------
+        code : int
+            the first byte
+
+        Returns
+        -------
+        :obj:`Tuple` of int
+            indexes of Lex items in the group, in ascending order
+        """
+        if code < 128:
+            return self._ascii[code]
+        return self._non_ascii_byte
@@ -0,0 +1,182 @@
+#    CompilerFramework Python Version - LexerFramework
+#    Copyright(C) 2023  刘迅承
+
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with this program.If not, see<https://www.gnu.org/licenses/>.
+
+from typing import List, Tuple, Iterator
+from lexer_framework import LexerFramework, LexItem
+
+
+class LexSession:
+    """
+    Keep the text and its words for editors, and re-Lex only the damaged region after each edit.
+
+    All scanned words are kept, including the words dropped by `format_cap_text`, since they are the boundaries to resynchronize, except the words of skip items. The scanning state is the stack of Lex Groups, which is switched by the items with `push_group` or `pop_group` and kept before every word, so re-Lexing stops at the first new word that starts at a (shifted) start of an old word after the edit with the same group stack, where the rest words must be the same as before.
+
+    The starts of words after the last edit are stored relative to the end of text, like a gap buffer, so the words after an edit need no update, and the cost of an edit depends on the distance from the last edit and the size of damaged region instead of the size of text, except copying the text itself.
+
+    Parameters
+    ----------
+    self.lexer : :obj:`LexerFramework`
+        the lexer, whose Lex items of `group` are used
+    self.group : int
+        the base Lex Group
+    self.text : str
+        the current text
+    """
+
+    def __init__(self, lexer: LexerFramework, text: str = "", group: int = 0) -> None:
+        """
+        Construct method, Lex the whole text.
+
+        Parameters
+        ----------
+        lexer : :obj:`LexerFramework`
+            the lexer
+        text : str, optional
+            the initial text
+        group : int, optional
+            the Lex Group
+
+        Raises
+        ------
+        NoMatchException
+            if text cannot be matched by Lex items
+        """
+        self.lexer = lexer
+        self.group = group
+        self.text = text
+        self._items: List[LexItem] = []
+        self._starts: List[int] = []
+        self._lengths: List[int] = []
+        # the group stack before every word, equal stacks share one tuple
+        self._stacks: List[Tuple[int, ...]] = []
+        # words before `self._gap` have absolute starts, others have starts relative to the end of text
+        self._gap = 0
+        stack = [group]
+        for lex_item, start, end in lexer._scan(text, group, stack=stack):
+            self._items.append(lex_item)
+            self._starts.append(start)
+            self._lengths.append(end - start)
+            self._stacks.append(self._snapshot(stack, self._stacks))
+        self._gap = len(self._items)
+
+    def _snapshot(self, stack: List[int], stacks: List[Tuple[int, ...]]) -> Tuple[int, ...]:
+        last = stacks[-1] if stacks else (self.group,)
+        if len(stack) == len(last) and stack[-1] == last[-1] and tuple(stack) == last:
+            return last
+        return tuple(stack)
+
+    def _start(self, index: int) -> int:
+        if index < self._gap:
+            return self._starts[index]
+        return self._starts[index] + len(self.text)
+
+    def _move_gap(self, index: int) -> None:
+        starts, length = self._starts, len(self.text)
+        for i in range(index, self._gap):
+            starts[i] -= length
+        for i in range(self._gap, index):
+            starts[i] += length
+        self._gap = index
+
+    def find(self, offset: int) -> int:
+        """
+        Find the first word that ends at or after `offset` by bisection.
+
+        Returns
+        -------
+        int
+            index of the word, `len(self)` if no such word
+        """
+        lo, hi = 0, len(self._items)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._start(mid) + self._lengths[mid] < offset:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def apply_edit(self, start: int, end: int, new_text: str) -> Tuple[int, int, List[Tuple[LexItem, int, int]]]:
+        """
+        Replace text [start, end) by `new_text`, and re-Lex from the word before the edit until the new words resynchronize with the old words. The word before the edit is re-Lexed too, since its match may look ahead into the edit.
+
+        Parameters
+        ----------
+        start : int
+            start offset of the replaced text
+        end : int
+            end offset of the replaced text
+        new_text : str
+            the inserted text
+
+        Returns
+        -------
+        :obj:`Tuple` of :obj:`int, int, list`
+            the delta of words: index of the first changed word, the number of removed old words, and the new words as (Lex item, start, end)
+
+        Raises
+        ------
+        NoMatchException
+            if the new text cannot be matched by Lex items, and the session is unchanged
+        """
+        old_length = len(self.text)
+        text = self.text[:start] + new_text + self.text[end:]
+        first = self.find(start) - 1
+        # before the first word, which may start after skipped words, re-Lex from the beginning
+        if first >= 0:
+            pos, stack = self._start(first), list(self._stacks[first])
+        else:
+            pos, stack = 0, [self.group]
+        first = max(first, 0)
+        self._move_gap(first)
+        # old words after `first` are relative to the end, which is not changed by the edit
+        starts, old_num = self._starts, len(self._items)
+        tail = first
+        new_words: List[Tuple[LexItem, int, int]] = []
+        new_stacks: List[Tuple[int, ...]] = []
+        for lex_item, word_start, word_end in self.lexer._scan(text, self.group, pos, stack=stack):
+            relative_start = word_start - len(text)
+            while tail < old_num and starts[tail] < relative_start:
+                tail += 1
+            if tail < old_num and starts[tail] == relative_start and starts[tail] + old_length >= end and self._stacks[tail] == tuple(stack):
+                break
+            new_words.append((lex_item, word_start, word_end))
+            new_stacks.append(self._snapshot(stack, new_stacks))
+        else:
+            tail = old_num
+        self.text = text
+        self._items[first:tail] = [word[0] for word in new_words]
+        self._starts[first:tail] = [word[1] for word in new_words]
+        self._lengths[first:tail] = [word[2] - word[1] for word in new_words]
+        self._stacks[first:tail] = new_stacks
+        self._gap = first + len(new_words)
+        return first, tail - first, new_words
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, index: int) -> Tuple[LexItem, int, int]:
+        """
+        The word `index` as (Lex item, start, end).
+        """
+        if index < 0:
+            index += len(self._items)
+        start = self._start(index)
+        return self._items[index], start, start + self._lengths[index]
+
+    def __iter__(self) -> Iterator[Tuple[LexItem, int, int]]:
+        for index in range(len(self._items)):
+            yield self[index]
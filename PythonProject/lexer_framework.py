@@ -14,9 +14,26 @@
 #    You should have received a copy of the GNU General Public License
 #    along with this program.If not, see<https://www.gnu.org/licenses/>.
 
-from typing import Callable, Any, List, Tuple
+from enum import Enum
+from typing import AbstractSet, AsyncIterator, Callable, Any, List, Tuple, Dict, Optional, Iterable, Iterator, Union
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import codecs
+import copy
+import functools
+import hashlib
+import pickle
 import re
 import io
+import mmap
+import os
+import sys
+import time
+
+from dfa_lexer import DFAGroupMatcher, FirstCharDispatch
+from symbol_table import SymbolTable
 
 
 class IlleagalNameException(Exception):
@@ -91,6 +108,29 @@ class GroupNumException(Exception):
         return f"AddLexItem Error: illeagal Lex group number: {self.group}"
 
 
+class GroupStackException(Exception):
+    """
+    Exception produeced while a Lex item pops the base Lex Group of scanning.
+    """
+
+    def __init__(self, name: str, *args: object) -> None:
+        """
+        Construct menthod
+
+        Parameters
+        ----------
+        name : str
+            name of the popping Lex item
+        *args
+            for super class Exception
+        """
+        super().__init__(*args)
+        self.name = name
+
+    def __str__(self):
+        return f"Lex Error: Lex item {self.name} pops the base Lex group"
+
+
 class NoMatchException(Exception):
     """
     Exception produeced while no lex items in group match the rest text.
@@ -129,6 +169,20 @@ class LexItem:
         Callable of formatting the result of RegExpr
     self.regex : :obj:'re.Pattern'
         Regex operation
+    self.kind : int
+        symbol id of name in :obj:`SymbolTable`, -1 if not in table
+    self.is_interned : bool
+        intern the lexemes, for identifiers and reserved words
+    self.keywords : :obj:`dict` of str to :obj:`LexItem`
+        the reserved words table of identifier, the matched lexeme in table is classified as the reserved word Lex item, None if not identifier
+    self.is_skip : bool
+        skip the matched words without formatting and results, for blanks and comments
+    self.is_lazy : bool
+        format the matched words on the first access of value, see :obj:`LazyValue`
+    self.push_group : int
+        the Lex Group pushed as the active group after matching, None if not push
+    self.pop_group : bool
+        pop the active Lex Group after matching, before pushing `push_group`
     """
 
     def __init__(self, name: str, format_cap_text: Callable[[str], Any]):
@@ -151,6 +205,13 @@ class LexItem:
             raise IlleagalNameException(name)
         self.name = name
         self.format_cap_text = format_cap_text
+        self.kind = -1
+        self.is_interned = False
+        self.keywords: Optional[Dict[str, LexItem]] = None
+        self.is_skip = False
+        self.is_lazy = False
+        self.push_group: Optional[int] = None
+        self.pop_group = False
 
     def set_regex(self, reg_expr: str, reg_flags=0) -> None:
         """
@@ -164,6 +225,148 @@ class LexItem:
             https://docs.python.org/3/library/re.html#flags
         """
         self.regex = re.compile(reg_expr, reg_flags)
+        self.reg_expr = reg_expr
+        self.reg_flags = reg_flags
+
+    def scan_pattern(self) -> str:
+        """
+        The pattern without the leading "^", for matching at an offset by `pattern.match(s, pos)`, where "^" would only match at the real beginning of `s`.
+        """
+        if self.reg_expr[:1] == '^':
+            return self.reg_expr[1:]
+        return self.reg_expr
+
+
+class LineIndex:
+    """
+    Offsets of line breaks in a text, built lazily, to resolve an offset into (line, col) by bisection.
+
+    Parameters
+    ----------
+    self.text : str or bytes-like
+        the text
+    self.line : int
+        the line of the beginning of text
+    self.col : int
+        the column of the beginning of text
+    self.encoding : str
+        the encoding of bytes-like text, whose columns count the decoded chars, None for str
+    """
+
+    def __init__(self, text: Any, line: int = 1, col: int = 1, encoding: Optional[str] = None) -> None:
+        """
+        Construct method
+
+        Parameters
+        ----------
+        text : str
+            the text
+        line : int, optional
+            the line of the beginning of text, for a chunk of stream
+        col : int, optional
+            the column of the beginning of text, for a chunk of stream
+        encoding : str, optional
+            the encoding of bytes-like text
+        """
+        self.text = text
+        self.line = line
+        self.col = col
+        self.encoding = encoding
+        self._newlines: Optional[array] = None
+
+    def position(self, offset: int) -> Tuple[int, int]:
+        """
+        Resolve `offset` into (line, col), both start from 1.
+
+        Parameters
+        ----------
+        offset : int
+            offset in text
+
+        Returns
+        -------
+        :obj:`Tuple` of :obj:`int, int`
+            (line, col)
+        """
+        if self._newlines is None:
+            self._newlines = array('Q', (match.start()
+                                   for match in re.finditer('\n' if self.encoding is None else b'\n', self.text)))
+        line = bisect_left(self._newlines, offset)
+        line_start = self._newlines[line - 1] + 1 if line else 0
+        col = offset - line_start
+        if self.encoding is not None:
+            col = len(str(self.text[line_start:offset],
+                      self.encoding, "replace"))
+        if line == 0:
+            return self.line, self.col + col
+        return self.line + line, col + 1
+
+
+class LazyPosition:
+    """
+    The position of a word resolved from its offset by :obj:`LineIndex` on first access, so Lexing a buffer only keeps offsets.
+
+    Parameters
+    ----------
+    self.line_index : :obj:`LineIndex`
+        the line index of Lexed text
+    self.offset : int
+        offset of word
+    """
+
+    __slots__ = ('line_index', 'offset')
+
+    def __init__(self, line_index: LineIndex, offset: int) -> None:
+        self.line_index = line_index
+        self.offset = offset
+
+    def get(self) -> Tuple[int, int]:
+        """
+        Resolve the (line, col).
+        """
+        return self.line_index.position(self.offset)
+
+
+class LazyValue:
+    """
+    The value of a word formated on first access, which keeps the raw lexeme span instead of the formated value.
+
+    Parameters
+    ----------
+    self.format_cap_text : :obj:`Callable` of :obj:`[str], Any`
+        Callable of formatting the lexeme
+    self.text : str or bytes-like
+        the text containing lexeme
+    self.start : int
+        start of lexeme in text
+    self.end : int
+        end of lexeme in text
+    self.encoding : str
+        the encoding of bytes-like text, the lexeme is decoded before formatting, None for str
+    """
+
+    __slots__ = ('format_cap_text', 'text', 'start', 'end', 'encoding')
+
+    def __init__(self, format_cap_text: Callable[[str], Any], text: Any, start: int, end: int, encoding: Optional[str] = None) -> None:
+        self.format_cap_text = format_cap_text
+        self.text = text
+        self.start = start
+        self.end = end
+        self.encoding = encoding
+
+    def lexeme(self) -> str:
+        """
+        The raw lexeme.
+        """
+        if self.encoding is None:
+            return self.text[self.start:self.end]
+        return str(self.text[self.start:self.end], self.encoding)
+
+    def get(self) -> Any:
+        """
+        Format the lexeme.
+        """
+        return self.format_cap_text(self.lexeme())
 
 
 class LexerResult:
@@ -177,12 +380,20 @@ class LexerResult:
     self.name : str
         Name of Lex Item
     self.value : :obj:`Any`
-        Value of Lex result
+        Value of Lex result, the :obj:`LazyValue` is formated on first access and cached
+    self.raw_value : :obj:`Any`
+        Value of Lex result without formating :obj:`LazyValue`
     self.position : :obj:`Tuple` of :obj:`int, int`
-        position of item (line, col)
+        position of item (line, col), the :obj:`LazyPosition` is resolved on first access and cached
+    self.raw_position : :obj:`Tuple` of :obj:`int, int` or :obj:`LazyPosition`
+        position without resolving :obj:`LazyPosition`
+    self.offset : int
+        offset of item in the whole buffer, -1 if lexed line by line
+    self.kind : int
+        symbol id of name in :obj:`SymbolTable`, -1 if not in table
     """
 
-    def __init__(self, index: int, name: str, value: Any, line: int, col: int):
+    def __init__(self, index: int, name: str, value: Any, line: int, col: int, offset: int = -1, kind: int = -1, position: Optional[LazyPosition] = None):
         """
         Construct method
 
@@ -198,211 +409,2175 @@ class LexerResult:
             line number
         col : int
             column number
+        offset : int, optional
+            offset in the whole buffer
+        kind : int, optional
+            symbol id of name
+        position : :obj:`LazyPosition`, optional
+            the lazy position instead of line and col
         """
         self.index = index
         self.name = name
-        self.value = value
-        self.position = (line, col)
-
-
-class LexerFramework:
+        self.raw_value = value
+        self.raw_position = (line, col) if position is None else position
+        self.offset = offset
+        self.kind = kind
+
+    @property
+    def value(self) -> Any:
+        value = self.raw_value
+        if type(value) is LazyValue:
+            value = self.raw_value = value.get()
+        return value
+
+    @value.setter
+    def value(self, value: Any) -> None:
+        self.raw_value = value
+
+    @property
+    def position(self) -> Tuple[int, int]:
+        position = self.raw_position
+        if type(position) is LazyPosition:
+            position = self.raw_position = position.get()
+        return position
+
+    @position.setter
+    def position(self, position: Tuple[int, int]) -> None:
+        self.raw_position = position
+
+
+class TokenView:
     """
-    Framework of Lexer
+    Lightweight view of one token in :obj:`TokenBuffer`, has the same attributes as :obj:`LexerResult` and is created only when accessed.
 
     Parameters
     ----------
-    self.lex_item_groups : :obj:`List` of :obj:`List` of :obj:`LexItem`
-        Groups of Lex Items in list
-    self.on_lexed_callback: :obj:`Callable` of :obj:`[LexerResult], bool`
-        the callback when single Lex result produced to judge whether accept this lex result.
-    self.on_accepted_callback: :obj:`Callable` of :obj:`[LexerResult], None`
-        the callback when single Lex result accepted by on_lexed_callback
+    self.index : int
+        Order of token
     """
 
-    def __init__(self, lex_item_groups: List[List[LexItem]] = [[]]):
+    __slots__ = ('_buffer', 'index')
+
+    def __init__(self, buffer, index: int) -> None:
         """
-        Construct menthod with LexItems
+        Construct method
 
         Parameters
         ----------
-        lex_items : :obj:`List` of :obj:`LexItem`, optional
-            Prepared LexItemGroups
+        buffer : :obj:`TokenBuffer`
+            the buffer
+        index : int
+            Order of token
         """
-        self.lex_item_groups = lex_item_groups
+        self._buffer = buffer
+        self.index = index
 
-    def add_lex_group(self, lex_items: List[LexItem] = []):
+    @property
+    def name(self) -> str:
+        return self._buffer.names[self._buffer.kinds[self.index]]
+
+    @property
+    def value(self) -> Any:
+        return self._buffer.value(self.index)
+
+    @property
+    def raw_value(self) -> Any:
+        return self._buffer.raw_value(self.index)
+
+    @property
+    def position(self) -> Tuple[int, int]:
+        return self._buffer.position(self.index)
+
+    @property
+    def raw_position(self) -> LazyPosition:
+        return LazyPosition(self._buffer.line_index, self._buffer.starts[self.index])
+
+    @property
+    def offset(self) -> int:
+        return self._buffer.starts[self.index]
+
+    @property
+    def kind(self) -> int:
+        # kinds in buffer are not symbol ids
+        return -1
+
+
+class TokenBuffer:
+    """
+    Columnar storage of tokens, as a compact alternative to :obj:`LexerResult` objects. Tokens are stored in parallel typed arrays, and the value is kept in a side table only when it is not the lexeme itself.
+
+    Parameters
+    ----------
+    self.text : str or bytes-like
+        the Lexed text
+    self.encoding : str
+        the encoding of bytes-like text, the lexemes are decoded on access, None for str
+    self.names : :obj:`list` of str
+        kind id to name of Lex item
+    self.kinds : :obj:`array` of 'I'
+        kind id of each token
+    self.starts : :obj:`array` of 'Q'
+        start offset of each token
+    self.lengths : :obj:`array` of 'I'
+        length of each token
+    self.values : :obj:`dict` of int to :obj:`Any`
+        token index to formated value, for values not equal to the lexeme
+    self.formats : :obj:`dict` of int to :obj:`Callable`
+        token index to `format_cap_text` of lazy Lex item, which is applied on first access of value
+    self.line_index : :obj:`LineIndex`
+        to resolve positions
+    """
+
+    def __init__(self, text: Any, encoding: Optional[str] = None) -> None:
         """
-        Add a new group of lex items.
+        Construct method
 
         Parameters
         ----------
-        lex_items : :obj:`List` of :obj:`LexItem`, optional
-            new group of lex items
+        text : str or bytes-like
+            the Lexed text
+        encoding : str, optional
+            the encoding of bytes-like text
         """
-        self.lex_item_groups.append(lex_items)
+        self.text = text
+        self.encoding = encoding
+        self.names: List[str] = []
+        self._kind_dict: Dict[str, int] = {}
+        self.kinds = array('I')
+        self.starts = array('Q')
+        self.lengths = array('I')
+        self.values: Dict[int, Any] = {}
+        self.formats: Dict[int, Callable[[str], Any]] = {}
+        self.line_index = LineIndex(text, encoding=encoding)
+
+    def kind_id(self, name: str) -> int:
+        """
+        Get the kind id of `name`, add it if new.
+        """
+        kind = self._kind_dict.get(name)
+        if kind is None:
+            kind = len(self.names)
+            self._kind_dict[name] = kind
+            self.names.append(name)
+        return kind
+
+    def append(self, kind: int, start: int, length: int) -> None:
+        """
+        Append a token, whose value is the lexeme, or set `self.values[index]` after appending.
+        """
+        self.kinds.append(kind)
+        self.starts.append(start)
+        self.lengths.append(length)
 
-    @staticmethod
-    def none_format_cap_text(s: str) -> Any:
-        return s
+    def lexeme(self, index: int) -> str:
+        """
+        The lexeme of token `index`.
+        """
+        start = self.starts[index]
+        if self.encoding is None:
+            return self.text[start:start + self.lengths[index]]
+        return str(self.text[start:start + self.lengths[index]], self.encoding)
 
-    def add_lex_item(self, name: str, reg_expr: str, format_cap_text: Callable[[str], Any] = none_format_cap_text, reg_flags=0, group: int = 0) -> None:
+    def value(self, index: int) -> Any:
         """
-        Add a Lex item, and Lex with this order.
+        The formated value of token `index`.
+        """
+        if index in self.values:
+            return self.values[index]
+        format_cap_text = self.formats.pop(index, None)
+        if format_cap_text is not None:
+            value = self.values[index] = format_cap_text(self.lexeme(index))
+            return value
+        return self.lexeme(index)
+
+    def raw_value(self, index: int) -> Any:
+        """
+        The value of token `index`, :obj:`LazyValue` if it is not formated yet.
+        """
+        format_cap_text = self.formats.get(index)
+        if format_cap_text is not None:
+            start = self.starts[index]
+            return LazyValue(format_cap_text, self.text, start, start + self.lengths[index], self.encoding)
+        return self.value(index)
 
-        Parameters
-        ----------
-        name : str
-            Name of item
-        reg_expr : str
-            Regular Expression of Lex, and automately add "^" at head
-        format_cap_text : :obj:`Callable` of :obj:`[str], Any`, optional
-            Callable of formatting the result of RegExpr
-        reg_flags : optional
-            https://docs.python.org/3/library/re.html#flags
-        group : int, optional
-            the Lex Group, for advanced usage, eg. you can define multiple groups and use LexerFramework for different scenarios.
+    def position(self, index: int) -> Tuple[int, int]:
         """
-        if name is None:
-            return
-        if reg_expr is None:
-            return
-        lex_item = LexItem(name, format_cap_text)
-        if reg_expr[0] != '^':
-            reg_expr = '^' + reg_expr
-        lex_item.set_regex(reg_expr, reg_flags)
-        if group >= len(self.lex_item_groups) or group < 0:
-            raise GroupNumException(group)
-        self.lex_item_groups[group].append(lex_item)
+        The (line, col) of token `index`.
+        """
+        return self.line_index.position(self.starts[index])
 
-    def set_on_lexed_callback(self, callback: Callable[[LexerResult], bool]) -> None:
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, index: int) -> TokenView:
+        if index < 0:
+            index += len(self.kinds)
+        if index < 0 or index >= len(self.kinds):
+            raise IndexError(index)
+        return TokenView(self, index)
+
+    def __iter__(self) -> Iterator[TokenView]:
+        for index in range(len(self.kinds)):
+            yield TokenView(self, index)
+
+
+class ItemGroupMatcher:
+    """
+    Matcher of a Lex group, which tries the Lex items one by one in declaration order at the position, and the first matched item wins. Only the items that may match the char at the position are tried, see :obj:`dfa_lexer.FirstCharDispatch`.
+
+    Parameters
+    ----------
+    self.lex_items : :obj:`List` of :obj:`LexItem`
+        Lex items of the group
+    self.dispatch : :obj:`FirstCharDispatch`
+        the candidate items of first char
+    self.encoding : str
+        the encoding of byte patterns for bytes-like text, None for str
+    """
+
+    def __init__(self, lex_items: List[LexItem], encoding: Optional[str] = None) -> None:
         """
-        Set the callback when single Lex result produced. Accept(return true) or not(return false) the single lex result.
+        Construct method, compile the regexes without leading "^".
 
         Parameters
         ----------
-        1st : :obj:`LexerResult`
-            one result of lex
+        lex_items : :obj:`List` of :obj:`LexItem`
+            Lex items of the group, in declaration order
+        encoding : str, optional
+            compile byte patterns encoded by `encoding`, and match bytes-like text by :obj:`match_bytes()`
         """
-        self.on_lexed_callback = callback
-
-    def set_on_accepted_callback(self, callback: Callable[[LexerResult], None]) -> None:
+        self.lex_items = lex_items
+        self.encoding = encoding
+        self._regexes = [(lex_item, _compile_pattern(lex_item.scan_pattern(), lex_item.reg_flags, encoding))
+                         for lex_item in lex_items]
+        self.dispatch = FirstCharDispatch(lex_items)
+        if encoding is not None:
+            self.match = self.match_bytes
+
+    def match(self, s: str, pos: int = 0) -> Optional[Tuple[LexItem, int]]:
         """
-        Set the callback when single Lex result accepted by on_lexed_callback, and you need to choice which parser framework you need in paring.
+        Match the Lex items at `pos` of `s`.
 
         Parameters
         ----------
-        1st : :obj:`LexerResult`
-            one result of lex
+        s : str
+            string to be matched
+        pos : int, optional
+            the position to start matching
+
+        Returns
+        -------
+        :obj:`Tuple` of :obj:`LexItem, int`
+            the matched Lex item and the end of match, None if no item matched
         """
-        self.on_accepted_callback = callback
+        regexes = self._regexes
+        for i in self.dispatch.candidates(s[pos:pos + 1]):
+            lex_item, regex = regexes[i]
+            match = regex.match(s, pos)
+            if match is not None:
+                return lex_item, match.end()
+        return None
+
+    def match_bytes(self, s: Any, pos: int = 0) -> Optional[Tuple[LexItem, int]]:
+        """
+        Match the Lex items at `pos` of bytes-like `s`, which replaces :obj:`match()` if `self.encoding` is set.
+        """
+        regexes = self._regexes
+        dispatch = self.dispatch
+        for i in dispatch.byte_candidates(s[pos]) if pos < len(s) else dispatch.candidates(''):
+            lex_item, regex = regexes[i]
+            match = regex.match(s, pos)
+            if match is not None:
+                return lex_item, match.end()
+        return None
 
-    def set_on_finished_callback(self, callback: Callable[[int], None]) -> None:
+
+LexEngine = Enum("LexEngine", "ITEMS REGEX DFA")
+"""
+The matching engine of :obj:`LexerFramework`. `ITEMS` tries the Lex items one by one, `REGEX` folds all Lex items of a group into one master regex, `DFA` compiles all Lex items of a group into one minimized DFA.
+"""
+
+# flags can be written as scoped inline flags "(?flags:...)" in the master regex
+_INLINE_FLAGS = ((re.IGNORECASE, 'i'), (re.MULTILINE, 'm'), (re.DOTALL, 's'), (re.VERBOSE, 'x'), (re.ASCII, 'a'))
+# numbered back reference or named group, which can not be folded into the master regex
+_UNFOLDABLE_REGEX = re.compile(r"(?<!\\)(?:\\\\)*\\[1-9]|\(\?P<")
+
+
+def _compile_pattern(pattern: str, reg_flags=0, encoding: Optional[str] = None) -> re.Pattern:
+    """
+    Compile `pattern` for scanning at offsets, as a byte pattern encoded by `encoding` if it is not None. Byte patterns match ASCII classes only, such as `\\w` and `\\d`, and the non-ASCII literals match their encoded bytes.
+
+    The pattern is compiled with `re.MULTILINE`, so `$` matches at the end of every line of a whole buffer as it does at the end of a stripped line of :obj:`LexerFramework.lex_stream()`.
+    """
+    if encoding is None:
+        return re.compile(pattern, reg_flags | re.MULTILINE)
+    return re.compile(pattern.encode(encoding), (int(reg_flags) & ~re.UNICODE) | re.MULTILINE)
+
+
+class RegexGroupMatcher:
+    """
+    Matcher of a Lex group, which folds the Lex items into alternations of named groups in declaration order, so one regex call finds the first item (in declaration order) matching at the position. Items that cannot be folded (with back reference, named group or unsupported flags) are matched alone and keep their order.
+
+    Parameters
+    ----------
+    self.lex_items : :obj:`List` of :obj:`LexItem`
+        Lex items of the group
+    self.encoding : str
+        the encoding of byte patterns for bytes-like text, None for str
+    """
+
+    def __init__(self, lex_items: List[LexItem], encoding: Optional[str] = None) -> None:
         """
-        Set the callback when all lex is done.
+        Construct method, compile the master regex(es).
 
         Parameters
         ----------
-        1st : int
-            the total number of lex results
+        lex_items : :obj:`List` of :obj:`LexItem`
+            Lex items of the group, in declaration order
+        encoding : str, optional
+            compile byte patterns encoded by `encoding`, for bytes-like text
         """
-        self.on_finished_callback = callback
+        self.lex_items = lex_items
+        self.encoding = encoding
+        # each run is (regex, dict of group name to LexItem), or (regex, LexItem) for the item matched alone
+        self._runs: List[Tuple[re.Pattern, Any]] = []
+        parts: List[str] = []
+        names: Dict[str, LexItem] = {}
+        for lex_item in lex_items:
+            inline_flags = self._inline_flags(lex_item.reg_flags)
+            pattern = lex_item.scan_pattern()
+            if inline_flags is None or _UNFOLDABLE_REGEX.search(pattern) is not None:
+                if parts:
+                    self._runs.append(
+                        (_compile_pattern("|".join(parts), 0, encoding), names))
+                    parts, names = [], {}
+                self._runs.append(
+                    (_compile_pattern(pattern, lex_item.reg_flags, encoding), lex_item))
+                continue
+            name = f"_{len(names)}"
+            names[name] = lex_item
+            if 'x' in inline_flags:
+                # end the possible trailing comment of verbose pattern
+                parts.append(f"(?P<{name}>(?{inline_flags}:{pattern}\n))")
+            elif inline_flags:
+                parts.append(f"(?P<{name}>(?{inline_flags}:{pattern}))")
+            else:
+                parts.append(f"(?P<{name}>{pattern})")
+        if parts:
+            self._runs.append(
+                (_compile_pattern("|".join(parts), 0, encoding), names))
 
-    def _lex_single_line(self, s: str, lex_item: LexItem, index: int, line: int, col: int) -> Tuple[str, int]:
+    @staticmethod
+    def _inline_flags(reg_flags) -> Optional[str]:
         """
-        Lex a single line string, if formated value equal null, then drop it and return true.
+        Convert `reg_flags` to inline flags letters, None if cannot.
+        """
+        reg_flags = int(reg_flags) & ~re.UNICODE
+        letters = ""
+        for flag, letter in _INLINE_FLAGS:
+            if reg_flags & flag:
+                letters += letter
+                reg_flags &= ~flag
+        if reg_flags:
+            return None
+        return letters
+
+    def match(self, s: str, pos: int = 0) -> Optional[Tuple[LexItem, int]]:
+        """
+        Match the Lex items at `pos` of `s`.
 
         Parameters
         ----------
         s : str
-            that string will be Lexed
-        lex_item : :obj:`LexItem`
-            Lex item for Lex string
-        index : int
-            index of Lex result
-        line : int
-            line number
-        col : int
-            column number
+            string to be matched
+        pos : int, optional
+            the position to start matching
 
         Returns
         -------
-        :obj:`Tuple` of :obj:`str, int`
-            new trimed string and the new index
+        :obj:`Tuple` of :obj:`LexItem, int`
+            the matched Lex item and the end of match, None if no item matched
+        """
+        for regex, items in self._runs:
+            match = regex.match(s, pos)
+            if match is not None:
+                if isinstance(items, LexItem):
+                    return items, match.end()
+                return items[match.lastgroup], match.end()
+        return None
 
-        Raises
-        ------
-        ZeroLenghtMatchException
-            when match the zero length word
+
+class LexItemStats:
+    """
+    Counters of matching a Lex item or a Lex group.
+
+    Parameters
+    ----------
+    self.attempts : int
+        the match attempts, counted per item by `LexEngine.ITEMS` only, and per group as the calls of matcher, or the positions tried by the line mode of :obj:`LexerFramework.lex_stream()`
+    self.matches : int
+        the successful matches
+    self.consumed : int
+        the chars (bytes in bytes mode) consumed by the matches
+    self.time : float
+        the cumulative match time in seconds
+    """
+
+    __slots__ = ('attempts', 'matches', 'consumed', 'time')
+
+    def __init__(self) -> None:
+        self.attempts = 0
+        self.matches = 0
+        self.consumed = 0
+        self.time = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"attempts": self.attempts, "matches": self.matches, "consumed": self.consumed, "time": self.time}
+
+
+class LexStats:
+    """
+    The instrumentation counters of a :obj:`LexerFramework`, see :obj:`LexerFramework.set_instrumentation()`.
+
+    Parameters
+    ----------
+    self.groups : :obj:`dict` of int to :obj:`LexItemStats`
+        the counters of each Lex Group
+    self.items : :obj:`dict` of int to :obj:`dict` of :obj:`LexItem` to :obj:`LexItemStats`
+        the counters of each Lex item in each Lex Group, in declaration order
+    """
+
+    def __init__(self) -> None:
+        self.groups: Dict[int, LexItemStats] = {}
+        self.items: Dict[int, Dict[LexItem, LexItemStats]] = {}
+
+    def group_stats(self, group: int) -> LexItemStats:
         """
-        match = lex_item.regex.match(s)
-        if match is None:
-            return s, index
-        result = match.group()
-        if result is None:
-            raise ZeroLenghtMatchException(
-                lex_item.name, lex_item.regex.pattern)
-        value = lex_item.format_cap_text(result)
-        if value:
-            lexer_result = LexerResult(index, lex_item.name, value, line, col)
-            if self.on_lexed_callback(lexer_result):
-                index += 1
-                self.on_accepted_callback(lexer_result)
-        s = s[len(result):]
-        return s, index
+        Get the counters of `group`, add them if new.
+        """
+        stats = self.groups.get(group)
+        if stats is None:
+            stats = self.groups[group] = LexItemStats()
+            self.items[group] = {}
+        return stats
 
-    def lex_stream(self, text_reader: io.IOBase, group: int = 0) -> int:
+    def item_stats(self, group: int, lex_item: LexItem) -> LexItemStats:
+        """
+        Get the counters of `lex_item` in `group`, add them if new.
         """
-        Lex multiple lines string stream(io.StringIO) or file stream(with open() func), but as single line read-parttern. If formated value equal null, then drop it. By the way, please get the result from on_lexed_callback(for filting result) and set_on_accepted_callback(for getting result) one by one. For example, you can write a collector for receiving results.
+        self.group_stats(group)
+        stats = self.items[group].get(lex_item)
+        if stats is None:
+            stats = self.items[group][lex_item] = LexItemStats()
+        return stats
 
-        Parameters
-        ----------
-        text_reader : :obj:`io.IOBase`
-            that multiple lines string will be Lexed
-        group : int, optional
-            the Lex Group, for advanced usage, eg. you can define multiple groups and use LexerFramework for different scenarios..
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Copy the counters as plain dicts and lists, which can be dumped as JSON.
 
         Returns
         -------
-        int
+        :obj:`dict`
+            {"groups": {group: counters}, "items": [counters with "group", "name" and "pattern"]}
+        """
+        items = []
+        for group, item_stats in self.items.items():
+            for lex_item, stats in item_stats.items():
+                item = {"group": group, "name": lex_item.name,
+                        "pattern": lex_item.scan_pattern()}
+                item.update(stats.as_dict())
+                items.append(item)
+        return {"groups": {group: stats.as_dict() for group, stats in self.groups.items()}, "items": items}
+
+    def report(self) -> str:
+        """
+        Format the counters as a table, Lex items sorted by the cumulative match time.
+        """
+        lines = [f"{'group':>5} {'item':<16} {'attempts':>10} {'matches':>10} {'consumed':>10} {'time(ms)':>10}  pattern"]
+        for group, stats in sorted(self.groups.items()):
+            lines.append(f"{group:>5} {'*':<16} {stats.attempts:>10} {stats.matches:>10} {stats.consumed:>10} {stats.time * 1000:>10.3f}")
+        items = self.snapshot()["items"]
+        items.sort(key=lambda item: item["time"], reverse=True)
+        for item in items:
+            lines.append(f"{item['group']:>5} {item['name']:<16} {item['attempts']:>10} {item['matches']:>10} {item['consumed']:>10} {item['time'] * 1000:>10.3f}  {item['pattern']}")
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        """
+        Reset all counters to zero.
+        """
+        for stats in list(self.groups.values()) + [stats for item_stats in self.items.values() for stats in item_stats.values()]:
+            stats.__init__()
+
+
+class _InstrumentedRegex:
+    """
+    Wrapper of the compiled regex of a Lex item in :obj:`ItemGroupMatcher`, which counts each attempt.
+    """
+
+    __slots__ = ('regex', 'stats')
+
+    def __init__(self, regex: re.Pattern, stats: LexItemStats) -> None:
+        self.regex = regex
+        self.stats = stats
+
+    @property
+    def pattern(self) -> Any:
+        return self.regex.pattern
+
+    def match(self, s: Any, pos: int = 0) -> Optional[re.Match]:
+        stats = self.stats
+        start = time.perf_counter()
+        match = self.regex.match(s, pos)
+        stats.time += time.perf_counter() - start
+        stats.attempts += 1
+        if match is not None:
+            stats.matches += 1
+            stats.consumed += match.end() - pos
+        return match
+
+
+class InstrumentedMatcher:
+    """
+    Wrapper of a group matcher, which counts the calls of `match(s, pos)` for the Lex Group. The regexes of :obj:`ItemGroupMatcher` are wrapped to count each Lex item, and for other matchers the matches and time are counted for the matched Lex item.
+
+    Parameters
+    ----------
+    self.matcher : :obj:`ItemGroupMatcher` or :obj:`RegexGroupMatcher` or :obj:`DFAGroupMatcher`
+        the wrapped matcher
+    """
+
+    def __init__(self, matcher: Any, stats: LexStats, group: int) -> None:
+        """
+        Construct method
+
+        Parameters
+        ----------
+        matcher : :obj:`ItemGroupMatcher` or :obj:`RegexGroupMatcher` or :obj:`DFAGroupMatcher`
+            the matcher to wrap
+        stats : :obj:`LexStats`
+            the counters
+        group : int
+            the Lex Group of matcher
+        """
+        self.matcher = matcher
+        self._group_stats = stats.group_stats(group)
+        self._item_stats = {lex_item: stats.item_stats(group, lex_item)
+                            for lex_item in matcher.lex_items}
+        self._per_item = isinstance(matcher, ItemGroupMatcher)
+        if self._per_item:
+            matcher._regexes = [(lex_item, _InstrumentedRegex(regex, self._item_stats[lex_item]))
+                                for lex_item, regex in matcher._regexes]
+
+    def match(self, s: Any, pos: int = 0) -> Optional[Tuple[LexItem, int]]:
+        """
+        Match by the wrapped matcher, and count.
+        """
+        start = time.perf_counter()
+        match = self.matcher.match(s, pos)
+        elapsed = time.perf_counter() - start
+        group_stats = self._group_stats
+        group_stats.attempts += 1
+        group_stats.time += elapsed
+        if match is not None:
+            group_stats.matches += 1
+            group_stats.consumed += match[1] - pos
+            if not self._per_item:
+                item_stats = self._item_stats[match[0]]
+                item_stats.matches += 1
+                item_stats.consumed += match[1] - pos
+                item_stats.time += elapsed
+        return match
+
+
+# the version of compiled matchers in :obj:`LexerFramework.spec_hash()`, changed when the matchers compile differently
+_MATCHERS_VERSION = 2
+
+
+class _SpecPickler(pickle.Pickler):
+    """
+    Pickler of compiled matchers, which stores the Lex items as (group, index) instead of pickling them with their `format_cap_text`.
+    """
+
+    def __init__(self, file: Any, item_ids: Dict[int, Tuple[int, int]]) -> None:
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._item_ids = item_ids
+
+    def persistent_id(self, obj: Any) -> Optional[Tuple[int, int]]:
+        if type(obj) is LexItem:
+            return self._item_ids[id(obj)]
+        return None
+
+
+class _SpecUnpickler(pickle.Unpickler):
+    """
+    Unpickler of compiled matchers, which resolves (group, index) to the Lex items of lexer.
+    """
+
+    def __init__(self, file: Any, lex_item_groups: List[List[LexItem]]) -> None:
+        super().__init__(file)
+        self._lex_item_groups = lex_item_groups
+
+    def persistent_load(self, pid: Tuple[int, int]) -> LexItem:
+        group, index = pid
+        return self._lex_item_groups[group][index]
+
+
+class LexerFramework:
+    """
+    Framework of Lexer
+
+    Parameters
+    ----------
+    self.lex_item_groups : :obj:`List` of :obj:`List` of :obj:`LexItem`
+        Groups of Lex Items in list
+    self.on_lexed_callback: :obj:`Callable` of :obj:`[LexerResult], bool`
+        the callback when single Lex result produced to judge whether accept this lex result.
+    self.on_accepted_callback: :obj:`Callable` of :obj:`[LexerResult], None`
+        the callback when single Lex result accepted by on_lexed_callback
+    self.on_accepted_batch_callback: :obj:`Callable` of :obj:`[List[LexerResult]], None`
+        the callback when a batch of Lex results accepted, None for delivering one by one
+    self.batch_size : int
+        the max size of batch for on_accepted_batch_callback
+    self.engine : :obj:`LexEngine`
+        the matching engine, see :obj:`set_engine()`
+    self.symbol_table : :obj:`SymbolTable`
+        the symbol table shared with parser, see :obj:`set_symbol_table()`
+    self.expected_callback : :obj:`Callable` of :obj:`[], AbstractSet[str]`
+        the callback of terminals expected by parser, see :obj:`set_expected_callback()`
+    self.terminals : :obj:`AbstractSet` of str
+        the terminals restricted by `expected_callback`
+    self.bytes_encoding : str
+        the encoding of bytes mode, None if bytes-like buffers are decoded before Lexing, see :obj:`set_bytes_mode()`
+    self.stats : :obj:`LexStats`
+        the instrumentation counters, None if disabled, see :obj:`set_instrumentation()`
+    self.prescan : :obj:`char_prescan.CharClassPrescan`
+        the prescan of whole buffers, None if not used, see :obj:`set_prescan()`
+    """
+
+    def __init__(self, lex_item_groups: List[List[LexItem]] = [[]], engine: LexEngine = LexEngine.ITEMS):
+        """
+        Construct menthod with LexItems
+
+        Parameters
+        ----------
+        lex_items : :obj:`List` of :obj:`LexItem`, optional
+            Prepared LexItemGroups
+        engine : :obj:`LexEngine`, optional
+            the matching engine, see :obj:`set_engine()`
+        """
+        self.lex_item_groups = lex_item_groups
+        self.engine = engine
+        self.symbol_table: Optional[SymbolTable] = None
+        # group index to (number of items when built, matcher)
+        self._matchers: Dict[int, Tuple[int, Any]] = {}
+        self.bytes_encoding: Optional[str] = None
+        # group index to (number of items when built, matcher of byte patterns)
+        self._bytes_matchers: Dict[int, Tuple[int, Any]] = {}
+        self.stats: Optional[LexStats] = None
+        self.prescan: Optional[Any] = None
+        self.expected_callback: Optional[Callable[[], Optional[AbstractSet[str]]]] = None
+        self.terminals: AbstractSet[str] = frozenset()
+        # (group index, expected terminals, encoding) to (number of items when built, matcher)
+        self._expected_matchers: Dict[Tuple[int, AbstractSet[str], Optional[str]], Tuple[int, Any]] = {}
+        self.on_lexed_callback = self.none_on_lexed_callback
+        self.on_accepted_callback = self.none_on_accepted_callback
+        self.on_finished_callback = self.none_on_finished_callback
+        self.on_accepted_batch_callback: Optional[Callable[[List[LexerResult]], None]] = None
+        self.batch_size = 256
+
+    def set_engine(self, engine: LexEngine) -> None:
+        """
+        Set the matching engine.
+
+        `LexEngine.ITEMS` (default) tries the Lex items one by one at each position.
+
+        `LexEngine.REGEX` folds all Lex items of a group into one master regex, which is built lazily and rebuilt when the group is changed, so each token needs one regex call. The first item in declaration order that matches at the current position wins.
+
+        `LexEngine.DFA` compiles all Lex items of a group into one minimized DFA in the same lazy way, see :obj:`dfa_lexer.DFAGroupMatcher` for the supported regex subset. Items out of the subset fall back to `re`.
+
+        The line mode of :obj:`lex_stream()` with `LexEngine.ITEMS` keeps its legacy order: after a match, the Lex items declared after the matched one are tried first at the next position. `LexEngine.REGEX` and `LexEngine.DFA` scan the lines as :obj:`lex_buffer()` instead, where the first matching item at each position wins. So the results differ when an earlier item matches a prefix of a later one, for example with Sub `-` declared before Number `-?\\d+`, "--2" is "-", "-2" by `LexEngine.ITEMS` and "-", "-", "2" by the other engines.
+
+        Parameters
+        ----------
+        engine : :obj:`LexEngine`
+            the matching engine
+        """
+        self.engine = engine
+        self._matchers = {}
+        self._bytes_matchers = {}
+        self._expected_matchers = {}
+
+    def set_bytes_mode(self, encoding: Optional[str] = "utf-8") -> None:
+        """
+        Set the bytes mode, in which :obj:`lex_buffer()`, :obj:`lex_file()`, :obj:`lex_to_token_buffer()` and :obj:`iter_tokens()` scan `bytes`, `bytearray`, `memoryview` and `mmap` buffers directly by byte patterns, instead of decoding the whole buffer to `str`. It removes the decoding step and the decoded copy for ASCII-compatible inputs, such as UTF-8.
+
+        The lexemes are decoded by `encoding` only when they are formatted, so the words of skip items are never decoded and the words of lazy items are decoded on first access. :obj:`LexerResult.offset` counts bytes, while the columns of positions still count chars. The `encoding` arguments of the entries are ignored in this mode, and the text streams, chunks and `str` buffers are Lexed as before.
+
+        The patterns are encoded by `encoding`, so `\\w`, `\\d`, `\\s` and char classes match ASCII only, and the non-ASCII literals match their encoded bytes. The patterns should not match a part of multi-byte char. `LexEngine.DFA` builds its tables on chars, so it scans by the master regex of `LexEngine.REGEX` in this mode.
+
+        Parameters
+        ----------
+        encoding : str, optional
+            the encoding of buffers, None to unset the bytes mode
+        """
+        self.bytes_encoding = encoding
+        self._bytes_matchers = {}
+        self._expected_matchers = {}
+
+    def set_prescan(self, prescan: Optional[Any]) -> None:
+        """
+        Set the prescan of whole buffers, which finds the words of run items (such as blanks, numbers and identifiers) by a vectorized char class pass, and falls back to the matcher of engine at the other positions, for example `lexer.set_prescan(CharClassPrescan(lexer))` with :obj:`char_prescan.CharClassPrescan`, which requires NumPy. It is used by :obj:`lex_buffer()`, :obj:`lex_file()`, :obj:`lex_to_token_buffer()` and :obj:`iter_tokens()` of buffers, and the results are the same.
+
+        Parameters
+        ----------
+        prescan : :obj:`char_prescan.CharClassPrescan`
+            the prescan with method `scan(text, group)`, None to unset
+        """
+        self.prescan = prescan
+
+    def spec(self) -> List[List[Tuple]]:
+        """
+        Export the specification of Lex items which the matchers are compiled from, the reserved words tables of identifiers included.
+
+        Returns
+        -------
+        :obj:`list` of :obj:`list` of :obj:`Tuple`
+            for each Lex Group, (name, pattern, flags, skip, lazy, push_group, pop_group, reserved words) of each Lex item in order
+        """
+        return [[(lex_item.name, lex_item.reg_expr, int(lex_item.reg_flags), lex_item.is_skip, lex_item.is_lazy,
+                  lex_item.push_group, lex_item.pop_group,
+                  tuple(sorted((word, keyword.name) for word, keyword in lex_item.keywords.items())) if lex_item.keywords else ())
+                 for lex_item in lex_items] if lex_items is not None else None
+                for lex_items in self.lex_item_groups]
+
+    def spec_hash(self) -> str:
+        """
+        The sha256 content hash of :obj:`spec()`, the engine and the bytes mode, as the key of compiled matchers.
+        """
+        content = repr((_MATCHERS_VERSION, self.engine.name, self.bytes_encoding, self.spec()))
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def save_compiled(self, path: str) -> None:
+        """
+        Compile the matchers of all Lex Groups for the engine (and the bytes mode), use them, and save them with :obj:`spec_hash()` to a cache file by pickle. The derived tables are saved, such as the DFA of `LexEngine.DFA`, the master regexes of `LexEngine.REGEX` and the first char dispatch of `LexEngine.ITEMS`, while the Lex items and their `format_cap_text` are not saved. The `re` patterns are pickled as pattern strings, so they are still compiled on loading.
+
+        Parameters
+        ----------
+        path : str
+            path of cache file, written atomically
+        """
+        item_ids = {id(lex_item): (group, index)
+                    for group, lex_items in enumerate(self.lex_item_groups) if lex_items is not None
+                    for index, lex_item in enumerate(lex_items)}
+        matchers = self._compiled_matchers()
+        bytes_matchers = {}
+        if self.bytes_encoding is not None:
+            bytes_matchers = self._compiled_matchers(self.bytes_encoding)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            _SpecPickler(f, item_ids).dump(
+                (self.spec_hash(), matchers, bytes_matchers))
+        os.replace(temp_path, path)
+        self._install_matchers(matchers, bytes_matchers)
+
+    def load_compiled(self, path: str) -> bool:
+        """
+        Load the matchers saved by :obj:`save_compiled()` into this lexer, if the cache file exists and its :obj:`spec_hash()` is the same. The `format_cap_text` of Lex items are kept as they are. Only load trusted cache files, since they are unpickled.
+
+        Parameters
+        ----------
+        path : str
+            path of cache file
+
+        Returns
+        -------
+        bool
+            whether the matchers are loaded
+        """
+        try:
+            with open(path, "rb") as f:
+                spec_hash, matchers, bytes_matchers = _SpecUnpickler(
+                    f, self.lex_item_groups).load()
+        except (OSError, EOFError, pickle.UnpicklingError, IndexError, TypeError, ValueError, AttributeError):
+            return False
+        if spec_hash != self.spec_hash():
+            return False
+        self._install_matchers(matchers, bytes_matchers)
+        return True
+
+    def _compiled_matchers(self, encoding: Optional[str] = None) -> Dict[int, Any]:
+        """
+        The matchers of all Lex Groups without instrumentation, the cached ones are reused.
+        """
+        matchers = {}
+        for group, lex_items in enumerate(self.lex_item_groups):
+            if lex_items is None:
+                continue
+            if self.stats is None:
+                matchers[group] = self._get_matcher(group, encoding)
+            else:
+                matchers[group] = self._build_matcher(lex_items, encoding)
+        return matchers
+
+    def _install_matchers(self, matchers: Dict[int, Any], bytes_matchers: Dict[int, Any]) -> None:
+        """
+        Put the compiled matchers of groups into the caches of :obj:`_get_matcher()`.
+        """
+        for cache, compiled in ((self._matchers, matchers), (self._bytes_matchers, bytes_matchers)):
+            for group, matcher in compiled.items():
+                if self.stats is not None:
+                    matcher = InstrumentedMatcher(matcher, self.stats, group)
+                cache[group] = (len(self.lex_item_groups[group]), matcher)
+
+    def use_compiled_cache(self, cache_dir: str) -> bool:
+        """
+        Load the compiled matchers from `cache_dir` keyed by :obj:`spec_hash()`, or compile and save them if not cached, so the short-lived processes with the same Lex items skip compiling, for example `lexer.use_compiled_cache(os.path.expanduser("~/.cache/my_lang"))` after adding Lex items.
+
+        Only the DFA of `LexEngine.DFA` is worth caching. The matchers of `LexEngine.ITEMS` and `LexEngine.REGEX` are `re` patterns compiled again on loading, so the cache is not read or written for these engines.
+
+        Parameters
+        ----------
+        cache_dir : str
+            the directory of cache files, created if not exists
+
+        Returns
+        -------
+        bool
+            whether the matchers are loaded from cache, always False for `LexEngine.ITEMS` and `LexEngine.REGEX`
+        """
+        if self.engine != LexEngine.DFA:
+            return False
+        path = os.path.join(cache_dir, f"lexer-{self.spec_hash()}.pickle")
+        if self.load_compiled(path):
+            return True
+        os.makedirs(cache_dir, exist_ok=True)
+        self.save_compiled(path)
+        return False
+
+    def set_instrumentation(self, enabled: bool = True) -> None:
+        """
+        Enable or disable the instrumentation, which counts the attempts, matches, consumed chars and cumulative match time of each Lex item and each Lex Group in `self.stats`, see :obj:`LexStats.snapshot()` and :obj:`LexStats.report()`.
+
+        The matchers are rebuilt with instrumented wrappers, and the line mode of :obj:`lex_stream()` switches to an instrumented copy of its loop in the same matching order, so the results are the same as without instrumentation, and the normal scanning loops have no overhead when disabled. `LexEngine.ITEMS` counts the attempts of each Lex item, and other engines match a group at once, so the matches and time are counted for the matched Lex item. The worker processes of :obj:`lex_parallel()` are not counted.
+
+        Parameters
+        ----------
+        enabled : bool, optional
+            enable with new counters, or disable and drop the counters
+        """
+        self.stats = LexStats() if enabled else None
+        self._matchers = {}
+        self._bytes_matchers = {}
+        self._expected_matchers = {}
+
+    def _get_matcher(self, group: int, encoding: Optional[str] = None) -> Any:
+        """
+        Get the matcher of `group` for the engine, build it if the group is changed.
+
+        Parameters
+        ----------
+        group : int
+            the Lex Group
+        encoding : str, optional
+            get the matcher of byte patterns encoded by `encoding` in bytes mode
+
+        Returns
+        -------
+        :obj:`ItemGroupMatcher` or :obj:`RegexGroupMatcher` or :obj:`DFAGroupMatcher`
+            the matcher with method `match(s, pos)`
+        """
+        lex_items = self.lex_item_groups[group]
+        matchers = self._matchers if encoding is None else self._bytes_matchers
+        cached = matchers.get(group)
+        if cached is not None and cached[0] == len(lex_items):
+            return cached[1]
+        matcher = self._build_matcher(lex_items, encoding)
+        if self.stats is not None:
+            matcher = InstrumentedMatcher(matcher, self.stats, group)
+        matchers[group] = (len(lex_items), matcher)
+        return matcher
+
+    def _build_matcher(self, lex_items: List[LexItem], encoding: Optional[str] = None) -> Any:
+        """
+        Build the matcher of Lex items for the engine, of byte patterns if `encoding` is not None.
+        """
+        if encoding is not None:
+            if self.engine == LexEngine.ITEMS:
+                return ItemGroupMatcher(lex_items, encoding)
+            return RegexGroupMatcher(lex_items, encoding)
+        if self.engine == LexEngine.DFA:
+            return DFAGroupMatcher(lex_items)
+        if self.engine == LexEngine.REGEX:
+            return RegexGroupMatcher(lex_items)
+        return ItemGroupMatcher(lex_items)
+
+    def _get_expected_matcher(self, group: int, expected: AbstractSet[str], encoding: Optional[str] = None) -> Any:
+        """
+        Get the matcher of the Lex items in `group` which may produce the `expected` terminals, and the items not restricted, such as skip items and items whose names are not in `self.terminals`.
+        """
+        lex_items = self.lex_item_groups[group]
+        cached = self._expected_matchers.get((group, expected, encoding))
+        if cached is not None and cached[0] == len(lex_items):
+            return cached[1]
+        matcher = self._build_matcher([lex_item for lex_item in lex_items
+                                       if self._is_expected(lex_item, expected)], encoding)
+        if self.stats is not None:
+            matcher = InstrumentedMatcher(matcher, self.stats, group)
+        self._expected_matchers[(group, expected, encoding)] = (
+            len(lex_items), matcher)
+        return matcher
+
+    def _is_expected(self, lex_item: LexItem, expected: AbstractSet[str]) -> bool:
+        """
+        Whether `lex_item` may produce the `expected` terminals, or is not restricted, such as skip items and items whose names are not in `self.terminals`.
+        """
+        return (lex_item.is_skip or lex_item.name in expected or lex_item.name not in self.terminals
+                or bool(lex_item.keywords and any(keyword.name in expected for keyword in lex_item.keywords.values())))
+
+    def _expected_candidates(self, lex_items: List[LexItem], candidates: List[int]) -> List[int]:
+        """
+        Filter the candidate indexes of `lex_items` by the terminals expected by `self.expected_callback`, as :obj:`_get_expected_matcher()`.
+        """
+        expected = self.expected_callback()
+        if expected is None:
+            return candidates
+        return [i for i in candidates if self._is_expected(lex_items[i], expected)]
+
+    def set_expected_callback(self, callback: Optional[Callable[[], Optional[AbstractSet[str]]]], terminals: AbstractSet[str] = frozenset()) -> None:
+        """
+        Couple with parser, at each position only the Lex items of the terminals expected by parser are tried, for example `lexer.set_expected_callback(parser.expected_terminals, parser.terminals())` with a `LRParserFramework` parsing in `on_accepted_callback`. It cuts the match attempts and resolves the ambiguities, such as reserved word and identifier, by the grammar. The Lex items whose names are not in `terminals`, and skip items, are always tried.
+
+        The parser must parse each result before the next one is scanned, so do not use batch callback, :obj:`lex_chunks()`, :obj:`lex_parallel()` or `LexSession` in this mode. The line mode of :obj:`lex_stream()` keeps its matching order, and only the expected Lex items are tried at each position.
+
+        Parameters
+        ----------
+        callback : :obj:`Callable` of :obj:`[], AbstractSet[str]`
+            the callback returning the expected terminals (hashable, such as frozenset), None for any terminal, or None to unset
+        terminals : :obj:`AbstractSet` of str, optional
+            all terminals of grammar
+        """
+        self.expected_callback = callback
+        self.terminals = frozenset(terminals)
+        self._expected_matchers = {}
+
+    def add_lex_group(self, lex_items: List[LexItem] = []):
+        """
+        Add a new group of lex items.
+
+        Parameters
+        ----------
+        lex_items : :obj:`List` of :obj:`LexItem`, optional
+            new group of lex items
+        """
+        self.lex_item_groups.append(lex_items)
+        self._matchers.pop(len(self.lex_item_groups) - 1, None)
+        self._bytes_matchers.pop(len(self.lex_item_groups) - 1, None)
+
+    @staticmethod
+    def none_format_cap_text(s: str) -> Any:
+        return s
+
+    # the default is the plain function of the static method, which can be pickled to worker processes
+    def add_lex_item(self, name: str, reg_expr: str, format_cap_text: Callable[[str], Any] = none_format_cap_text.__func__, reg_flags=0, group: int = 0, skip: bool = False, lazy: bool = False, push_group: Optional[int] = None, pop_group: bool = False) -> Optional[LexItem]:
+        """
+        Add a Lex item, and Lex with this order.
+
+        Parameters
+        ----------
+        name : str
+            Name of item
+        reg_expr : str
+            Regular Expression of Lex, and automately add "^" at head
+        format_cap_text : :obj:`Callable` of :obj:`[str], Any`, optional
+            Callable of formatting the result of RegExpr
+        reg_flags : optional
+            https://docs.python.org/3/library/re.html#flags
+        group : int, optional
+            the Lex Group, for advanced usage, eg. you can define multiple groups and use LexerFramework for different scenarios.
+        skip : bool, optional
+            skip the matched words inline, without calling `format_cap_text`, creating :obj:`LexerResult` or invoking callbacks, which is cheaper than dropping them by `HLlangLexerFramework.drop_null`
+        lazy : bool, optional
+            call `format_cap_text` on the first access of value instead of matching, see :obj:`LazyValue`. The lazy values are never dropped, so use skip items for blanks
+        push_group : int, optional
+            push this Lex Group as the active group after matching, so the following text is scanned by its items, for nested lexical modes such as string interpolation
+        pop_group : bool, optional
+            pop the active Lex Group after matching, back to the group before the push. Both `pop_group` and `push_group` switch the active group, and the line mode of :obj:`lex_stream()` tries the switched group from its first Lex item
+
+        Returns
+        -------
+        :obj:`LexItem`
+            the added Lex item, None if name or reg_expr is None
+        """
+        if name is None:
+            return None
+        if reg_expr is None:
+            return None
+        lex_item = LexItem(name, format_cap_text)
+        if reg_expr[0] != '^':
+            reg_expr = '^' + reg_expr
+        lex_item.set_regex(reg_expr, reg_flags)
+        if group >= len(self.lex_item_groups) or group < 0:
+            raise GroupNumException(group)
+        if self.symbol_table is not None:
+            lex_item.kind = self.symbol_table.get_id(name)
+        lex_item.is_skip = skip
+        lex_item.is_lazy = lazy
+        lex_item.push_group = push_group
+        lex_item.pop_group = pop_group
+        self.lex_item_groups[group].append(lex_item)
+        self._matchers.pop(group, None)
+        self._bytes_matchers.pop(group, None)
+        return lex_item
+
+    def set_symbol_table(self, symbol_table: Optional[SymbolTable]) -> None:
+        """
+        Set the symbol table shared with parser, usually `parser.symbol_table` after `parser.build_table()`, then the Lex results carry the symbol id of their names in :obj:`LexerResult.kind`.
+
+        Parameters
+        ----------
+        symbol_table : :obj:`SymbolTable`
+            the symbol table, None to unset
+        """
+        self.symbol_table = symbol_table
+        for group in range(len(self.lex_item_groups)):
+            for lex_item in self._group_items(group):
+                if symbol_table is None:
+                    lex_item.kind = -1
+                else:
+                    lex_item.kind = symbol_table.get_id(lex_item.name)
+
+    def _group_items(self, group: int) -> List[LexItem]:
+        """
+        The Lex items of group followed by the reserved word Lex items in the tables of identifiers, which are not matched directly.
+        """
+        lex_items = list(self.lex_item_groups[group])
+        tables = []
+        for lex_item in self.lex_item_groups[group]:
+            if lex_item.keywords is not None and all(lex_item.keywords is not table for table in tables):
+                tables.append(lex_item.keywords)
+                lex_items.extend(lex_item.keywords.values())
+        return lex_items
+
+    def _all_group_items(self) -> List[LexItem]:
+        """
+        The Lex items of all groups as :obj:`_group_items()`, which index the Lex items in the same order in all processes.
+        """
+        return [lex_item for group, lex_items in enumerate(self.lex_item_groups) if lex_items is not None
+                for lex_item in self._group_items(group)]
+
+    @staticmethod
+    def none_on_lexed_callback(lexer_result: LexerResult) -> bool:
+        return True
+
+    @staticmethod
+    def none_on_accepted_callback(lexer_result: LexerResult) -> None:
+        pass
+
+    @staticmethod
+    def none_on_finished_callback(num: int) -> None:
+        pass
+
+    def set_on_lexed_callback(self, callback: Callable[[LexerResult], bool]) -> None:
+        """
+        Set the callback when single Lex result produced. Accept(return true) or not(return false) the single lex result.
+
+        Parameters
+        ----------
+        1st : :obj:`LexerResult`
+            one result of lex
+        """
+        self.on_lexed_callback = callback
+
+    def set_on_accepted_callback(self, callback: Callable[[LexerResult], None]) -> None:
+        """
+        Set the callback when single Lex result accepted by on_lexed_callback, and you need to choice which parser framework you need in paring.
+
+        Parameters
+        ----------
+        1st : :obj:`LexerResult`
+            one result of lex
+        """
+        self.on_accepted_callback = callback
+
+    def set_on_accepted_batch_callback(self, callback: Optional[Callable[[List[LexerResult]], None]], batch_size: int = 256) -> None:
+        """
+        Set the callback when a batch of Lex results accepted by on_lexed_callback, instead of on_accepted_callback one by one. The batch is delivered when it is full and before on_finished_callback. For example, `lexer.set_on_accepted_batch_callback(parser.parse_lex_units)`. Set None to deliver one by one again.
+
+        Parameters
+        ----------
+        callback : :obj:`Callable` of :obj:`[List[LexerResult]], None`
+            the callback, 1st parameter is the list of accepted results in order
+        batch_size : int, optional
+            the max size of batch
+        """
+        self.on_accepted_batch_callback = callback
+        self.batch_size = batch_size
+
+    def _batch_collector(self) -> Tuple[Callable[[LexerResult], None], Callable[[], None]]:
+        """
+        Make the collector of batch mode.
+
+        Returns
+        -------
+        :obj:`Tuple`
+            the callable to add one accepted result, and the callable to deliver the rest batch
+        """
+        batch: List[LexerResult] = []
+        batch_size = self.batch_size
+        on_accepted_batch_callback = self.on_accepted_batch_callback
+
+        def add(lexer_result: LexerResult) -> None:
+            batch.append(lexer_result)
+            if len(batch) >= batch_size:
+                on_accepted_batch_callback(batch[:])
+                batch.clear()
+
+        def flush() -> None:
+            if batch:
+                on_accepted_batch_callback(batch[:])
+                batch.clear()
+
+        return add, flush
+
+    def set_on_finished_callback(self, callback: Callable[[int], None]) -> None:
+        """
+        Set the callback when all lex is done.
+
+        Parameters
+        ----------
+        1st : int
+            the total number of lex results
+        """
+        self.on_finished_callback = callback
+
+    def _lex_single_line(self, s: str, lex_item: LexItem, index: int, line: int, col: int, on_accepted: Callable[[LexerResult], None] = None) -> Tuple[str, int]:
+        """
+        Lex a single line string, if formated value equal null, then drop it and return true.
+
+        Parameters
+        ----------
+        s : str
+            that string will be Lexed
+        lex_item : :obj:`LexItem`
+            Lex item for Lex string
+        index : int
+            index of Lex result
+        line : int
+            line number
+        col : int
+            column number
+        on_accepted : :obj:`Callable` of :obj:`[LexerResult], None`, optional
+            instead of on_accepted_callback
+
+        Returns
+        -------
+        :obj:`Tuple` of :obj:`str, int`
+            new trimed string and the new index
+
+        Raises
+        ------
+        ZeroLenghtMatchException
+            when match the zero length word
+        """
+        match = lex_item.regex.match(s)
+        if match is None:
+            return s, index
+        result = match.group()
+        if result is None:
+            raise ZeroLenghtMatchException(
+                lex_item.name, lex_item.regex.pattern)
+        if lex_item.keywords:
+            lex_item = lex_item.keywords.get(result, lex_item)
+        if lex_item.is_skip:
+            return s[len(result):], index
+        if lex_item.is_interned:
+            result = sys.intern(result)
+        if lex_item.is_lazy:
+            value = LazyValue(lex_item.format_cap_text,
+                              result, 0, len(result))
+        else:
+            value = lex_item.format_cap_text(result)
+        if value:
+            lexer_result = LexerResult(
+                index, lex_item.name, value, line, col, -1, lex_item.kind)
+            if self.on_lexed_callback(lexer_result):
+                index += 1
+                if on_accepted is None:
+                    self.on_accepted_callback(lexer_result)
+                else:
+                    on_accepted(lexer_result)
+        s = s[len(result):]
+        return s, index
+
+    def lex_stream(self, text_reader: io.IOBase, group: int = 0) -> int:
+        """
+        Lex multiple lines string stream(io.StringIO) or file stream(with open() func), but as single line read-parttern. If formated value equal null, then drop it. By the way, please get the result from on_lexed_callback(for filting result) and set_on_accepted_callback(for getting result) one by one. For example, you can write a collector for receiving results. The reader must be seekable, use :obj:`lex_reader()` for pipes and `sys.stdin`.
+
+        Parameters
+        ----------
+        text_reader : :obj:`io.IOBase`
+            that multiple lines string will be Lexed
+        group : int, optional
+            the Lex Group, for advanced usage, eg. you can define multiple groups and use LexerFramework for different scenarios..
+
+        Returns
+        -------
+        int
             the count of results
 
         Raises
         ------
         NoMatchException
-            if input line cannot be matched by Lex items
+            if input line cannot be matched by Lex items
+        """
+        if self.lex_item_groups[group] is None:
+            return 0
+        if self.engine != LexEngine.ITEMS:
+            return self._deliver(self._iter_line_values(text_reader, group))
+        if self.stats is not None:
+            return self._lex_stream_instrumented(text_reader, group)
+        lex_items = self.lex_item_groups[group]
+        dispatch = self._get_matcher(group).dispatch
+        # the group stack lasts across lines
+        stack = [group]
+        expected_callback = self.expected_callback
+        index = 0
+        line = 0
+        pos = -1
+        on_accepted, flush = None, None
+        if self.on_accepted_batch_callback is not None:
+            on_accepted, flush = self._batch_collector()
+        while text_reader.tell() != pos:
+            pos = text_reader.tell()
+            line_text = str(text_reader.readline()).strip()
+            line += 1
+            col_num = len(line_text)
+            while line_text:
+                is_match = False
+                col = col_num - len(line_text) + 1
+                # skip the items that cannot match the first char, the rest keep declaration order
+                candidates = dispatch.candidates(line_text[0])
+                if expected_callback is not None:
+                    candidates = self._expected_candidates(
+                        lex_items, candidates)
+                k = 0
+                while k < len(candidates):
+                    i = candidates[k]
+                    k += 1
+                    text_len = len(line_text)
+                    lex_text = line_text
+                    line_text, new_index = self._lex_single_line(
+                        line_text, lex_items[i], index, line, col, on_accepted)
+                    if new_index != index:
+                        is_match = True
+                        index = new_index
+                    if len(line_text) != text_len:
+                        # skip items and dropped words match without results
+                        is_match = True
+                        col = col_num - len(line_text) + 1
+                        lex_item = lex_items[i]
+                        if lex_item.keywords:
+                            lex_item = lex_item.keywords.get(
+                                lex_text[:text_len - len(line_text)], lex_item)
+                        if lex_item.push_group is not None or lex_item.pop_group:
+                            # the switched group is tried from its first Lex item
+                            group = self._switch_group(stack, lex_item)
+                            lex_items = self.lex_item_groups[group]
+                            dispatch = self._get_matcher(group).dispatch
+                            i = -1
+                        candidates = dispatch.candidates(line_text[:1])
+                        if expected_callback is not None:
+                            candidates = self._expected_candidates(
+                                lex_items, candidates)
+                        k = bisect_right(candidates, i)
+                if not is_match:
+                    raise NoMatchException(line, col)
+        if flush is not None:
+            flush()
+        self.on_finished_callback(index)
+        return index
+
+    def _lex_stream_instrumented(self, text_reader: io.IOBase, group: int = 0) -> int:
+        """
+        The line mode of :obj:`lex_stream()` with instrumentation, in the same matching order. The Lex items are matched by copies with the instrumented regexes, and the group counters count the positions tried, the matches, the consumed chars and the match time, so the normal loop is not changed.
+        """
+        stats = self.stats
+        # the Lex items with instrumented regexes of each group
+        instrumented = {}
+
+        def stream_group(group: int) -> Tuple[List[LexItem], List[LexItem], FirstCharDispatch, LexItemStats]:
+            if group not in instrumented:
+                matcher = self._get_matcher(group).matcher
+                items = []
+                for lex_item, regex in matcher._regexes:
+                    item = copy.copy(lex_item)
+                    item.regex = regex
+                    items.append(item)
+                instrumented[group] = (items, matcher.dispatch)
+            items, dispatch = instrumented[group]
+            return self.lex_item_groups[group], items, dispatch, stats.group_stats(group)
+
+        lex_items, items, dispatch, group_stats = stream_group(group)
+        # the group stack lasts across lines
+        stack = [group]
+        expected_callback = self.expected_callback
+        index = 0
+        line = 0
+        pos = -1
+        on_accepted, flush = None, None
+        if self.on_accepted_batch_callback is not None:
+            on_accepted, flush = self._batch_collector()
+        while text_reader.tell() != pos:
+            pos = text_reader.tell()
+            line_text = str(text_reader.readline()).strip()
+            line += 1
+            col_num = len(line_text)
+            while line_text:
+                is_match = False
+                col = col_num - len(line_text) + 1
+                candidates = dispatch.candidates(line_text[0])
+                if expected_callback is not None:
+                    candidates = self._expected_candidates(
+                        lex_items, candidates)
+                group_stats.attempts += 1
+                k = 0
+                while k < len(candidates):
+                    i = candidates[k]
+                    k += 1
+                    text_len = len(line_text)
+                    lex_text = line_text
+                    item_stats = items[i].regex.stats
+                    match_time = item_stats.time
+                    line_text, new_index = self._lex_single_line(
+                        line_text, items[i], index, line, col, on_accepted)
+                    group_stats.time += item_stats.time - match_time
+                    if new_index != index:
+                        is_match = True
+                        index = new_index
+                    if len(line_text) != text_len:
+                        is_match = True
+                        col = col_num - len(line_text) + 1
+                        group_stats.matches += 1
+                        group_stats.consumed += text_len - len(line_text)
+                        lex_item = lex_items[i]
+                        if lex_item.keywords:
+                            lex_item = lex_item.keywords.get(
+                                lex_text[:text_len - len(line_text)], lex_item)
+                        if lex_item.push_group is not None or lex_item.pop_group:
+                            group = self._switch_group(stack, lex_item)
+                            lex_items, items, dispatch, group_stats = stream_group(
+                                group)
+                            i = -1
+                        candidates = dispatch.candidates(line_text[:1])
+                        if expected_callback is not None:
+                            candidates = self._expected_candidates(
+                                lex_items, candidates)
+                        if line_text:
+                            group_stats.attempts += 1
+                        k = bisect_right(candidates, i)
+                if not is_match:
+                    raise NoMatchException(line, col)
+        if flush is not None:
+            flush()
+        self.on_finished_callback(index)
+        return index
+
+    @staticmethod
+    def _as_text(buf: Any, encoding: str) -> str:
+        """
+        Decode `bytes`, `bytearray`, `memoryview` or `mmap` buffer to `str` once, `str` is returned as it is.
+        """
+        if isinstance(buf, str):
+            return buf
+        return bytes(buf).decode(encoding)
+
+    @staticmethod
+    def _line_col(text: Any, pos: int, encoding: Optional[str] = None) -> Tuple[int, int]:
+        """
+        Line and column of offset `pos` in `text`, bytes-like `text` is indexed by :obj:`LineIndex` of `encoding`.
+        """
+        if encoding is not None:
+            return LineIndex(text, encoding=encoding).position(pos)
+        return text.count('\n', 0, pos) + 1, pos - text.rfind('\n', 0, pos)
+
+    def _scan(self, text: str, group: int = 0, pos: int = 0, limit: Optional[int] = None, stack: Optional[List[int]] = None, partial: bool = False) -> Iterator[Tuple[Optional[LexItem], int, int]]:
+        """
+        Scan `text` from offset `pos` by `pattern.match(text, pos)` without slicing the rest text. The words of skip items are consumed without yielding.
+
+        Bytes-like `text` is scanned by the matchers of byte patterns in bytes mode, see :obj:`set_bytes_mode()`.
+
+        The Lex items with `push_group` or `pop_group` switch the active group of a group stack, and each group is scanned by its own compiled matcher. The switch of a yielded word is applied when the scan is resumed, so `stack` holds the groups before the word while it is yielded.
+
+        Parameters
+        ----------
+        text : str or bytes-like
+            the whole text
+        group : int, optional
+            the Lex Group
+        pos : int, optional
+            the offset to start
+        limit : int, optional
+            stop before the word ending after `limit`, and yield (None, stop, stop) at last, for scanning a chunk of stream
+        stack : :obj:`list` of int, optional
+            the group stack to continue and update in place, `[group]` if None, for scanning across lines or chunks
+        partial : bool, optional
+            `text` is the fed part of stream, so stop instead of raising at the offset not matched, and stop before the word ending at the end of `text`, which may match after more text is fed
+
+        Yields
+        ------
+        :obj:`Tuple` of :obj:`LexItem, int, int`
+            the matched Lex item, start and end offset
+
+        Raises
+        ------
+        NoMatchException
+            if text at the offset cannot be matched by Lex items
+        ZeroLenghtMatchException
+            when match the zero length word
+        GroupStackException
+            when a Lex item pops the base group
+        """
+        if stack is None:
+            stack = [group]
+        group = stack[-1]
+        encoding = None if isinstance(text, str) else self.bytes_encoding
+        matcher = self._get_matcher(group, encoding)
+        expected_callback = self.expected_callback
+        length = len(text) if limit is None else limit
+        while pos < length:
+            if expected_callback is not None:
+                expected = expected_callback()
+                matcher = self._get_matcher(
+                    group, encoding) if expected is None else self._get_expected_matcher(group, expected, encoding)
+            match = matcher.match(text, pos)
+            if match is None:
+                if partial:
+                    break
+                raise NoMatchException(
+                    *self._line_col(text, pos, encoding))
+            lex_item, end = match
+            if end == pos:
+                raise ZeroLenghtMatchException(
+                    lex_item.name, lex_item.regex.pattern)
+            if limit is not None and (end > limit or partial and end == len(text)):
+                break
+            if lex_item.keywords:
+                lexeme = text[pos:end]
+                if encoding is not None:
+                    lexeme = str(lexeme, encoding)
+                lex_item = lex_item.keywords.get(lexeme, lex_item)
+            if not lex_item.is_skip:
+                yield lex_item, pos, end
+            pos = end
+            if lex_item.push_group is not None or lex_item.pop_group:
+                group = self._switch_group(stack, lex_item)
+                matcher = self._get_matcher(group, encoding)
+        if limit is not None:
+            yield None, pos, pos
+
+    def _scan_buffer(self, text: Any, group: int = 0) -> Iterator[Tuple[LexItem, int, int]]:
+        """
+        Scan a whole buffer by the prescan if set, or :obj:`_scan()`.
+        """
+        if self.prescan is not None:
+            return self.prescan.scan(text, group)
+        return self._scan(text, group)
+
+    def _switch_group(self, stack: List[int], lex_item: LexItem) -> int:
+        """
+        Pop and/or push the group stack by the matched `lex_item`, and return the active group.
+        """
+        if lex_item.pop_group:
+            if len(stack) == 1:
+                raise GroupStackException(lex_item.name)
+            stack.pop()
+        if lex_item.push_group is not None:
+            if lex_item.push_group >= len(self.lex_item_groups) or lex_item.push_group < 0:
+                raise GroupNumException(lex_item.push_group)
+            stack.append(lex_item.push_group)
+        return stack[-1]
+
+    def _has_group_switch(self) -> bool:
+        """
+        Whether any Lex item switches the active group.
+        """
+        return any(lex_item.push_group is not None or lex_item.pop_group
+                   for lex_items in self.lex_item_groups if lex_items is not None for lex_item in lex_items)
+
+    def _iter_values(self, text: str, group: int = 0) -> Iterator[Tuple[LexItem, Any, int, Union[Tuple[int, int], LazyPosition]]]:
+        """
+        Scan `text` and format the matched words, words with null formated value are dropped. The positions are resolved lazily by a :obj:`LineIndex` of `text`.
+
+        Yields
+        ------
+        :obj:`Tuple` of :obj:`LexItem, Any, int, LazyPosition`
+            the matched Lex item, formated value, offset and position
+        """
+        line_index = LineIndex(text)
+        for lex_item, start, end in self._scan_buffer(text, group):
+            if lex_item.is_lazy:
+                value = LazyValue(lex_item.format_cap_text, text, start, end)
+            else:
+                lexeme = text[start:end]
+                if lex_item.is_interned:
+                    lexeme = sys.intern(lexeme)
+                value = lex_item.format_cap_text(lexeme)
+            if value:
+                yield lex_item, value, start, LazyPosition(line_index, start)
+
+    def _iter_bytes_values(self, buf: Any, group: int = 0) -> Iterator[Tuple[LexItem, Any, int, LazyPosition]]:
+        """
+        Scan bytes-like `buf` in bytes mode as :obj:`_iter_values()`, and decode the lexemes only for formatting.
+        """
+        encoding = self.bytes_encoding
+        line_index = LineIndex(buf, encoding=encoding)
+        for lex_item, start, end in self._scan_buffer(buf, group):
+            if lex_item.is_lazy:
+                value = LazyValue(lex_item.format_cap_text,
+                                  buf, start, end, encoding)
+            else:
+                lexeme = str(buf[start:end], encoding)
+                if lex_item.is_interned:
+                    lexeme = sys.intern(lexeme)
+                value = lex_item.format_cap_text(lexeme)
+            if value:
+                yield lex_item, value, start, LazyPosition(line_index, start)
+
+    def _iter_buffer_values(self, buf: Union[str, bytes, bytearray, memoryview, mmap.mmap], group: int = 0, encoding: str = "utf-8") -> Iterator[Tuple[LexItem, Any, int, LazyPosition]]:
+        """
+        Scan a whole buffer, bytes-like buffer is scanned directly in bytes mode, or decoded once.
+        """
+        if self.bytes_encoding is not None and not isinstance(buf, str):
+            return self._iter_bytes_values(buf, group)
+        return self._iter_values(self._as_text(buf, encoding), group)
+
+    def _iter_line_values(self, text_reader: io.IOBase, group: int = 0) -> Iterator[Tuple[LexItem, Any, int, Union[Tuple[int, int], LazyPosition]]]:
+        """
+        Read `text_reader` line by line and scan each stripped line as :obj:`_scan()`, words with null formated value are dropped.
+
+        Yields
+        ------
+        :obj:`Tuple` of :obj:`LexItem, Any, int, Tuple`
+            the matched Lex item, formated value, offset (always -1) and position (line, col)
         """
-        if self.lex_item_groups[group] is None:
-            return 0
-        index = 0
         line = 0
-        pos = -1
-        while text_reader.tell() != pos:
-            pos = text_reader.tell()
-            line_text = str(text_reader.readline()).strip()
+        stack = [group]
+        for line_text in text_reader:
             line += 1
-            col_num = len(line_text)
-            while line_text:
-                is_match = False
-                col = col_num - len(line_text) + 1
-                for lex_item in self.lex_item_groups[group]:
-                    line_text, new_index = self._lex_single_line(
-                        line_text, lex_item, index, line, col)
-                    if new_index != index:
-                        is_match = True
-                        index = new_index
-                        col = col_num - len(line_text) + 1
-                if not is_match:
-                    raise NoMatchException(line, col)
+            line_text = str(line_text).strip()
+            try:
+                for lex_item, start, end in self._scan(line_text, group, stack=stack):
+                    if lex_item.is_lazy:
+                        value = LazyValue(
+                            lex_item.format_cap_text, line_text, start, end)
+                    else:
+                        lexeme = line_text[start:end]
+                        if lex_item.is_interned:
+                            lexeme = sys.intern(lexeme)
+                        value = lex_item.format_cap_text(lexeme)
+                    if value:
+                        yield lex_item, value, -1, (line, start + 1)
+            except NoMatchException as e:
+                raise NoMatchException(line, e.col) from None
+
+    def _deliver(self, values: Iterator[Tuple[LexItem, Any, int, Union[Tuple[int, int], LazyPosition]]]) -> int:
+        """
+        Deliver the formated values to callbacks.
+
+        Parameters
+        ----------
+        values : :obj:`Iterator` of :obj:`Tuple` of :obj:`LexItem, Any, int, Tuple or LazyPosition`
+            from :obj:`_iter_values()` or :obj:`_iter_line_values()`
+
+        Returns
+        -------
+        int
+            the count of results
+        """
+        on_lexed_callback = self.on_lexed_callback
+        if on_lexed_callback is self.none_on_lexed_callback:
+            on_lexed_callback = None
+        on_accepted, flush = self.on_accepted_callback, None
+        if self.on_accepted_batch_callback is not None:
+            on_accepted, flush = self._batch_collector()
+        index = 0
+        for lex_item, value, offset, position in values:
+            lexer_result = LexerResult(
+                index, lex_item.name, value, 0, 0, offset, lex_item.kind, position)
+            if on_lexed_callback is None or on_lexed_callback(lexer_result):
+                index += 1
+                on_accepted(lexer_result)
+        if flush is not None:
+            flush()
+        self.on_finished_callback(index)
+        return index
+
+    def iter_tokens(self, reader: Union[io.IOBase, str, bytes, bytearray, memoryview, mmap.mmap], group: int = 0, encoding: str = "utf-8") -> Iterator[LexerResult]:
+        """
+        Lex lazily and yield the results one by one instead of delivering by callbacks, so you can pull results, stop early or chain generators. `on_accepted_callback` and `on_finished_callback` are not invoked, and `on_lexed_callback` only filters results if it is set.
+
+        A text reader is read line by line, with positions as :obj:`lex_stream()`, and each stripped line is scanned as :obj:`lex_buffer()`. Other buffers are scanned as :obj:`lex_buffer()`. At each position, the first item in declaration order that matches wins for all engines, unlike the legacy order of :obj:`lex_stream()` with `LexEngine.ITEMS`, see :obj:`set_engine()`.
+
+        Parameters
+        ----------
+        reader : :obj:`io.IOBase`, str, bytes, bytearray, memoryview or :obj:`mmap.mmap`
+            that will be Lexed
+        group : int, optional
+            the Lex Group
+        encoding : str, optional
+            the encoding of bytes-like buffer
+
+        Yields
+        ------
+        :obj:`LexerResult`
+            the results, indexed from 0
+
+        Raises
+        ------
+        NoMatchException
+            if text cannot be matched by Lex items
+        """
+        if hasattr(reader, "readline"):
+            values = self._iter_line_values(reader, group)
+        else:
+            values = self._iter_buffer_values(reader, group, encoding)
+        on_lexed_callback = self.on_lexed_callback
+        if on_lexed_callback is self.none_on_lexed_callback:
+            on_lexed_callback = None
+        index = 0
+        for lex_item, value, offset, position in values:
+            lexer_result = LexerResult(
+                index, lex_item.name, value, 0, 0, offset, lex_item.kind, position)
+            if on_lexed_callback is None or on_lexed_callback(lexer_result):
+                index += 1
+                yield lexer_result
+
+    def lex_buffer(self, buf: Union[str, bytes, bytearray, memoryview, mmap.mmap], group: int = 0, encoding: str = "utf-8") -> int:
+        """
+        Lex a whole buffer by offsets, the rest text is never sliced and words can span lines, such as block comments and multi-line strings. Unlike :obj:`lex_stream()`, lines are not stripped, so line breaks and spaces need Lex items to match (or drop) them, and `$` of patterns matches at the end of every line. Results are delivered by callbacks as :obj:`lex_stream()`, with :obj:`LexerResult.offset` set.
+
+        Parameters
+        ----------
+        buf : str, bytes, bytearray, memoryview or :obj:`mmap.mmap`
+            the buffer to be Lexed, bytes-like buffer is decoded once, or scanned directly in bytes mode, see :obj:`set_bytes_mode()`
+        group : int, optional
+            the Lex Group, for advanced usage, eg. you can define multiple groups and use LexerFramework for different scenarios.
+        encoding : str, optional
+            the encoding of bytes-like buffer
+
+        Returns
+        -------
+        int
+            the count of results
+
+        Raises
+        ------
+        NoMatchException
+            if text at some offset cannot be matched by Lex items
+        """
+        return self._deliver(self._iter_buffer_values(buf, group, encoding))
+
+    def lex_to_token_buffer(self, buf: Union[str, bytes, bytearray, memoryview, mmap.mmap], group: int = 0, encoding: str = "utf-8") -> TokenBuffer:
+        """
+        Lex a whole buffer as :obj:`lex_buffer()`, but store the results in a :obj:`TokenBuffer` instead of delivering :obj:`LexerResult` objects by callbacks. Words with null formated value are dropped, and callbacks are not invoked. The words of lazy Lex items are formated on first access of value.
+
+        Parameters
+        ----------
+        buf : str, bytes, bytearray, memoryview or :obj:`mmap.mmap`
+            the buffer to be Lexed, bytes-like buffer is decoded once, or kept as :obj:`TokenBuffer.text` in bytes mode
+        group : int, optional
+            the Lex Group
+        encoding : str, optional
+            the encoding of bytes-like buffer
+
+        Returns
+        -------
+        :obj:`TokenBuffer`
+            the tokens
+
+        Raises
+        ------
+        NoMatchException
+            if text at some offset cannot be matched by Lex items
+        """
+        bytes_encoding = None if isinstance(buf, str) else self.bytes_encoding
+        text = buf if bytes_encoding is not None else self._as_text(
+            buf, encoding)
+        token_buffer = TokenBuffer(text, bytes_encoding)
+        kinds: Dict[LexItem, int] = {}
+        values = token_buffer.values
+        formats = token_buffer.formats
+        for lex_item, start, end in self._scan_buffer(text, group):
+            if lex_item.is_lazy:
+                kind = kinds.get(lex_item)
+                if kind is None:
+                    kind = kinds[lex_item] = token_buffer.kind_id(lex_item.name)
+                formats[len(token_buffer)] = lex_item.format_cap_text
+                token_buffer.append(kind, start, end - start)
+                continue
+            lexeme = text[start:end]
+            if bytes_encoding is not None:
+                lexeme = str(lexeme, bytes_encoding)
+            if lex_item.is_interned:
+                lexeme = sys.intern(lexeme)
+            value = lex_item.format_cap_text(lexeme)
+            if not value:
+                continue
+            kind = kinds.get(lex_item)
+            if kind is None:
+                kind = kinds[lex_item] = token_buffer.kind_id(lex_item.name)
+            if value is not lexeme:
+                values[len(token_buffer)] = value
+            token_buffer.append(kind, start, end - start)
+        return token_buffer
+
+    @staticmethod
+    def _chunk_bounds(path: str, chunk_num: int, boundary: Union[str, bytes]) -> List[int]:
+        """
+        Split file into at most `chunk_num` chunks, each split point is the end of the first `boundary` match after the even split point.
+
+        Returns
+        -------
+        :obj:`list` of int
+            the byte offsets of bounds, from 0 to size of file
+        """
+        if isinstance(boundary, str):
+            boundary = boundary.encode()
+        boundary_regex = re.compile(boundary)
+        size = os.path.getsize(path)
+        bounds = [0]
+        if size == 0:
+            return bounds
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for i in range(1, chunk_num):
+                pos = max(size * i // chunk_num, bounds[-1])
+                match = boundary_regex.search(mm, pos)
+                if match is None or match.end() >= size:
+                    break
+                if match.end() > bounds[-1]:
+                    bounds.append(match.end())
+        bounds.append(size)
+        return bounds
+
+    def lex_parallel(self, path: str, workers: Optional[int] = None, group: int = 0, encoding: str = "utf-8", boundary: Union[str, bytes] = b"\n", mp_context: Optional[Any] = None) -> int:
+        """
+        Lex a large file in parallel. The file is split at safe boundaries (line breaks by default), the chunks are Lexed as :obj:`lex_buffer()` in worker processes with the same Lex items, and the results are merged in order and delivered by callbacks in this process, so `LexerResult.index`, positions and offsets are the same as Lexing the whole file.
+
+        In bytes mode the chunks are scanned directly as :obj:`lex_file()`, so :obj:`LexerResult.offset` counts bytes, otherwise it counts chars, see :obj:`set_bytes_mode()`.
+
+        The Lex items are sent to workers by pickle, so `format_cap_text` should be module level functions or static methods instead of lambdas. Words cannot span the boundaries, so give a `boundary` regex that never occurs inside words, such as block comments. Every chunk starts at `group`, so the group switching items must be back to `group` at every boundary.
+
+        Parameters
+        ----------
+        path : str
+            path of file
+        workers : int, optional
+            the number of worker processes, default `os.cpu_count()`
+        group : int, optional
+            the Lex Group
+        encoding : str, optional
+            the encoding of file
+        boundary : str or bytes, optional
+            the regex of safe boundary, chunk ends at the end of match, which may be in the middle of a line
+        mp_context : :obj:`multiprocessing.context.BaseContext`, optional
+            the multiprocessing context of worker processes, such as `multiprocessing.get_context("spawn")`, the default start method if None
+
+        Returns
+        -------
+        int
+            the count of results
+
+        Raises
+        ------
+        NoMatchException
+            if text at some offset cannot be matched by Lex items
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        bounds = self._chunk_bounds(path, workers, boundary)
+        lex_items = self._all_group_items()
+        # the workers unpickle the compiled matchers instead of compiling
+        if self.bytes_encoding is None:
+            matchers, bytes_matchers = self._compiled_matchers(), {}
+        else:
+            matchers, bytes_matchers = {}, self._compiled_matchers(
+                self.bytes_encoding)
+
+        def merged_values() -> Iterator[Tuple[LexItem, Any, int, Tuple[int, int]]]:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_parallel_worker, initargs=(self.lex_item_groups, self.engine, self.bytes_encoding, matchers, bytes_matchers)) as executor:
+                chunks = executor.map(_lex_parallel_chunk, [path] * (len(bounds) - 1), bounds[:-1], bounds[1:],
+                                      [group] * (len(bounds) - 1), [encoding] * (len(bounds) - 1))
+                offset_base = 0
+                line_base = 0
+                # the column of chunk start, a boundary may be in the middle of a line
+                col_base = 1
+                for results, char_num, line_num, tail_num, error in chunks:
+                    for item_index, value, offset, line, col in results:
+                        if line == 1:
+                            col += col_base - 1
+                        yield lex_items[item_index], value, offset_base + offset, (line_base + line, col)
+                    if error is not None:
+                        exception_class, args = error
+                        if exception_class is NoMatchException:
+                            args = (line_base + args[0], args[1] + col_base - 1 if args[0] == 1 else args[1])
+                        raise exception_class(*args)
+                    offset_base += char_num
+                    line_base += line_num
+                    col_base = tail_num + 1 if line_num else col_base + tail_num
+
+        return self._deliver(merged_values())
+
+    def lex_file(self, path: str, group: int = 0, encoding: str = "utf-8") -> int:
+        """
+        Lex a whole file by :obj:`lex_buffer()`, the file is mapped by `mmap` instead of read line by line.
+
+        In bytes mode the mapping is scanned directly, and it is kept open while the lazy positions and values of results refer to it, see :obj:`set_bytes_mode()`.
+
+        Parameters
+        ----------
+        path : str
+            path of file
+        group : int, optional
+            the Lex Group
+        encoding : str, optional
+            the encoding of file
+
+        Returns
+        -------
+        int
+            the count of results
+        """
+        with open(path, "rb") as f:
+            if f.seek(0, io.SEEK_END) == 0:
+                return self.lex_buffer("", group)
+            if self.bytes_encoding is not None:
+                # closed when the last result referring to it is collected
+                return self.lex_buffer(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), group)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return self.lex_buffer(mm, group, encoding)
+
+    def _iter_chunk_values(self, chunks: Iterable[Union[str, bytes]], group: int = 0, encoding: str = "utf-8", margin: int = 1024) -> Iterator[Tuple[LexItem, Any, int, LazyPosition]]:
+        """
+        Scan the chunks by :obj:`ChunkScanner`.
+        """
+        scanner = ChunkScanner(self, group, encoding, margin)
+        for chunk in chunks:
+            yield from scanner.feed(chunk)
+        yield from scanner.close()
+
+    def lex_chunks(self, chunks: Iterable[Union[str, bytes]], group: int = 0, encoding: str = "utf-8", margin: int = 1024) -> int:
+        """
+        Lex any iterable of text or bytes chunks in bounded memory as :obj:`lex_buffer()` of the joined text, see :obj:`ChunkScanner`.
+
+        Parameters
+        ----------
+        chunks : :obj:`Iterable` of str or bytes
+            the chunks of text, bytes chunks are decoded incrementally
+        group : int, optional
+            the Lex Group
+        encoding : str, optional
+            the encoding of bytes chunks
+        margin : int, optional
+            the lookahead margin, see :obj:`ChunkScanner`
+
+        Returns
+        -------
+        int
+            the count of results
+
+        Raises
+        ------
+        NoMatchException
+            if text at some offset cannot be matched by Lex items
+        """
+        return self._deliver(self._iter_chunk_values(chunks, group, encoding, margin))
+
+    def lex_reader(self, reader: Any, group: int = 0, encoding: str = "utf-8", block_size: int = 65536, margin: int = 1024) -> int:
+        """
+        Lex a reader by fixed-size blocks as :obj:`lex_chunks()`. The reader only needs `read(size)`, so it can be `sys.stdin`, a pipe or a socket file, text or binary.
+
+        Parameters
+        ----------
+        reader : :obj:`io.IOBase`
+            that will be Lexed
+        group : int, optional
+            the Lex Group
+        encoding : str, optional
+            the encoding of binary reader
+        block_size : int, optional
+            the size of each read
+        margin : int, optional
+            the lookahead margin, see :obj:`ChunkScanner`
+
+        Returns
+        -------
+        int
+            the count of results
+        """
+        return self.lex_chunks(iter(functools.partial(reader.read, block_size), reader.read(0)), group, encoding, margin)
+
+    async def iter_tokens_async(self, reader: Any, group: int = 0, encoding: str = "utf-8", block_size: int = 65536, margin: int = 1024) -> AsyncIterator[LexerResult]:
+        """
+        Lex an asyncio stream chunk by chunk as :obj:`lex_chunks()`, and yield the results as :obj:`iter_tokens()`. The chunks are Lexed as they arrive, and the control is yielded to the event loop between chunks, so one event loop can Lex many streams concurrently, for example `async for lexer_result in lexer.iter_tokens_async(reader)`.
+
+        Parameters
+        ----------
+        reader : :obj:`asyncio.StreamReader`
+            that will be Lexed, or any object with coroutine `read(size)` returning str or bytes, empty at the end
+        group : int, optional
+            the Lex Group
+        encoding : str, optional
+            the encoding of bytes chunks
+        block_size : int, optional
+            the max size of each read
+        margin : int, optional
+            the lookahead margin, see :obj:`ChunkScanner`
+
+        Yields
+        ------
+        :obj:`LexerResult`
+            the results, indexed from 0
+
+        Raises
+        ------
+        NoMatchException
+            if text at some offset cannot be matched by Lex items
+        """
+        scanner = ChunkScanner(self, group, encoding, margin)
+        on_lexed_callback = self.on_lexed_callback
+        if on_lexed_callback is self.none_on_lexed_callback:
+            on_lexed_callback = None
+        index = 0
+        while True:
+            chunk = await reader.read(block_size)
+            values = scanner.feed(chunk) if chunk else scanner.close()
+            for lex_item, value, offset, position in values:
+                lexer_result = LexerResult(
+                    index, lex_item.name, value, 0, 0, offset, lex_item.kind, position)
+                if on_lexed_callback is None or on_lexed_callback(lexer_result):
+                    index += 1
+                    yield lexer_result
+            if not chunk:
+                break
+            # the read returns without suspending while data is buffered
+            await asyncio.sleep(0)
+
+    async def lex_async(self, reader: Any, group: int = 0, encoding: str = "utf-8", block_size: int = 65536, margin: int = 1024) -> int:
+        """
+        Lex an asyncio stream as :obj:`iter_tokens_async()`, and deliver the results by callbacks as :obj:`lex_stream()`.
+
+        Parameters
+        ----------
+        reader : :obj:`asyncio.StreamReader`
+            that will be Lexed, or any object with coroutine `read(size)` returning str or bytes, empty at the end
+        group : int, optional
+            the Lex Group
+        encoding : str, optional
+            the encoding of bytes chunks
+        block_size : int, optional
+            the max size of each read
+        margin : int, optional
+            the lookahead margin, see :obj:`ChunkScanner`
+
+        Returns
+        -------
+        int
+            the count of results
+
+        Raises
+        ------
+        NoMatchException
+            if text at some offset cannot be matched by Lex items
+        """
+        on_accepted, flush = self.on_accepted_callback, None
+        if self.on_accepted_batch_callback is not None:
+            on_accepted, flush = self._batch_collector()
+        index = 0
+        async for lexer_result in self.iter_tokens_async(reader, group, encoding, block_size, margin):
+            index += 1
+            on_accepted(lexer_result)
+        if flush is not None:
+            flush()
         self.on_finished_callback(index)
         return index
 
 
+class ChunkScanner:
+    """
+    Scanner of a stream fed chunk by chunk, which keeps only the unscanned tail of text, so an unbounded stream is Lexed in bounded memory. The results are the same as Lexing the joined text by `LexerFramework.lex_buffer()`.
+
+    A word is emitted only when at least `margin` chars follow it, so the partial words at the end of chunk, and the lookaheads such as `(?=\\W|$)`, are decided after more chunks are fed. The Lex items should decide a word within `margin` chars after it, for example an earlier item which fails only because its end is not fed yet can be beaten by a later item.
+
+The words longer than `margin`, such as long block comments and strings, are kept in the unscanned tail until their ends are fed, as the offsets which no Lex item matches yet, so the errors of such offsets are raised by :obj:`close()`. The tail is scanned again for each chunk fed meanwhile.
+
+    Parameters
+    ----------
+    self.lexer : :obj:`LexerFramework`
+        the lexer
+    self.group : int
+        the Lex Group
+    self.margin : int
+        the lookahead margin
+    """
+
+    def __init__(self, lexer: LexerFramework, group: int = 0, encoding: str = "utf-8", margin: int = 1024) -> None:
+        """
+        Construct method
+
+        Parameters
+        ----------
+        lexer : :obj:`LexerFramework`
+            the lexer
+        group : int, optional
+            the Lex Group
+        encoding : str, optional
+            the encoding of bytes chunks, decoded incrementally
+        margin : int, optional
+            the lookahead margin
+        """
+        self.lexer = lexer
+        self.group = group
+        self.margin = margin
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        # the group stack at the start of unscanned text
+        self._stack = [group]
+        # the unscanned text, its offset and position in the stream
+        self._text = ""
+        self._offset = 0
+        self._line = 1
+        self._col = 1
+
+    def feed(self, chunk: Union[str, bytes]) -> List[Tuple[LexItem, Any, int, LazyPosition]]:
+        """
+        Feed a chunk and scan the decided words.
+
+        Parameters
+        ----------
+        chunk : str or bytes
+            the chunk of text
+
+        Returns
+        -------
+        :obj:`list` of :obj:`Tuple` of :obj:`LexItem, Any, int, LazyPosition`
+            the matched Lex item, formated value, offset and position
+
+        Raises
+        ------
+        NoMatchException
+            if text at some offset cannot be matched by Lex items
+        """
+        if not isinstance(chunk, str):
+            chunk = self._decoder.decode(chunk)
+        self._text += chunk
+        return self._scan(len(self._text) - self.margin, True)
+
+    def close(self) -> List[Tuple[LexItem, Any, int, LazyPosition]]:
+        """
+        End the stream and scan the rest words.
+        """
+        self._text += self._decoder.decode(b"", True)
+        return self._scan(len(self._text), False)
+
+    def _scan(self, limit: int, partial: bool) -> List[Tuple[LexItem, Any, int, LazyPosition]]:
+        text = self._text
+        if limit <= 0:
+            return []
+        line_index = LineIndex(text, self._line, self._col)
+        values = []
+        try:
+            for lex_item, start, end in self.lexer._scan(text, self.group, 0, limit, self._stack, partial):
+                if lex_item is None:
+                    break
+                if lex_item.is_lazy:
+                    value = LazyValue(lex_item.format_cap_text, text, start, end)
+                else:
+                    lexeme = text[start:end]
+                    if lex_item.is_interned:
+                        lexeme = sys.intern(lexeme)
+                    value = lex_item.format_cap_text(lexeme)
+                if value:
+                    values.append((lex_item, value, self._offset + start,
+                                   LazyPosition(line_index, start)))
+        except NoMatchException as e:
+            line, col = e.line + self._line - 1, e.col
+            if e.line == 1:
+                col += self._col - 1
+            raise NoMatchException(line, col) from None
+        newlines = text.count('\n', 0, start)
+        if newlines:
+            self._line += newlines
+            self._col = start - text.rfind('\n', 0, start)
+        else:
+            self._col += start
+        self._offset += start
+        self._text = text[start:]
+        return values
+
+
+# the lexer of worker process in `LexerFramework.lex_parallel()`
+_worker_lexer: Optional[LexerFramework] = None
+
+
+def _init_parallel_worker(lex_item_groups: List[List[LexItem]], engine: LexEngine, bytes_encoding: Optional[str], matchers: Dict[int, Any], bytes_matchers: Dict[int, Any]) -> None:
+    """
+    Initialize the worker process of :obj:`LexerFramework.lex_parallel()` with the same Lex items, bytes mode and their compiled matchers.
+    """
+    global _worker_lexer
+    _worker_lexer = LexerFramework(lex_item_groups, engine)
+    _worker_lexer.set_bytes_mode(bytes_encoding)
+    _worker_lexer._install_matchers(matchers, bytes_matchers)
+
+
+def _lex_parallel_chunk(path: str, start: int, end: int, group: int, encoding: str) -> Tuple[List[Tuple[int, Any, int, int, int]], int, int, int, Optional[Tuple[type, tuple]]]:
+    """
+    Lex the bytes [start, end) of file in worker process, scanned directly in bytes mode or decoded. The Lex exceptions cannot be pickled, so they are returned as (exception class, args) instead of raised.
+
+    Returns
+    -------
+    :obj:`Tuple`
+        list of (item index in all groups, value, offset, line, col) in chunk, number of chars (bytes in bytes mode), number of line breaks and number of chars after the last line break of chunk, and the Lex exception if any
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    item_indexes = {lex_item: i for i, lex_item in enumerate(
+        _worker_lexer._all_group_items())}
+    bytes_encoding = _worker_lexer.bytes_encoding
+    if bytes_encoding is not None:
+        values = _worker_lexer._iter_bytes_values(data, group)
+        sizes = (len(data), data.count(b'\n'),
+                 len(data[data.rfind(b'\n') + 1:].decode(bytes_encoding)))
+    else:
+        text = data.decode(encoding)
+        values = _worker_lexer._iter_values(text, group)
+        sizes = (len(text), text.count('\n'),
+                 len(text) - text.rfind('\n') - 1)
+    results = []
+    try:
+        for lex_item, value, offset, position in values:
+            line, col = position.get()
+            if type(value) is LazyValue:
+                # do not pickle the whole chunk text
+                lexeme = value.lexeme()
+                value = LazyValue(value.format_cap_text,
+                                  lexeme, 0, len(lexeme))
+            results.append((item_indexes[lex_item], value, offset, line, col))
+    except NoMatchException as e:
+        return (results,) + sizes + ((NoMatchException, (e.line, e.col)),)
+    except ZeroLenghtMatchException as e:
+        return (results,) + sizes + ((ZeroLenghtMatchException, (e.name, e.pattern)),)
+    except GroupStackException as e:
+        return (results,) + sizes + ((GroupStackException, (e.name,)),)
+    return (results,) + sizes + (None,)
+
+
 class HLlangLexerFramework(LexerFramework):
     """
     High Level programing language (HLlang) Lexer framework
     """
 
-    def __init__(self, lex_item_groups: List[List[LexItem]] = [[]]):
+    def __init__(self, lex_item_groups: List[List[LexItem]] = [[]], engine: LexEngine = LexEngine.ITEMS):
         """
         Construct menthod with LexItems
 
@@ -410,10 +2585,13 @@ class HLlangLexerFramework(LexerFramework):
         ----------
         lex_items : :obj:`List` of :obj:`LexItem`, optional
             Prepared LexItemGroups
+        engine : :obj:`LexEngine`, optional
+            the matching engine, see :obj:`LexerFramework.set_engine()`
         """
-        super().__init__(lex_item_groups)
+        super().__init__(lex_item_groups, engine)
+        self.res_word_tables: Dict[int, Dict[str, LexItem]] = {}
 
-    def add_res_words(self, name: str = "ResWord", format_cap_text: Callable[[str], Any] = LexerFramework.none_format_cap_text, reg_flags=0, group: int = 0, *reg_exprs: str) -> None:
+    def add_res_words(self, name: str = "ResWord", format_cap_text: Callable[[str], Any] = LexerFramework.none_format_cap_text, reg_flags=0, group: int = 0, *reg_exprs: str, skip: bool = False, lazy: bool = False) -> None:
         """
         Add reserved words Lex items, and recomand to do this before add indentifier Lex item.
 
@@ -429,16 +2607,60 @@ class HLlangLexerFramework(LexerFramework):
             the Lex Group, for advanced usage, eg. you can define multiple groups and use LexerFramework for different scenarios.
         *reg_exprs : str
             the tuple of reg_exprs
+        skip : bool, optional
+            skip the matched words, see :obj:`LexerFramework.add_lex_item()`
+        lazy : bool, optional
+            format the matched words lazily, see :obj:`LexerFramework.add_lex_item()`
         """
         for reg_expr in reg_exprs:
             if reg_expr[-8:] != "(?=\\W|$)":
                 reg_expr = reg_expr + "(?=\\W|$)"
-            self.add_lex_item(
-                name, reg_expr, format_cap_text, reg_flags, group)
+            lex_item = self.add_lex_item(
+                name, reg_expr, format_cap_text, reg_flags, group, skip, lazy)
+            if lex_item is not None:
+                lex_item.is_interned = True
+
+    def add_res_words_table(self, name: str = "ResWord", format_cap_text: Callable[[str], Any] = LexerFramework.none_format_cap_text, reg_flags=0, group: int = 0, *words: str, skip: bool = False, lazy: bool = False) -> None:
+        """
+        Add reserved words to the reserved words table of group instead of one Lex item per word. The identifier Lex items of the group match the word once, then the lexeme is looked up in the table and classified as the reserved word, so the identifiers do not pay a regex match per reserved word. The words are literal lexemes matched by identifier, and can be added before or after identifier.
 
-    def add_identifier(self, name: str = "Identifier", format_cap_text: Callable[[str], Any] = LexerFramework.none_format_cap_text, reg_flags=0, group: int = 0, reg_expr: str = "[A-Za-z]\\w*") -> None:
+        Parameters
+        ----------
+        name : str, optional
+            Name of Lex items
+        format_cap_text : :obj:`Callable` of :obj:`[str], Any`, optional
+            Callable of formatting the reserved words
+        reg_flags : optional
+            https://docs.python.org/3/library/re.html#flags, of the regexes of words, while the words are looked up by exact lexemes
+        group : int, optional
+            the Lex Group, for advanced usage, eg. you can define multiple groups and use LexerFramework for different scenarios.
+        *words : str
+            the tuple of reserved words
+        skip : bool, optional
+            skip the matched words, see :obj:`LexerFramework.add_lex_item()`
+        lazy : bool, optional
+            format the matched words lazily, see :obj:`LexerFramework.add_lex_item()`
+        """
+        if group >= len(self.lex_item_groups) or group < 0:
+            raise GroupNumException(group)
+        table = self.res_word_tables.setdefault(group, {})
+        for word in words:
+            lex_item = LexItem(name, format_cap_text)
+            lex_item.set_regex('^' + re.escape(word), reg_flags)
+            lex_item.is_interned = True
+            lex_item.is_skip = skip
+            lex_item.is_lazy = lazy
+            if self.symbol_table is not None:
+                lex_item.kind = self.symbol_table.get_id(name)
+            table[word] = lex_item
+        # the matchers are cached by the number of Lex items, which the table does not change
+        self._matchers.pop(group, None)
+        self._bytes_matchers.pop(group, None)
+        self._expected_matchers = {}
+
+    def add_identifier(self, name: str = "Identifier", format_cap_text: Callable[[str], Any] = LexerFramework.none_format_cap_text, reg_flags=0, group: int = 0, reg_expr: str = "[A-Za-z]\\w*", skip: bool = False, lazy: bool = False) -> None:
         """
-        Add identifier Lex item, and recomand to do this after add reserved words Lex item.
+        Add identifier Lex item, and recomand to do this after add reserved words Lex item. The words in reserved words table of group, see :obj:`add_res_words_table()`, are classified as reserved words.
 
         Parameters
         ----------
@@ -452,10 +2674,18 @@ class HLlangLexerFramework(LexerFramework):
             the Lex Group, for advanced usage, eg. you can define multiple groups and use LexerFramework for different scenarios.
         reg_expr : str, optional
             Regular Expression of Lex item
+        skip : bool, optional
+            skip the matched words, see :obj:`LexerFramework.add_lex_item()`
+        lazy : bool, optional
+            format the matched words lazily, see :obj:`LexerFramework.add_lex_item()`
         """
-        self.add_lex_item(name, reg_expr, format_cap_text, reg_flags, group)
+        lex_item = self.add_lex_item(
+            name, reg_expr, format_cap_text, reg_flags, group, skip, lazy)
+        if lex_item is not None:
+            lex_item.is_interned = True
+            lex_item.keywords = self.res_word_tables.setdefault(group, {})
 
-    def add_operators(self, name: str = "Operator", format_cap_text: Callable[[str], Any] = LexerFramework.none_format_cap_text, reg_flags=0, group: int = 0, *reg_exprs: str) -> None:
+    def add_operators(self, name: str = "Operator", format_cap_text: Callable[[str], Any] = LexerFramework.none_format_cap_text, reg_flags=0, group: int = 0, *reg_exprs: str, skip: bool = False, lazy: bool = False) -> None:
         """
         Add operators Lex items, and recomand to add composite operators first.
 
@@ -471,12 +2701,16 @@ class HLlangLexerFramework(LexerFramework):
             the Lex Group, for advanced usage, eg. you can define multiple groups and use LexerFramework for different scenarios.
         *reg_exprs : str
             the tuple of reg_exprs
+        skip : bool, optional
+            skip the matched words, see :obj:`LexerFramework.add_lex_item()`
+        lazy : bool, optional
+            format the matched words lazily, see :obj:`LexerFramework.add_lex_item()`
         """
         for reg_expr in reg_exprs:
             self.add_lex_item(
-                name, reg_expr, format_cap_text, reg_flags, group)
+                name, reg_expr, format_cap_text, reg_flags, group, skip, lazy)
 
-    def add_delimiters(self, name: str = "Delimiter", format_cap_text: Callable[[str], Any] = LexerFramework.none_format_cap_text, reg_flags=0, group: int = 0, *reg_exprs: str) -> None:
+    def add_delimiters(self, name: str = "Delimiter", format_cap_text: Callable[[str], Any] = LexerFramework.none_format_cap_text, reg_flags=0, group: int = 0, *reg_exprs: str, skip: bool = False, lazy: bool = False) -> None:
         """
         Add Delimiters Lex items, and recomand to add composite delimiters first.
 
@@ -492,12 +2726,16 @@ class HLlangLexerFramework(LexerFramework):
             the Lex Group, for advanced usage, eg. you can define multiple groups and use LexerFramework for different scenarios.
         *reg_exprs : str
             the tuple of reg_exprs
+        skip : bool, optional
+            skip the matched words, see :obj:`LexerFramework.add_lex_item()`
+        lazy : bool, optional
+            format the matched words lazily, see :obj:`LexerFramework.add_lex_item()`
         """
         for reg_expr in reg_exprs:
             self.add_lex_item(
-                name, reg_expr, format_cap_text, reg_flags, group)
+                name, reg_expr, format_cap_text, reg_flags, group, skip, lazy)
 
-    def add_constants(self, name: str = "Constant", format_cap_text: Callable[[str], Any] = LexerFramework.none_format_cap_text, reg_flags=0, group: int = 0, is_add_zero_width_assertion: bool = True, *reg_exprs: str) -> None:
+    def add_constants(self, name: str = "Constant", format_cap_text: Callable[[str], Any] = LexerFramework.none_format_cap_text, reg_flags=0, group: int = 0, is_add_zero_width_assertion: bool = True, *reg_exprs: str, skip: bool = False, lazy: bool = False) -> None:
         """
         Add Constants Lex items, and recomand to add composite constants first.
 
@@ -515,12 +2753,16 @@ class HLlangLexerFramework(LexerFramework):
             add zero width assertion at end or not
         *reg_exprs : str
             the tuple of reg_exprs
+        skip : bool, optional
+            skip the matched words, see :obj:`LexerFramework.add_lex_item()`
+        lazy : bool, optional
+            format the matched words lazily, see :obj:`LexerFramework.add_lex_item()`
         """
         for reg_expr in reg_exprs:
             if reg_expr[-8:] != "(?=\\W|$)" and is_add_zero_width_assertion:
                 reg_expr = reg_expr + "(?=\\W|$)"
             self.add_lex_item(
-                name, reg_expr, format_cap_text, reg_flags, group)
+                name, reg_expr, format_cap_text, reg_flags, group, skip, lazy)
 
     @staticmethod
     def drop_null(s: str) -> None:
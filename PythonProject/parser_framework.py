@@ -14,11 +14,12 @@
 #    You should have received a copy of the GNU General Public License
 #    along with this program.If not, see<https://www.gnu.org/licenses/>.
 
-from typing import Callable, Any, List, Tuple, Dict
-import time
+from typing import Callable, Any, List, Tuple, Dict, Optional, FrozenSet
+import asyncio
 from queue import LifoQueue
 
-from lexer_framework import LexerResult
+from lexer_framework import LexerResult, LazyPosition, LazyValue, TokenBuffer
+from symbol_table import SymbolTable
 
 
 class ParseUnit:
@@ -32,14 +33,20 @@ class ParseUnit:
     self.parse_units : :obj:`list` of :obj:`ParseUnit`
         the unit contained, as son nodes
     self.position : :obj:`Tuple` of (int, int)
-        position of unit (line, col)
+        position of unit (line, col), the :obj:`LazyPosition` from lexer is resolved on first access and cached
+    self.raw_position : :obj:`Tuple` of (int, int) or :obj:`LazyPosition`
+        position without resolving :obj:`LazyPosition`
     self.value : :obj:`Any`
-        reserved place for advanced usage
+        reserved place for advanced usage, the :obj:`LazyValue` from lexer is formated on first access and cached
+    self.raw_value : :obj:`Any`
+        value without formating :obj:`LazyValue`
     self.unit_property : :obj:`Any`
         reserved place for advanced usage
+    self.kind : int
+        symbol id of name in :obj:`SymbolTable`, -1 if unknown
     """
 
-    def __init__(self, name: str, parse_units: List, position: Tuple[int, int], value: Any, unit_property: Any) -> None:
+    def __init__(self, name: str, parse_units: List, position: Tuple[int, int], value: Any, unit_property: Any, kind: int = -1) -> None:
         """
         Unit of Parse, such as phrase.
 
@@ -55,12 +62,37 @@ class ParseUnit:
             reserved place for advanced usage
         unit_property : :obj:`Any`
             reserved place for advanced usage
+        kind : int, optional
+            symbol id of name
         """
         self.name = name
         self.parse_units = parse_units
-        self.position = position
-        self.value = value
+        self.raw_position = position
+        self.raw_value = value
         self.unit_property = unit_property
+        self.kind = kind
+
+    @property
+    def value(self) -> Any:
+        value = self.raw_value
+        if type(value) is LazyValue:
+            value = self.raw_value = value.get()
+        return value
+
+    @value.setter
+    def value(self, value: Any) -> None:
+        self.raw_value = value
+
+    @property
+    def position(self) -> Tuple[int, int]:
+        position = self.raw_position
+        if type(position) is LazyPosition:
+            position = self.raw_position = position.get()
+        return position
+
+    @position.setter
+    def position(self, position: Tuple[int, int]) -> None:
+        self.raw_position = position
 
     def is_terminator(self) -> bool:
         """
@@ -83,6 +115,8 @@ class Production:
         callback for semanting
     self.attr : :obj:`Any`
         attr for advansing usage
+    self.pre_id : int
+        symbol id of antecedent, set when building table
     """
 
     def __init__(self, pre: str, sufs: List[str], semant_callback: Callable[[List[ParseUnit]], Any], attr: Any) -> None:
@@ -104,6 +138,7 @@ class Production:
         self.sufs = sufs
         self.semant_callback = semant_callback
         self.attr = attr
+        self.pre_id = -1
 
     def deep_copy(self):
         """
@@ -164,6 +199,35 @@ class WaitTimeoutException(Exception):
         return f"Wait Timeout: Index processing: {self.index_p}, this index is {self.index_l}"
 
 
+class ReorderOverflowException(Exception):
+    """
+    Exception when the index of `lexer_result` is beyond the reorder window of `parse_lex_unit`
+    """
+
+    def __init__(self, index_p: int, index_l: int, window: int, *args: object) -> None:
+        """
+        Exception when the index of `lexer_result` is beyond the reorder window of `parse_lex_unit`
+
+        Parameters
+        ----------
+        index_p : int
+            index should be (of parser)
+        index_l : int
+            current index (of lexer_result)
+        window : int
+            the reorder window
+        *args
+            for super class Exception
+        """
+        super().__init__(*args)
+        self.index_p = index_p
+        self.index_l = index_l
+        self.window = window
+
+    def __str__(self) -> str:
+        return f"Reorder Overflow: Index processing: {self.index_p}, this index {self.index_l} is beyond the window {self.window}"
+
+
 class ProductSentenceException(Exception):
     """
     Exception when `product_sentence` is illeagal.
@@ -195,20 +259,32 @@ class ParserFramework:
     ----------
     self._index : int
         For the parsing order checking.
+    self._waiters : :obj:`dict` of int to :obj:`asyncio.Future`
+        the futures of results waiting for their index in :obj:`parse_lex_unit_async()`
+    self.reorder_window : int
+        how many indexes after the parsing index can be held by :obj:`parse_lex_unit()`, 0 if the results must be in order, see :obj:`set_reorder_window()`
+    self._reorder_buffer : :obj:`dict` of int to :obj:`LexerResult`
+        the early results held by :obj:`parse_lex_unit()`, keyed by index
     self._stack : :obj:`LifoQueue`
         stack for PDA
     self.productions : :obj:`list` of :obj:`Production`
         collection of productions
     self.semant_callback_dict : :obj:`dict` of str to :obj:`Callable` of :obj:`list` of :obj:`ParseUnit` with return of :obj:`Any`
         Semant Callback Dictionary for string convert to callback.
+    self.symbol_table : :obj:`SymbolTable`
+        symbol ids of terminals and nonterminals, None if not built
     """
 
     def __init__(self) -> None:
         self._index = 0
+        self._waiters: Dict[int, asyncio.Future] = {}
+        self.reorder_window = 0
+        self._reorder_buffer: Dict[int, LexerResult] = {}
         self._stack = LifoQueue()
         self.productions: List[Production] = []
         self.semant_callback_dict: Dict[str,
                                         Callable[[List[ParseUnit]], Any]] = {}
+        self.symbol_table: Optional[SymbolTable] = None
 
     def parse(self, parse_unit: ParseUnit) -> None:
         """
@@ -221,13 +297,30 @@ class ParserFramework:
         """
         pass
 
+    def expected_terminals(self) -> Optional[FrozenSet[str]]:
+        """
+        The terminals which can be parsed in the current state, for `LexerFramework.set_expected_callback()`. Override this method if the parser knows, None for any terminal.
+        """
+        return None
+
     ###################################
     # receive result of lexing region #
     ###################################
 
+    def set_reorder_window(self, window: int = 0) -> None:
+        """
+        Set the reorder window of :obj:`parse_lex_unit()` and :obj:`parse_lex_units()`, so the results from parallel or speculative lexers can arrive out of order. A result whose index is after the parsing index and within `window` is held, and the held results are parsed in order as soon as the gap before them is filled.
+
+        Parameters
+        ----------
+        window : int, optional
+            how many indexes after the parsing index can be held, 0 if the results must be in order
+        """
+        self.reorder_window = window
+
     def parse_lex_unit(self, lexer_result: LexerResult) -> None:
         """
-        Receive LexerResult and Parse synchronously, order of `lexer_result.index` will be check.
+        Receive LexerResult and Parse synchronously, order of `lexer_result.index` will be check. With the reorder window, see :obj:`set_reorder_window()`, an early result is held until its predecessors are parsed.
 
         Parameters
         ----------
@@ -237,52 +330,155 @@ class ParserFramework:
         Raises
         ------
         ParseIndexException
-            when index is not match
+            when index is not match, or index is already parsed or held with the reorder window
+        ReorderOverflowException
+            when index is beyond the reorder window
         """
         # check the order
         if lexer_result.index != self._index:
-            raise ParseIndexException(self._index, lexer_result.index)
+            self._hold_lex_unit(lexer_result)
+            return
         # transfer to parse unit
         parse_unit = ParseUnit(lexer_result.name, [],
-                               lexer_result.position, lexer_result.value, None)
+                               lexer_result.raw_position, lexer_result.raw_value, None, lexer_result.kind)
         # to parse it
         self.parse(parse_unit)
         # move to next
         self._index += 1
+        # drain the held results which are in order now
+        if self._reorder_buffer:
+            self._drain_reorder_buffer()
+
+    def _hold_lex_unit(self, lexer_result: LexerResult) -> None:
+        """
+        Hold the early `lexer_result` in the reorder buffer, or raise if it cannot be held.
+        """
+        index = lexer_result.index
+        if not self.reorder_window or index < self._index or index in self._reorder_buffer:
+            raise ParseIndexException(self._index, index)
+        if index - self._index > self.reorder_window:
+            raise ReorderOverflowException(self._index, index, self.reorder_window)
+        self._reorder_buffer[index] = lexer_result
+
+    def _drain_reorder_buffer(self) -> None:
+        """
+        Parse the held results from the parsing index until a gap.
+        """
+        buffer = self._reorder_buffer
+        parse = self.parse
+        while self._index in buffer:
+            lexer_result = buffer.pop(self._index)
+            parse(ParseUnit(lexer_result.name, [],
+                            lexer_result.raw_position, lexer_result.raw_value, None, lexer_result.kind))
+            self._index += 1
+
+    def parse_lex_units(self, lexer_results: List[LexerResult]) -> None:
+        """
+        Receive a batch of LexerResults and Parse synchronously, as :obj:`parse_lex_unit()` for each one, order of `lexer_result.index` will be check. It can be set as the batch callback of lexer by `LexerFramework.set_on_accepted_batch_callback()`.
+
+        Parameters
+        ----------
+        lexer_results : :obj:`list` of :obj:`LexerResult`
+            The Results of Lexer in order, or out of order within the reorder window
 
-    async def parse_lex_unit_async(self, lexer_result: LexerResult, timeout: int = 600) -> None:
+        Raises
+        ------
+        ParseIndexException
+            when index is not match
+        ReorderOverflowException
+            when index is beyond the reorder window
+        """
+        parse = self.parse
+        for lexer_result in lexer_results:
+            # check the order
+            if lexer_result.index != self._index:
+                self._hold_lex_unit(lexer_result)
+                continue
+            parse(ParseUnit(lexer_result.name, [],
+                            lexer_result.raw_position, lexer_result.raw_value, None, lexer_result.kind))
+            self._index += 1
+            if self._reorder_buffer:
+                self._drain_reorder_buffer()
+
+    def parse_token_buffer(self, token_buffer: TokenBuffer) -> None:
+        """
+        Receive all tokens in a :obj:`TokenBuffer` and Parse synchronously in order, the tokens are read from the columns directly without :obj:`LexerResult` objects.
+
+        Parameters
+        ----------
+        token_buffer : :obj:`TokenBuffer`
+            tokens from `LexerFramework.lex_to_token_buffer()`
         """
-        Receive LexerResult and Parse asynchronously, order of `lexer_result.index` will be checked. The author suggests to use `asyncio.create_task()` to invoke this method/function. This impl is different from C# version, the inner includes a waiting loop for matching `lexer_result.index`.
+        parse = self.parse
+        names = token_buffer.names
+        kinds = token_buffer.kinds
+        values = token_buffer.values
+        starts = token_buffer.starts
+        line_index = token_buffer.line_index
+        # kind of buffer to symbol id
+        if self.symbol_table is None:
+            symbol_ids = [-1] * len(names)
+        else:
+            symbol_ids = [self.symbol_table.get_id(name) for name in names]
+        for index in range(len(kinds)):
+            kind = kinds[index]
+            value = values[index] if index in values else token_buffer.raw_value(index)
+            parse(ParseUnit(names[kind], [], LazyPosition(
+                line_index, starts[index]), value, None, symbol_ids[kind]))
+            self._index += 1
+
+    async def parse_lex_unit_async(self, lexer_result: LexerResult, timeout: Optional[float] = 600) -> None:
+        """
+        Receive LexerResult and Parse asynchronously, order of `lexer_result.index` will be checked. The author suggests to use `asyncio.create_task()` to invoke this method/function, so the results can arrive in any order. A result before its turn waits on a future keyed by its index without blocking the event loop, and is woken as soon as its predecessor is parsed. All results of the lexing should be received by this method, since the sync methods do not wake the waiting results.
 
         Parameters
         ----------
         lexer_result : :obj:`LexerResult`
             The Result of Lexer
-        timeout : int
-            The wait timeout seconds
+        timeout : float, optional
+            The wait timeout seconds, None for no timeout
 
         Raises
         ------
+        ParseIndexException
+            when index is already parsed or is waited by another result
         WaitTimeoutException
             when this waits timeout for matching `lexer_result.index`.
+        Exception
+            the exception raised by parsing, which is also raised by the results waiting at that time
         """
-        # The author changed the impl of ansyc task instead of C# version
-        # wait for index, this can be cause dead loop if you DO NOT correctly use this framework.
-        timeout = 100 * timeout  # 10 minus default
-        now = 0
-        while lexer_result.index != self._index:
-            time.sleep(0.01)
-            now += 1
-            if now > timeout:
-                raise WaitTimeoutException(self._index, lexer_result.index)
+        index = lexer_result.index
+        if index < self._index or index in self._waiters:
+            raise ParseIndexException(self._index, index)
+        if index != self._index:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters[index] = waiter
+            try:
+                await asyncio.wait_for(waiter, timeout)
+            except asyncio.TimeoutError:
+                raise WaitTimeoutException(self._index, index) from None
+            finally:
+                if self._waiters.get(index) is waiter:
+                    del self._waiters[index]
         # now is this index time
         # transfer to parse unit
         parse_unit = ParseUnit(lexer_result.name, [],
-                               lexer_result.position, lexer_result.value, None)
-        # to parse it
-        self.parse(parse_unit)
-        # move to next
+                               lexer_result.raw_position, lexer_result.raw_value, None, lexer_result.kind)
+        # to parse it, and fail the waiting results if it fails, since their turns never come
+        try:
+            self.parse(parse_unit)
+        except Exception as e:
+            waiters = list(self._waiters.values())
+            self._waiters.clear()
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            raise
+        # move to next, and wake it if it is waiting
         self._index += 1
+        waiter = self._waiters.pop(self._index, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
 
     ##############################
     # receive productions region #
@@ -0,0 +1,83 @@
+#    CompilerFramework Python Version - LexerFramework
+#    Copyright(C) 2023  刘迅承
+
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with this program.If not, see<https://www.gnu.org/licenses/>.
+
+from typing import List, Dict
+import sys
+
+
+class SymbolTable:
+    """
+    The table shared by lexer and parser, which maps every terminal and nonterminal to a small int, so the symbols are compared and looked up as ints instead of strings.
+
+    Parameters
+    ----------
+    self.symbols : :obj:`list` of str
+        symbol id to symbol
+    """
+
+    def __init__(self) -> None:
+        self.symbols: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def add(self, symbol: str) -> int:
+        """
+        Add a symbol if it is new, and return its id.
+
+        Parameters
+        ----------
+        symbol : str
+            the symbol
+
+        Returns
+        -------
+        int
+            id of the symbol
+        """
+        symbol_id = self._ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self.symbols)
+            symbol = sys.intern(symbol)
+            self._ids[symbol] = symbol_id
+            self.symbols.append(symbol)
+        return symbol_id
+
+    def get_id(self, symbol: str) -> int:
+        """
+        Get the id of a symbol, -1 if the symbol is not in table.
+
+        Parameters
+        ----------
+        symbol : str
+            the symbol
+        """
+        return self._ids.get(symbol, -1)
+
+    def get_symbol(self, symbol_id: int) -> str:
+        """
+        Get the symbol of an id.
+
+        Parameters
+        ----------
+        symbol_id : int
+            id of the symbol
+        """
+        return self.symbols[symbol_id]
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._ids
@@ -1,9 +1,21 @@
-from lexer_framework import HLlangLexerFramework, LexerFramework, LexerResult
+from lexer_framework import GroupStackException, HLlangLexerFramework, InstrumentedMatcher, LexerFramework, LexerResult, LexEngine, LazyPosition, LazyValue, NoMatchException
+from lex_session import LexSession
+from char_prescan import CharClassPrescan, np
+from dfa_lexer import DFAGroupMatcher
+import benchmark
+from bu_parser_framework import LRTableERRException
 from lr_parser import LR_0_Parser, LR_1_Parser, SLR_Parser
-from parser_framework import ParseUnit
+from parser_framework import ParseIndexException, ParseUnit, ReorderOverflowException, WaitTimeoutException
 from typing import List
 from io import StringIO
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import tempfile
 import unittest
+import unittest.mock
 
 class TestLR_ParserInMath(unittest.TestCase):
     """
@@ -170,6 +182,816 @@ class TestLR_ParserInMath(unittest.TestCase):
         self.lexer.lex_stream(ss)
         self.assertTrue(self.parser.acc)
 
+    def test_LR_1_batch(self):
+        print()
+        for engine in (LexEngine.ITEMS, LexEngine.DFA):
+            self.build_math_parser(k=1)
+            self.lexer.set_on_accepted_batch_callback(self.parser.parse_lex_units, 4)
+            self.lexer.set_engine(engine)
+            self.lexer.lex_stream(StringIO("a = 1 + 2 * (3 - 4) / 5\nb = 5+4*(3-2)/1"))
+            self.assertTrue(self.parser.acc)
+
+    def test_LR_1_token_buffer(self):
+        print()
+        self.build_math_parser(k=1)
+        self.lexer.set_engine(LexEngine.REGEX)
+        token_buffer = self.lexer.lex_to_token_buffer("a = 1 + 2 * (3 - 4) / 5\nb = 5+4*(3-2)/1")
+        self.assertEqual(len(token_buffer), 26)
+        self.assertEqual(token_buffer[-1].value, 1.0)
+        self.assertEqual(token_buffer[13].name, "Variable")
+        self.assertEqual(token_buffer[13].position, (2, 1))
+        self.parser.parse_token_buffer(token_buffer)
+        self.parser.on_finish()
+        self.assertTrue(self.parser.acc)
+
+    def test_LR_1_symbol_table(self):
+        print()
+        self.build_math_parser(k=1)
+        self.lexer.set_symbol_table(self.parser.symbol_table)
+        self.addCleanup(self.lexer.set_symbol_table, None)
+        kinds = []
+        self.lexer.on_lexed_callback = lambda lexer_result: kinds.append(lexer_result.kind) or lexer_result.name != "Null"
+        self.lexer.lex_buffer("a = 1 + 2 * (3 - 4) / 5\nb = 5+4*(3-2)/1")
+        self.assertTrue(self.parser.acc)
+        self.assertEqual(self.parser.symbol_table.get_symbol(kinds[0]), "Variable")
+        self.assertNotIn(-1, kinds)
+
+    def test_LR_1_regex_engine(self):
+        print()
+        self.build_math_parser(k=1)
+        self.lexer.set_engine(LexEngine.REGEX)
+        s = "a = 1 + 2 * (3 - 4) / 5\n" \
+            "b = 5+4*(3-2)/1"
+        ss = StringIO(s)
+        self.lexer.lex_stream(ss)
+        self.assertTrue(self.parser.acc)
+
+    def build_signed_lexer(self, engine):
+        """
+        Build a lexer for the math parser with signed Number before Sub, so "-4" is a Number without parser
+        """
+        self.lexer = HLlangLexerFramework([[]], engine)
+        self.lexer.add_constants("Number", HLlangLexerFramework.convert_float, 0, 0, False, "(-|\\+)?\\d+(\\.\\d+)?")
+        self.lexer.add_operators("(", LexerFramework.none_format_cap_text, 0, 0, "\\(")
+        self.lexer.add_operators(")", LexerFramework.none_format_cap_text, 0, 0, "\\)")
+        self.lexer.add_operators("Sub", LexerFramework.none_format_cap_text, 0, 0, "-")
+        self.lexer.add_operators("Mul", LexerFramework.none_format_cap_text, 0, 0, "\\*")
+        self.lexer.add_operators("Assign", LexerFramework.none_format_cap_text, 0, 0, "=")
+        self.lexer.add_identifier("Variable")
+        self.lexer.add_lex_item("Null", "\\s+", skip=True)
+        self.lexer.on_accepted_callback = self._on_accepted_callback
+        self.lexer.on_finished_callback = self._on_finished_callback
+
+    def test_LR_1_expected_terminals(self):
+        print()
+        s = "a = 5 -4\nb = -1 * (2 -3)"
+        for engine in LexEngine:
+            self.build_math_parser(k=1)
+            self.build_signed_lexer(engine)
+            self.assertRaises(LRTableERRException, self.lexer.lex_buffer, s)
+            self.build_math_parser(k=1)
+            self.build_signed_lexer(engine)
+            self.lexer.set_expected_callback(self.parser.expected_terminals, self.parser.terminals())
+            self.lexer.lex_buffer(s)
+            self.assertTrue(self.parser.acc)
+            self.build_math_parser(k=1)
+            self.build_signed_lexer(engine)
+            self.lexer.set_expected_callback(self.parser.expected_terminals, self.parser.terminals())
+            self.lexer.lex_stream(StringIO(s))
+            self.assertTrue(self.parser.acc)
+
+
+    def test_LR_1_async(self):
+        print()
+        self.build_math_parser(k=1)
+        lexer_results = []
+        self.lexer.on_accepted_callback = lexer_results.append
+        self.lexer.on_finished_callback = lambda num: None
+        self.lexer.lex_stream(StringIO("a = 1 + 2 * (3 - 4) / 5\nb = 5+4*(3-2)/1"))
+
+        async def parse_reversed():
+            await asyncio.gather(*(asyncio.create_task(self.parser.parse_lex_unit_async(lexer_result, 1))
+                                   for lexer_result in reversed(lexer_results)))
+
+        asyncio.run(parse_reversed())
+        self.parser.on_finish()
+        self.assertTrue(self.parser.acc)
+
+        async def parse_late():
+            await self.parser.parse_lex_unit_async(lexer_results[3], 0.01)
+
+        self.build_math_parser(k=1)
+        with self.assertRaises(WaitTimeoutException) as e:
+            asyncio.run(parse_late())
+        self.assertEqual((e.exception.index_p, e.exception.index_l), (0, 3))
+        self.assertEqual(self.parser._waiters, {})
+        asyncio.run(self.parser.parse_lex_unit_async(lexer_results[0]))
+        self.assertRaises(ParseIndexException, asyncio.run, self.parser.parse_lex_unit_async(lexer_results[0]))
+
+    def test_LR_1_async_parse_error(self):
+        print()
+        self.build_math_parser(k=1)
+        lexer_results = []
+        self.lexer.on_accepted_callback = lexer_results.append
+        self.lexer.on_finished_callback = lambda num: None
+        self.lexer.lex_stream(StringIO("a = 1 + + 2 * 3"))
+
+        async def parse_reversed():
+            # the waiting results fail with the parse error instead of waiting until timeout
+            return await asyncio.wait_for(asyncio.gather(*(asyncio.create_task(self.parser.parse_lex_unit_async(lexer_result))
+                                                           for lexer_result in reversed(lexer_results)), return_exceptions=True), 5)
+
+        outcomes = list(reversed(asyncio.run(parse_reversed())))
+        self.assertEqual(outcomes[:4], [None] * 4)
+        self.assertTrue(all(isinstance(outcome, LRTableERRException) for outcome in outcomes[4:]))
+        self.assertEqual(self.parser._waiters, {})
+
+    def test_LR_1_reorder(self):
+        print()
+        self.build_math_parser(k=1)
+        lexer_results = []
+        self.lexer.on_accepted_callback = lexer_results.append
+        self.lexer.on_finished_callback = lambda num: None
+        self.lexer.lex_stream(StringIO("a = 1 + 2 * (3 - 4) / 5\nb = 5+4*(3-2)/1"))
+        # reverse every 4 results, the farthest one is 3 indexes early
+        shuffled = [lexer_result for i in range(0, len(lexer_results), 4) for lexer_result in reversed(lexer_results[i:i + 4])]
+        for batch in (False, True):
+            self.build_math_parser(k=1)
+            self.parser.set_reorder_window(3)
+            if batch:
+                self.parser.parse_lex_units(shuffled)
+            else:
+                for lexer_result in shuffled:
+                    self.parser.parse_lex_unit(lexer_result)
+            self.parser.on_finish()
+            self.assertTrue(self.parser.acc)
+        self.build_math_parser(k=1)
+        self.assertRaises(ParseIndexException, self.parser.parse_lex_unit, lexer_results[1])
+        self.parser.set_reorder_window(2)
+        with self.assertRaises(ReorderOverflowException) as e:
+            self.parser.parse_lex_unit(lexer_results[3])
+        self.assertEqual((e.exception.index_p, e.exception.index_l, e.exception.window), (0, 3, 2))
+        self.parser.parse_lex_unit(lexer_results[2])
+        self.assertRaises(ParseIndexException, self.parser.parse_lex_unit, lexer_results[2])
+        self.assertRaises(ParseIndexException, self.parser.on_finish)
+
+class TestLexerFramework(unittest.TestCase):
+    """
+    Test the engines and entries of LexerFramework
+    """
+
+    def build_lexer(self, engine=LexEngine.ITEMS):
+        """
+        Build a small lexer with reserved words, collect the results in `self.results`
+        """
+        self.results: List[LexerResult] = []
+        self.lexer = HLlangLexerFramework([[]], engine)
+        self.lexer.add_res_words("If", LexerFramework.none_format_cap_text, 0, 0, "if")
+        self.lexer.add_identifier("Id")
+        self.lexer.add_operators("Op", LexerFramework.none_format_cap_text, 0, 0, "==", "=")
+        self.lexer.add_constants("Int", HLlangLexerFramework.convert_int, 0, 0, True, "\\d+")
+        self.lexer.add_lex_item("Null", "\\s+", HLlangLexerFramework.drop_null)
+        self.lexer.on_lexed_callback = lambda lexer_result: True
+        self.lexer.on_accepted_callback = self.results.append
+        self.lexer.on_finished_callback = lambda num: None
+
+    def lexed(self):
+        return [(r.index, r.name, r.value, r.position) for r in self.results]
+
+    def build_order_lexer(self, groups=1):
+        """
+        Build a lexer whose line mode of lex_stream retries the later Lex items after a match, so "--2" is Sub and Number "-2"
+        """
+        self.results: List[LexerResult] = []
+        self.lexer = LexerFramework([[] for i in range(groups)])
+        self.lexer.add_lex_item("Sub", "-")
+        self.lexer.add_lex_item("Number", "-?\\d+")
+        self.lexer.add_lex_item("Null", "\\s+", skip=True)
+        self.lexer.on_accepted_callback = self.results.append
+
+    def test_regex_engine_same_as_items(self):
+        s = "if ifa == 12\nb = a"
+        self.build_lexer()
+        self.lexer.lex_stream(StringIO(s))
+        expected = self.lexed()
+        self.build_lexer(LexEngine.REGEX)
+        self.lexer.lex_stream(StringIO(s))
+        self.assertEqual(self.lexed(), expected)
+        self.assertEqual(expected[1], (1, "Id", "ifa", (1, 4)))
+
+    def test_dfa_engine_same_as_items(self):
+        s = "if ifa == 12\nb = a\nif=3"
+        self.build_lexer()
+        self.lexer.lex_stream(StringIO(s))
+        expected = self.lexed()
+        self.build_lexer(LexEngine.DFA)
+        self.lexer.add_lex_item("Back", "(#)\\1")
+        self.lexer.lex_stream(StringIO(s + " ##"))
+        self.assertEqual(self.lexed()[:-1], expected)
+        self.assertEqual(self.results[-1].name, "Back")
+        matcher = self.lexer._get_matcher(0)
+        self.assertEqual([i.name for i in matcher.fallback_items], ["Back"])
+
+    def test_lex_buffer(self):
+        s = "a = 1 /* x\n y */ if\n  b == 2"
+        for engine in LexEngine:
+            self.build_lexer(engine)
+            self.lexer.add_lex_item("Comment", "/\\*.*?\\*/", HLlangLexerFramework.drop_null, re.DOTALL)
+            self.assertEqual(self.lexer.lex_buffer(s), 7)
+            self.assertEqual(self.lexed()[3], (3, "If", "if", (2, 7)))
+            self.assertEqual(self.lexed()[4], (4, "Id", "b", (3, 3)))
+            self.assertEqual([r.offset for r in self.results], [0, 2, 4, 17, 22, 24, 27])
+
+    def test_lex_file(self):
+        self.build_lexer(LexEngine.REGEX)
+        with tempfile.TemporaryDirectory() as path:
+            path = os.path.join(path, "a.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("a = 1\nb = a\n")
+            self.assertEqual(self.lexer.lex_file(path), 6)
+        self.assertEqual(self.lexed()[3], (3, "Id", "b", (2, 1)))
+
+    def test_iter_tokens(self):
+        self.build_lexer(LexEngine.REGEX)
+        tokens = self.lexer.iter_tokens(StringIO("a = 1\nb = c d"))
+        names = [r.name for r in tokens if r.name == "Id"]
+        self.assertEqual(names, ["Id", "Id", "Id", "Id"])
+        self.assertEqual(self.results, [])
+        tokens = self.lexer.iter_tokens("if a\n$")
+        self.assertEqual(next(tokens).position, (1, 1))
+        self.assertEqual(next(tokens).offset, 3)
+        self.assertRaises(NoMatchException, next, tokens)
+
+    def test_default_callbacks(self):
+        lexer = LexerFramework([[]])
+        lexer.add_lex_item("Word", "\\w+")
+        self.assertEqual(lexer.lex_stream(StringIO("abc")), 1)
+
+    def test_res_words_table(self):
+        s = "if ifa == 12\nelse b = if"
+        self.build_lexer()
+        self.lexer.add_res_words("Else", LexerFramework.none_format_cap_text, 0, 0, "else")
+        self.lexer.lex_item_groups[0].insert(1, self.lexer.lex_item_groups[0].pop())
+        self.lexer.lex_stream(StringIO(s))
+        expected = self.lexed()
+        self.assertEqual(expected[4][1], "Else")
+        for engine in LexEngine:
+            self.results.clear()
+            lexer = HLlangLexerFramework([[]], engine)
+            lexer.add_res_words_table("If", LexerFramework.none_format_cap_text, 0, 0, "if")
+            lexer.add_identifier("Id")
+            lexer.add_res_words_table("Else", LexerFramework.none_format_cap_text, 0, 0, "else")
+            lexer.add_operators("Op", LexerFramework.none_format_cap_text, 0, 0, "==", "=")
+            lexer.add_constants("Int", HLlangLexerFramework.convert_int, 0, 0, True, "\\d+")
+            lexer.add_lex_item("Null", "\\s+", HLlangLexerFramework.drop_null)
+            lexer.on_accepted_callback = self.results.append
+            self.assertEqual(len(lexer.lex_item_groups[0]), 5)
+            lexer.lex_stream(StringIO(s))
+            self.assertEqual(self.lexed(), expected)
+            self.results.clear()
+            lexer.lex_buffer(s)
+            self.assertEqual([r[1] for r in self.lexed()], [r[1] for r in expected])
+            self.assertEqual(set(lexer.res_word_tables[0]), {"if", "else"})
+            # the words added after the matchers are built are expected
+            lexer.set_expected_callback(lambda: frozenset(("While",)), {"While", "Id"})
+            self.assertRaises(NoMatchException, lexer.lex_buffer, "while")
+            lexer.add_res_words_table("While", LexerFramework.none_format_cap_text, 0, 0, "while")
+            self.results.clear()
+            lexer.lex_buffer("while")
+            self.assertEqual([r[1] for r in self.lexed()], ["While"])
+
+    def test_first_char_dispatch(self):
+        self.build_lexer()
+        self.lexer.add_lex_item("Else", "else", LexerFramework.none_format_cap_text, re.IGNORECASE)
+        dispatch = self.lexer._get_matcher(0).dispatch
+        names = [lex_item.name for lex_item in dispatch.lex_items]
+        self.assertEqual([names[i] for i in dispatch.candidates("i")], ["If", "Id", "Else"])
+        self.assertEqual([names[i] for i in dispatch.candidates("=")], ["Op", "Op", "Else"])
+        self.assertEqual([names[i] for i in dispatch.candidates("7")], ["Int", "Else"])
+        self.assertEqual([names[i] for i in dispatch.candidates(" ")], ["Null", "Else"])
+        self.assertEqual([lex_item.name for lex_item in dispatch.fallback_items], ["Else"])
+        self.lexer.lex_stream(StringIO("if == 1"))
+        self.assertEqual([r[1] for r in self.lexed()], ["If", "Op", "Int"])
+
+    def test_skip_items(self):
+        s = "if a == 12 # note\nb = 3"
+        self.build_lexer()
+        self.lexer.add_lex_item("Comment", "#[^\\n]*", HLlangLexerFramework.drop_null)
+        self.lexer.lex_stream(StringIO(s))
+        expected = self.lexed()
+        for engine in LexEngine:
+            self.results.clear()
+            lexer = HLlangLexerFramework([[]], engine)
+            lexer.add_res_words("If", LexerFramework.none_format_cap_text, 0, 0, "if")
+            lexer.add_identifier("Id")
+            lexer.add_operators("Op", LexerFramework.none_format_cap_text, 0, 0, "==", "=")
+            lexer.add_constants("Int", HLlangLexerFramework.convert_int, 0, 0, True, "\\d+")
+            lexer.add_lex_item("Null", "\\s+", skip=True)
+            lexer.add_delimiters("Comment", LexerFramework.none_format_cap_text, 0, 0, "#[^\\n]*", skip=True)
+            lexer.on_lexed_callback = lambda lexer_result: lexer_result.name not in ("Null", "Comment")
+            lexer.on_accepted_callback = self.results.append
+            lexer.lex_stream(StringIO(s))
+            self.assertEqual(self.lexed(), expected)
+            self.results.clear()
+            lexer.lex_buffer(s)
+            self.assertEqual([r[1:] for r in self.lexed()], [r[1:] for r in expected])
+
+    def test_engine_stream_order(self):
+        # the line mode of ITEMS retries the later items after a match, REGEX and DFA take the first match at each position
+        for engine, values in ((LexEngine.ITEMS, ["-", "-2"]), (LexEngine.REGEX, ["-", "-", "2"]), (LexEngine.DFA, ["-", "-", "2"])):
+            self.build_order_lexer()
+            self.lexer.set_engine(engine)
+            self.lexer.lex_stream(StringIO("--2"))
+            self.assertEqual([r.value for r in self.results], values)
+            self.results.clear()
+            self.lexer.lex_buffer("--2")
+            self.assertEqual([r.value for r in self.results], ["-", "-", "2"])
+
+    def test_iter_tokens_order(self):
+        # a reader is scanned by the first match at each position, not in the line mode order of lex_stream
+        self.build_order_lexer()
+        self.lexer.lex_stream(StringIO("--2"))
+        self.assertEqual([r.value for r in self.results], ["-", "-2"])
+        self.assertEqual([r.value for r in self.lexer.iter_tokens(StringIO("--2"))], ["-", "-", "2"])
+        self.assertEqual([r.value for r in self.lexer.iter_tokens("--2")], ["-", "-", "2"])
+
+    def test_expected_callback_stream_order(self):
+        s = "--2 - 3\n-4"
+        self.build_order_lexer()
+        self.lexer.lex_stream(StringIO(s))
+        expected = self.lexed()
+        self.assertEqual([r.value for r in self.results], ["-", "-2", "-", "3", "-", "4"])
+        for callback in (lambda: None, lambda: frozenset(("Sub", "Number"))):
+            self.results.clear()
+            self.lexer.set_expected_callback(callback, {"Sub", "Number"})
+            self.lexer.lex_stream(StringIO(s))
+            self.assertEqual(self.lexed(), expected)
+
+    def test_group_switch_stream_order(self):
+        s = "--2 - 3\n-4"
+        self.build_order_lexer()
+        self.lexer.lex_stream(StringIO(s))
+        expected = self.lexed()
+        # the switching items of another group do not change the matching order of group 0
+        self.build_order_lexer(2)
+        self.lexer.add_lex_item("Word", "[a-z]+", group=1)
+        self.lexer.add_lex_item("Close", ">", group=1, pop_group=True)
+        self.lexer.lex_stream(StringIO(s))
+        self.assertEqual(self.lexed(), expected)
+        # the switched group keeps the matching order too
+        self.results.clear()
+        self.lexer.add_lex_item("Open", "<", push_group=1)
+        self.lexer.lex_stream(StringIO("<ab>--2\n<c\nd>-4"))
+        self.assertEqual([(r.name, r.value, r.position) for r in self.results],
+                         [("Open", "<", (1, 1)), ("Word", "ab", (1, 2)), ("Close", ">", (1, 4)), ("Sub", "-", (1, 5)),
+                          ("Number", "-2", (1, 6)), ("Open", "<", (2, 1)), ("Word", "c", (2, 2)), ("Word", "d", (3, 1)),
+                          ("Close", ">", (3, 2)), ("Sub", "-", (3, 3)), ("Number", "4", (3, 4))])
+
+    def test_skip_only_lines(self):
+        s = "a\n# hi\nb = 1 # note"
+        self.build_lexer()
+        self.lexer.add_lex_item("Comment", "#.*", skip=True)
+        self.lexer.lex_stream(StringIO(s))
+        self.assertEqual(self.lexed(), [(0, "Id", "a", (1, 1)), (1, "Id", "b", (3, 1)),
+                                         (2, "Op", "=", (3, 3)), (3, "Int", 1, (3, 5))])
+        # the columns after skipped words
+        self.results.clear()
+        self.lexer.lex_stream(StringIO("# hi\n  b # c\nc  =  2"))
+        self.assertEqual(self.lexed(), [(0, "Id", "b", (2, 1)), (1, "Id", "c", (3, 1)),
+                                         (2, "Op", "=", (3, 4)), (3, "Int", 2, (3, 7))])
+
+    def test_line_end_anchor(self):
+        s = "a // c\nb = 1 // d\n"
+        expected = [("Id", "a", (1, 1)), ("Comment", "// c", (1, 3)), ("Id", "b", (2, 1)),
+                    ("Op", "=", (2, 3)), ("Int", 1, (2, 5)), ("Comment", "// d", (2, 7))]
+        for engine in LexEngine:
+            self.build_lexer(engine)
+            self.lexer.add_lex_item("Comment", "//.*$")
+            self.lexer.lex_stream(StringIO(s))
+            self.assertEqual([r[1:] for r in self.lexed()], expected)
+            self.results.clear()
+            self.lexer.lex_buffer(s)
+            self.assertEqual([r[1:] for r in self.lexed()], expected)
+            self.results.clear()
+            self.lexer.set_bytes_mode("utf-8")
+            self.lexer.lex_buffer(s.encode())
+            self.assertEqual([r[1:] for r in self.lexed()], expected)
+
+    def test_group_stack(self):
+        s = 'a "x {b "y"} z"\nc'
+        expected = [(0, "Id", "a", (1, 1)), (1, "Quote", '"', (1, 3)), (2, "Str", "x ", (1, 4)),
+                    (3, "LBrace", "{", (1, 6)), (4, "Id", "b", (1, 7)), (5, "Quote", '"', (1, 9)),
+                    (6, "Str", "y", (1, 10)), (7, "EndQuote", '"', (1, 11)), (8, "RBrace", "}", (1, 12)),
+                    (9, "Str", " z", (1, 13)), (10, "EndQuote", '"', (1, 15)), (11, "Id", "c", (2, 1))]
+        self.results: List[LexerResult] = []
+        for engine in LexEngine:
+            self.results.clear()
+            lexer = LexerFramework([[], []], engine)
+            lexer.add_lex_item("Quote", '"', push_group=1)
+            lexer.add_lex_item("RBrace", "}", pop_group=True)
+            lexer.add_lex_item("Id", "[a-z]+")
+            lexer.add_lex_item("Null", "\\s+", skip=True)
+            lexer.add_lex_item("EndQuote", '"', group=1, pop_group=True)
+            lexer.add_lex_item("LBrace", "{", group=1, push_group=0)
+            lexer.add_lex_item("Str", '[^"{]+', group=1)
+            lexer.on_accepted_callback = self.results.append
+            lexer.lex_stream(StringIO(s))
+            self.assertEqual(self.lexed(), expected)
+            self.results.clear()
+            lexer.lex_buffer(s)
+            self.assertEqual(self.lexed(), expected)
+            self.results.clear()
+            lexer.lex_chunks(s[i:i + 2] for i in range(0, len(s), 2))
+            self.assertEqual(self.lexed(), expected)
+            session = LexSession(lexer, s)
+            # removing the inner closing quote turns "} z" into the inner string, re-Lexed until the text end
+            first, removed, new_words = session.apply_edit(10, 11, "")
+            self.assertEqual((first, removed), (5, 7))
+            self.assertEqual([item.name for item, start, end in session],
+                             ["Id", "Quote", "Str", "LBrace", "Id", "Quote", "Str", "EndQuote", "Id"])
+            self.assertRaises(GroupStackException, lexer.lex_buffer, "a}")
+
+    def test_instrumentation(self):
+        s = "if a == 12\nb = 3"
+        for engine in LexEngine:
+            self.build_lexer(engine)
+            self.lexer.lex_stream(StringIO(s))
+            expected = self.lexed()
+            self.results.clear()
+            self.lexer.set_instrumentation()
+            self.lexer.lex_stream(StringIO(s))
+            self.assertEqual(self.lexed(), expected)
+            snapshot = self.lexer.stats.snapshot()
+            self.assertEqual(snapshot["groups"][0]["matches"], 12)
+            self.assertEqual(snapshot["groups"][0]["consumed"], 15)
+            items = {item["pattern"]: item for item in snapshot["items"]}
+            self.assertEqual(items["=="]["matches"], 1)
+            self.assertEqual(items["[A-Za-z]\\w*"]["consumed"], 2)
+            if engine == LexEngine.ITEMS:
+                self.assertEqual(items["=="]["attempts"], 2)
+            self.assertIn("[A-Za-z]\\w*", self.lexer.stats.report())
+            self.lexer.set_instrumentation(False)
+            self.assertIsNone(self.lexer.stats)
+            self.assertNotIsInstance(self.lexer._get_matcher(0), InstrumentedMatcher)
+
+    def test_instrumentation_stream_order(self):
+        s = "--2 - 3\n-4"
+        self.build_order_lexer()
+        self.lexer.lex_stream(StringIO(s))
+        expected = self.lexed()
+        self.results.clear()
+        self.lexer.set_instrumentation()
+        self.lexer.lex_stream(StringIO(s))
+        self.assertEqual(self.lexed(), expected)
+        items = {item["name"]: item for item in self.lexer.stats.snapshot()["items"]}
+        self.assertEqual(items["Sub"]["matches"], 3)
+        self.assertEqual(items["Number"]["matches"], 3)
+        self.assertEqual(self.lexer.stats.groups[0].consumed, len(s) - 1)
+
+    def test_lazy_values(self):
+        converted = []
+
+        def convert_int(s):
+            converted.append(s)
+            return int(s)
+
+        s = "a = 12\nb = 0"
+        self.results = []
+        lexer = HLlangLexerFramework([[]])
+        lexer.add_identifier("Id")
+        lexer.add_operators("Op", LexerFramework.none_format_cap_text, 0, 0, "=")
+        lexer.add_constants("Int", convert_int, 0, 0, True, "\\d+", lazy=True)
+        lexer.add_lex_item("Null", "\\s+", skip=True)
+        lexer.on_accepted_callback = self.results.append
+        for lex in (lambda: lexer.lex_stream(StringIO(s)), lambda: lexer.lex_buffer(s)):
+            self.results.clear()
+            converted.clear()
+            self.assertEqual(lex(), 6)
+            self.assertEqual(converted, [])
+            self.assertIsInstance(self.results[2].raw_value, LazyValue)
+            self.assertEqual(self.results[2].value, 12)
+            self.assertEqual(self.results[2].value, 12)
+            self.assertEqual(self.results[5].value, 0)
+            self.assertEqual(converted, ["12", "0"])
+            unit = ParseUnit("Int", [], (1, 1), self.results[5].raw_value, None)
+            self.assertEqual(unit.value, 0)
+        converted.clear()
+        token_buffer = lexer.lex_to_token_buffer(s)
+        self.assertIsInstance(token_buffer[2].raw_value, LazyValue)
+        self.assertEqual([token.value for token in token_buffer], ["a", "=", 12, "b", "=", 0])
+        self.assertEqual(token_buffer[2].raw_value, 12)
+        self.assertEqual(converted, ["12", "0"])
+
+    def test_lazy_positions(self):
+        self.build_lexer()
+        self.lexer.lex_buffer("a = 1\n\nif b == 22")
+        self.assertIsInstance(self.results[5].raw_position, LazyPosition)
+        unit = ParseUnit(self.results[5].name, [], self.results[5].raw_position, None, None)
+        self.assertEqual(unit.position, (3, 6))
+        self.assertEqual(self.results[5].position, (3, 6))
+        self.assertEqual(self.results[5].raw_position, (3, 6))
+        self.assertEqual([r[3] for r in self.lexed()], [(1, 1), (1, 3), (1, 5), (3, 1), (3, 4), (3, 6), (3, 9)])
+
+    def test_lex_chunks(self):
+        s = "if ifa == 12\nb = 7 if\n\nc == 345"
+        for engine in LexEngine:
+            self.build_lexer(engine)
+            self.lexer.lex_buffer(s)
+            expected = self.lexed()
+            offsets = [r.offset for r in self.results]
+            for size in (1, 2, 5, 64):
+                self.results.clear()
+                data = s.encode("utf-8")
+                self.lexer.lex_chunks([data[i:i + size] for i in range(0, len(data), size)], margin=2)
+                self.assertEqual(self.lexed(), expected)
+                self.assertEqual([r.offset for r in self.results], offsets)
+        self.results.clear()
+        read_fd, write_fd = os.pipe()
+        with os.fdopen(write_fd, "w") as writer:
+            writer.write(s)
+        with os.fdopen(read_fd, "r") as reader:
+            self.assertEqual(self.lexer.lex_reader(reader, block_size=4), len(expected))
+        self.assertEqual(self.lexed(), expected)
+        self.assertRaises(NoMatchException, self.lexer.lex_chunks, ["a = 1\n", "b $"])
+
+    def test_lex_chunks_long_words(self):
+        # the comment and the string are longer than both the margin and the block size
+        s = "a = 1\n/*" + "x *\n" * 3000 + "*/ b == \"" + "y" * 5000 + "\"\nif c"
+        for engine in LexEngine:
+            self.build_lexer(engine)
+            self.lexer.add_lex_item("Comment", "/\\*.*?\\*/", LexerFramework.none_format_cap_text, re.DOTALL, skip=True)
+            self.lexer.add_lex_item("Str", '"[^"]*"')
+            self.lexer.lex_buffer(s)
+            expected = self.lexed()
+            self.results.clear()
+            self.assertEqual(self.lexer.lex_reader(StringIO(s), block_size=4096), len(expected))
+            self.assertEqual(self.lexed(), expected)
+            self.results.clear()
+            self.lexer.lex_chunks([s[i:i + 100] for i in range(0, len(s), 100)], margin=10)
+            self.assertEqual(self.lexed(), expected)
+            with self.assertRaises(NoMatchException) as e:
+                self.lexer.lex_reader(StringIO(s[:9000]), block_size=4096)
+            self.assertEqual((e.exception.line, e.exception.col), (2, 1))
+
+    def test_lex_async(self):
+        s = "if ifa == 12\nb = 7 if\n\nc == 345"
+        self.build_lexer(LexEngine.REGEX)
+        self.lexer.lex_buffer(s)
+        expected = self.lexed()
+
+        def stream_reader(data):
+            reader = asyncio.StreamReader()
+            reader.feed_data(data)
+            reader.feed_eof()
+            return reader
+
+        async def collect(data):
+            return [(r.index, r.name, r.value, r.position) async for r in self.lexer.iter_tokens_async(stream_reader(data), block_size=3, margin=2)]
+
+        async def lex_concurrently():
+            return await asyncio.gather(*(collect(s.encode("utf-8")) for i in range(3)))
+
+        async def lex(data):
+            return await self.lexer.lex_async(stream_reader(data), block_size=5)
+
+        self.assertEqual(asyncio.run(lex_concurrently()), [expected] * 3)
+        self.results.clear()
+        self.assertEqual(asyncio.run(lex(s.encode("utf-8"))), len(expected))
+        self.assertEqual(self.lexed(), expected)
+        with self.assertRaises(NoMatchException):
+            asyncio.run(lex(b"a = 1\nb $"))
+
+    def test_lex_async_long_words(self):
+        s = "a = 1\n/*" + "x *\n" * 3000 + "*/ b == 2"
+        self.build_lexer(LexEngine.DFA)
+        self.lexer.add_lex_item("Comment", "/\\*.*?\\*/", LexerFramework.none_format_cap_text, re.DOTALL, skip=True)
+        self.lexer.lex_buffer(s)
+        expected = self.lexed()
+        data = s.encode("utf-8")
+
+        async def feed(reader):
+            # the comment arrives in several reads, longer than the block size and the margin
+            for i in range(0, len(data), 1000):
+                reader.feed_data(data[i:i + 1000])
+                await asyncio.sleep(0)
+            reader.feed_eof()
+
+        async def collect(reader):
+            return [(r.index, r.name, r.value, r.position) async for r in self.lexer.iter_tokens_async(reader, block_size=4096, margin=16)]
+
+        async def lex():
+            reader = asyncio.StreamReader()
+            return (await asyncio.gather(collect(reader), feed(reader)))[0]
+
+        self.assertEqual(asyncio.run(lex()), expected)
+
+    def test_lex_parallel(self):
+        s = "".join(f"a{i} = {i}\nif b == {i}\n" for i in range(200))
+        self.build_lexer(LexEngine.DFA)
+        with tempfile.TemporaryDirectory() as path:
+            path = os.path.join(path, "a.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(s)
+            self.lexer.lex_file(path)
+            expected = self.lexed()
+            self.results.clear()
+            self.assertEqual(self.lexer.lex_parallel(path, 3), len(expected))
+            self.assertEqual(self.lexed(), expected)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("$")
+            self.assertRaises(NoMatchException, self.lexer.lex_parallel, path, 3)
+
+    def test_lex_parallel_bytes_mode(self):
+        s = "".join(f'a{i} = "é{i}"; b == {i}\n' for i in range(100))
+        for engine in LexEngine:
+            self.build_lexer(engine)
+            self.lexer.add_lex_item("Str", '"[^"]*"', lazy=True)
+            self.lexer.add_lex_item("Semi", ";")
+            self.lexer.set_bytes_mode("utf-8")
+            with tempfile.TemporaryDirectory() as path:
+                path = os.path.join(path, "a.txt")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(s)
+                self.lexer.lex_file(path)
+                expected = self.lexed()
+                offsets = [r.offset for r in self.results]
+                self.results.clear()
+                # offsets count bytes as lex_file, columns count chars
+                self.lexer.lex_parallel(path, 3, boundary=b";")
+                self.assertEqual(self.lexed(), expected)
+                self.assertEqual([r.offset for r in self.results], offsets)
+                self.assertEqual((self.results[5].offset, self.results[5].position), (14, (1, 14)))
+
+    def test_lex_parallel_spawn(self):
+        # the default format_cap_text of Lex items is pickled to spawned workers
+        s = "".join(f'a{i} = "{i}"\n' for i in range(100))
+        self.build_lexer(LexEngine.DFA)
+        self.lexer.add_lex_item("Str", '"[^"]*"')
+        with tempfile.TemporaryDirectory() as path:
+            path = os.path.join(path, "a.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(s)
+            self.lexer.lex_file(path)
+            expected = self.lexed()
+            self.results.clear()
+            self.lexer.lex_parallel(path, 2, mp_context=multiprocessing.get_context("spawn"))
+            self.assertEqual(self.lexed(), expected)
+
+    def test_lex_parallel_boundary(self):
+        s = "".join(f"a{i} = {i}; b = 2;\nif c == {i}; d = 4\n" for i in range(100))
+        self.build_lexer(LexEngine.DFA)
+        self.lexer.add_lex_item("Semi", ";")
+        with tempfile.TemporaryDirectory() as path:
+            path = os.path.join(path, "a.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(s)
+            self.lexer.lex_file(path)
+            expected = self.lexed()
+            self.results.clear()
+            # the chunks end at ";" in the middle of lines
+            self.lexer.lex_parallel(path, 4, boundary=b";")
+            self.assertEqual(self.lexed(), expected)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("e = 5; f $")
+            with self.assertRaises(NoMatchException) as e:
+                self.lexer.lex_parallel(path, 4, boundary=b";")
+            self.assertEqual((e.exception.line, e.exception.col), (201, 10))
+
+    def test_lex_parallel_groups(self):
+        s = "".join(f'a "x {{b "y{i}"}} z"\nc\n' for i in range(100))
+        self.results: List[LexerResult] = []
+        for engine in LexEngine:
+            lexer = LexerFramework([[], []], engine)
+            lexer.add_lex_item("Quote", '"', push_group=1)
+            lexer.add_lex_item("RBrace", "}", pop_group=True)
+            lexer.add_lex_item("Id", "[a-z]+")
+            lexer.add_lex_item("Null", "\\s+", skip=True)
+            lexer.add_lex_item("EndQuote", '"', group=1, pop_group=True)
+            lexer.add_lex_item("LBrace", "{", group=1, push_group=0)
+            lexer.add_lex_item("Str", '[^"{]+', group=1)
+            lexer.on_accepted_callback = self.results.append
+            with tempfile.TemporaryDirectory() as path:
+                path = os.path.join(path, "a.txt")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(s)
+                self.results.clear()
+                lexer.lex_file(path)
+                expected = self.lexed()
+                self.results.clear()
+                lexer.lex_parallel(path, 3)
+                self.assertEqual(self.lexed(), expected)
+
+    def test_bytes_mode(self):
+        s = 'a = "é"\nif b == 12 "c"'
+        for engine in LexEngine:
+            self.build_lexer(engine)
+            self.lexer.add_lex_item("Str", '"[^"]*"', lazy=True)
+            self.lexer.lex_buffer(s)
+            expected = self.lexed()
+            self.lexer.set_bytes_mode("utf-8")
+            for buf in (s.encode(), memoryview(s.encode())):
+                self.results.clear()
+                self.lexer.lex_buffer(buf)
+                self.assertEqual(self.lexed(), expected)
+            # offsets count bytes, columns count chars
+            self.assertEqual(self.results[3].offset, 9)
+            self.assertEqual(self.results[3].position, (2, 1))
+            token_buffer = self.lexer.lex_to_token_buffer(s.encode())
+            self.assertEqual([(token.name, token.value, token.position) for token in token_buffer],
+                             [(name, value, position) for index, name, value, position in expected])
+            with self.assertRaises(NoMatchException) as e:
+                self.lexer.lex_buffer('a = "é" $'.encode())
+            self.assertEqual((e.exception.line, e.exception.col), (1, 9))
+
+    def test_compiled_cache(self):
+        s = "if a == 12\nb = 3"
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # the re patterns of other engines are compiled again on loading, so they are not cached
+            for engine in (LexEngine.ITEMS, LexEngine.REGEX):
+                self.build_lexer(engine)
+                self.assertFalse(self.lexer.use_compiled_cache(cache_dir))
+                self.assertEqual(os.listdir(cache_dir), [])
+            self.build_lexer(LexEngine.DFA)
+            self.lexer.lex_buffer(s)
+            expected = self.lexed()
+            self.assertFalse(self.lexer.use_compiled_cache(cache_dir))
+            self.build_lexer(LexEngine.DFA)
+            # the loaded DFA is used without building
+            with unittest.mock.patch.object(DFAGroupMatcher, "__init__", side_effect=AssertionError):
+                self.assertTrue(self.lexer.use_compiled_cache(cache_dir))
+                self.lexer.lex_buffer(s)
+            self.assertEqual(self.lexed(), expected)
+            self.lexer.add_lex_item("Dollar", "\\$")
+            self.assertFalse(self.lexer.use_compiled_cache(cache_dir))
+            path = os.path.join(cache_dir, "broken.pickle")
+            with open(path, "wb") as f:
+                f.write(b"broken")
+            self.assertFalse(self.lexer.load_compiled(path))
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_char_prescan(self):
+        s = 'if ifa == 12\nb = "é" 3 "c"'
+        for engine in LexEngine:
+            self.build_lexer(engine)
+            self.lexer.add_lex_item("Str", '"[^"]*"')
+            self.lexer.lex_buffer(s)
+            expected = self.lexed()
+            prescan = CharClassPrescan(self.lexer)
+            self.lexer.set_prescan(prescan)
+            self.results.clear()
+            self.lexer.lex_buffer(s)
+            self.assertEqual(self.lexed(), expected)
+            # 4 bytes of end and 1 byte of class per char
+            ends, classes = prescan._run_ends(s, 0, False)
+            self.assertEqual((ends.itemsize, classes.itemsize), (4, 1))
+            self.lexer.set_bytes_mode("utf-8")
+            self.results.clear()
+            self.lexer.lex_buffer(s.encode())
+            self.assertEqual(self.lexed(), expected)
+            with self.assertRaises(NoMatchException) as e:
+                self.lexer.lex_buffer(b"a = 1 $")
+            self.assertEqual((e.exception.line, e.exception.col), (1, 7))
+
+    def test_benchmark(self):
+        self.assertEqual(benchmark.parse_size("1KB"), 1024)
+        self.assertEqual(benchmark.parse_size("1.5 mb"), 3 << 19)
+        self.assertRaises(ValueError, benchmark.parse_size, "1TB")
+        text = benchmark.generate_corpus("long_line", 4096)
+        self.assertNotIn("\n", text)
+        self.assertEqual(text, benchmark.generate_corpus("long_line", 4096))
+        self.assertGreaterEqual(len(text), 4096)
+        results = benchmark.run_benchmarks(list(benchmark.CORPORA), [2048], repeat=1)
+        json.dumps(results)
+        counts = {}
+        for result in results["results"]:
+            self.assertGreater(result["tokens"], 0)
+            self.assertGreater(result["peak_memory"], 0)
+            counts.setdefault(result["corpus"], set()).add(result["tokens"])
+        # all engines and methods find the same words
+        self.assertEqual([len(tokens) for tokens in counts.values()], [1, 1, 1])
+
+    def test_lex_session(self):
+        self.build_lexer(LexEngine.ITEMS)
+        session = LexSession(self.lexer, "a = 1\nif b == 22\n")
+        first, removed, words = session.apply_edit(10, 10, "c")
+        self.assertEqual((first, removed), (7, 2))
+        self.assertEqual([(lex_item.name, start, end) for lex_item, start, end in words],
+                         [("Null", 8, 9), ("Id", 9, 11)])
+        session.apply_edit(0, 1, "if")
+        self.assertEqual(session.text, "if = 1\nif bc == 22\n")
+        self.assertEqual([(lex_item.name, start, end) for lex_item, start, end in session],
+                         [(lex_item.name, start, end) for lex_item, start, end in self.lexer._scan(session.text)])
+        self.assertRaises(NoMatchException, session.apply_edit, 0, 0, "$")
+        self.assertEqual(session.text, "if = 1\nif bc == 22\n")
+
+    def test_regex_engine_rebuild(self):
+        self.build_lexer(LexEngine.REGEX)
+        self.lexer.lex_stream(StringIO("a = 1"))
+        self.lexer.add_lex_item("Semi", ";")
+        self.results.clear()
+        self.lexer.lex_stream(StringIO("a = 1;"))
+        self.assertEqual(self.results[-1].name, "Semi")
+
 
 if __name__ == '__main__':
     unittest.main()